@@ -54,9 +54,12 @@ class ComplexWindow(QtGui.QDockWidget, FORM_CLASS):
         self.dbButton.clicked.connect(self.getDataSources)
         self.dbCombo.activated.connect(self.updateComplexClass)
         self.complexCombo.activated.connect(self.loadAssociatedFeatures)
+        self.treeWidget.itemExpanded.connect(self.populateComplexItem)
         self.iface.newProjectCreated.connect(self.clearDock)
 
         self.abstractDb = None
+        self.associatedDict = dict()
+        self.lazyComplexNameList = []
         self.databases = None
         self.abstractDbFactory = DbFactory()
 
@@ -221,6 +224,7 @@ class ComplexWindow(QtGui.QDockWidget, FORM_CLASS):
         item = self.treeWidget.selectedItems()[0]
         #checking if the item is a complex (it should have depth = 2)
         if self.depth(item) == 2:
+            self.populateComplexItem(item)
             bbox = QgsRectangle()
             for i in range(item.childCount()):
                 aggregated_item = item.child(i)
@@ -262,6 +266,7 @@ class ComplexWindow(QtGui.QDockWidget, FORM_CLASS):
             if len(items) == 0:
                 return
             complexItem = items[0]
+            self.populateComplexItem(complexItem)
             count = complexItem.childCount()
             for i in range(count):
                 self.disassociateAggregatedClass(complexItem.child(i))
@@ -397,12 +402,37 @@ class ComplexWindow(QtGui.QDockWidget, FORM_CLASS):
             QMessageBox.critical(self.iface.mainWindow(), self.tr('Critical'), self.tr('A problem occurred! Check log for details.'))
             QgsMessageLog.logMessage(':'.join(e.args), 'DSG Tools Plugin', QgsMessageLog.CRITICAL)
             
+        self.associatedDict = associatedDict
+        self.lazyComplexNameList = []
+        if not associatedDict:
+            return
+        #only complexes are added now, their associated features are added when they are expanded
+        classNameItem = self.createTreeItem(self.treeWidget.invisibleRootItem(), complex)
         for name in associatedDict.keys():
-            for complex_uuid in associatedDict[name].keys():
-                self.addAssociatedFeature(complex, name, complex_uuid, None, None)
-                for aggregated_class in associatedDict[name][complex_uuid]:
-                    for ogc_fid in associatedDict[name][complex_uuid][aggregated_class]:
-                        self.addAssociatedFeature(complex, name, complex_uuid, aggregated_class, ogc_fid)
+            complexItem = QTreeWidgetItem(classNameItem)
+            complexItem.setText(0, name)
+            complexItem.setText(1, str(associatedDict[name].keys()[0]))
+            complexItem.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            self.lazyComplexNameList.append(name)
+
+    def populateComplexItem(self, item):
+        """
+        Adds the associated features of a complex item that were not added yet
+        item: complex item (depth = 2)
+        """
+        name = item.text(0)
+        if self.depth(item) != 2 or name not in self.lazyComplexNameList:
+            return
+        self.lazyComplexNameList.remove(name)
+        for complex_uuid in self.associatedDict[name].keys():
+            for aggregated_class, idList in self.associatedDict[name][complex_uuid].iteritems():
+                if not idList:
+                    continue
+                associatedClassItem = self.createTreeItem(item, aggregated_class)
+                for ogc_fid in idList:
+                    QTreeWidgetItem(associatedClassItem).setText(0, ogc_fid)
+        if item.childCount() == 0:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
 
     def depth(self, item):
         """
@@ -38,6 +38,83 @@ from DsgTools.Factories.DbFactory.abstractDb import AbstractDb
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'ui_manageComplex.ui'))
 
+class DomainValueCache(object):
+    """
+    Keeps code <-> code name maps of the domain tables, shared by every model that
+    uses the same connection. Each table is read once and only read again when its
+    contents change (checked through a cheap signature when a model is created).
+    """
+    instanceDict = dict()
+
+    def __init__(self, db):
+        self.db = db
+        self.tableDict = dict()
+
+    @classmethod
+    def fromDb(cls, db):
+        """
+        Gets the cache shared by the connection db.
+        """
+        key = (db.driverName(), db.connectionName(), db.hostName(), db.port(), db.databaseName())
+        if key not in cls.instanceDict:
+            cls.instanceDict[key] = cls(db)
+        return cls.instanceDict[key]
+
+    def getDomainTableName(self, table):
+        if self.db.driverName() == 'QPSQL':
+            return 'dominios.%s' % table
+        return 'dominios_%s' % table
+
+    def getTableSignatures(self, tableList):
+        """
+        Gets a signature (count and hash of codes and code names) of each table in tableList with a single query.
+        """
+        sqlList = []
+        for table in tableList:
+            if self.db.driverName() == 'QPSQL':
+                sqlList.append("select '%s', count(*)::text || ':' || coalesce(md5(string_agg(code::text || ':' || code_name, ',' order by code)), '') from %s" % (table, self.getDomainTableName(table)))
+            else:
+                sqlList.append("select '%s', count(*) || ':' || coalesce(group_concat(code || ':' || code_name, ','), '') from %s" % (table, self.getDomainTableName(table)))
+        signatureDict = dict()
+        query = QSqlQuery(' union all '.join(sqlList), self.db)
+        while query.next():
+            signatureDict[query.value(0)] = query.value(1)
+        return signatureDict
+
+    def loadTable(self, table, signature):
+        codeToNameDict = dict()
+        nameToCodeDict = dict()
+        query = QSqlQuery('select code, code_name from %s' % self.getDomainTableName(table), self.db)
+        while query.next():
+            code = str(query.value(0))
+            code_name = query.value(1)
+            codeToNameDict[code] = code_name
+            nameToCodeDict[code_name] = code
+        self.tableDict[table] = (signature, codeToNameDict, nameToCodeDict)
+
+    def validate(self, tableList):
+        """
+        Reloads the tables in tableList that changed since they were cached.
+        """
+        tableList = list(set(tableList))
+        if not tableList:
+            return
+        signatureDict = self.getTableSignatures(tableList)
+        for table in tableList:
+            signature = signatureDict.get(table)
+            if table not in self.tableDict or self.tableDict[table][0] != signature:
+                self.loadTable(table, signature)
+
+    def getCodeToNameDict(self, table):
+        if table not in self.tableDict:
+            self.validate([table])
+        return self.tableDict[table][1]
+
+    def getNameToCodeDict(self, table):
+        if table not in self.tableDict:
+            self.validate([table])
+        return self.tableDict[table][2]
+
 class CustomTableModel(QSqlTableModel):
     def __init__(self, domainDict, parent=None, db=QSqlDatabase):
         """
@@ -46,26 +123,24 @@ class CustomTableModel(QSqlTableModel):
         QSqlTableModel.__init__(self, parent=parent, db=db)
         self.dict = domainDict
         self.db = db
+        self.domainCache = DomainValueCache.fromDb(db)
+        self.domainCache.validate([value[0] for value in domainDict.values() if isinstance(value, tuple)])
+        #code to name maps of each mapped column, built once instead of for each painted cell
+        self.codeToNameDict = dict()
+        for column, value in domainDict.iteritems():
+            if isinstance(value, dict):
+                self.codeToNameDict[column] = {str(code) : name for name, code in value.iteritems()}
+            elif isinstance(value, tuple):
+                allowedCodes = set(map(str, value[1]))
+                tableCodeToName = self.domainCache.getCodeToNameDict(value[0])
+                self.codeToNameDict[column] = {code : name for code, name in tableCodeToName.iteritems() if code in allowedCodes}
 
     def makeValueRelationDict(self, table, codes):
         """
         Makes the value relation dictionary. It is necessary for multi valued attributes
         """
-        ret = dict()
-
-        in_clause = '(%s)' % ",".join(map(str, codes))
-        if self.db.driverName() == 'QPSQL':
-            sql = 'select code, code_name from dominios.%s where code in %s' % (table, in_clause)
-        elif self.db.driverName() == 'QSQLITE':
-            sql = 'select code, code_name from dominios_%s where code in %s' % (table, in_clause)
-
-        query = QSqlQuery(sql, self.db)
-        while query.next():
-            code = str(query.value(0))
-            code_name = query.value(1)
-            ret[code_name] = code
-
-        return ret
+        codeSet = set(map(str, codes))
+        return {code_name : code for code_name, code in self.domainCache.getNameToCodeDict(table).iteritems() if code in codeSet}
 
     def flags(self, index):
         """
@@ -85,21 +160,13 @@ class CustomTableModel(QSqlTableModel):
         dbdata = QSqlTableModel.data(self, index, role)
         column = self.headerData(index.column(), Qt.Horizontal)
         if self.dict.has_key(column):
+            codeToName = self.codeToNameDict[column]
             if isinstance(self.dict[column], dict):
-                valueMap = self.dict[column]
-                if str(dbdata) in valueMap.values():
-                    id = valueMap.values().index(str(dbdata))
-                    return valueMap.keys()[id]
+                if str(dbdata) in codeToName:
+                    return codeToName[str(dbdata)]
             elif isinstance(self.dict[column], tuple):
-                tupla = self.dict[column]
-                valueMap = self.makeValueRelationDict(tupla[0], tupla[1])
                 codes = str(dbdata)[1:-1].split(',')
-                code_names = list()
-                for c in codes:
-                    if str(c) in valueMap.values():
-                        id = valueMap.values().index(str(c))
-                        code_name = valueMap.keys()[id]
-                        code_names.append(code_name)
+                code_names = [codeToName[c] for c in codes if c in codeToName]
                 if len(code_names) > 0:
                     return '{%s}' % ','.join(code_names)
         return dbdata
@@ -316,22 +383,10 @@ class ManageComplexDialog(QDialog, FORM_CLASS):
         """
         Makes the value relation dictionary
         """
-        #query to obtain the dict with code names and related codes
-        ret = dict()
-
-        in_clause = '(%s)' % ",".join(map(str, codes))
-        if self.db.driverName() == 'QPSQL':
-            sql = 'select code, code_name from dominios.%s where code in %s' % (table, in_clause)
-        elif self.db.driverName() == 'QSQLITE':
-            sql = 'select code, code_name from dominios_%s where code in %s' % (table, in_clause)
-
-        query = QSqlQuery(sql, self.db)
-        while query.next():
-            code = query.value(0)
-            code_name = query.value(1)
-            ret[code_name] = code
-
-        return ret
+        #code names and related codes come from the domain cache shared by the connection
+        codeSet = set(map(str, codes))
+        nameToCode = DomainValueCache.fromDb(self.db).getNameToCodeDict(table)
+        return {code_name : int(code) for code_name, code in nameToCode.iteritems() if code in codeSet}
 
     def updateTableView(self):
         """
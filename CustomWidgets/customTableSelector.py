@@ -25,44 +25,91 @@ import os
 # Qt imports
 from PyQt4 import QtGui, uic
 from PyQt4.QtCore import pyqtSlot, pyqtSignal, Qt
-from PyQt4.QtGui import QTreeWidgetItem
-
-from DsgTools.Utils.utils import Utils
+from PyQt4.QtGui import QStandardItemModel, QStandardItem, QSortFilterProxyModel, QAbstractItemView
 
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'customTableSelector.ui'))
 
+class SelectorItemModel(QStandardItemModel):
+    """
+    Two level model (category nodes and item rows) whose rows are replaced with a single reset.
+    """
+    def resetItems(self, itemLists):
+        """
+        Replaces the model rows by itemLists (lists of column texts, the first one being the category).
+        itemLists must be sorted, so that categories and items are shown in order.
+        """
+        categoryItemList = []
+        categoryDict = dict()
+        for itemList in itemLists:
+            if itemList[0] not in categoryDict:
+                categoryItem = QStandardItem(itemList[0])
+                categoryItem.setEditable(False)
+                categoryDict[itemList[0]] = categoryItem
+                categoryItemList.append(categoryItem)
+            rowItemList = []
+            for text in itemList:
+                rowItem = QStandardItem(text)
+                rowItem.setEditable(False)
+                rowItemList.append(rowItem)
+            #categories are not in the model yet, therefore no signal is emitted here
+            categoryDict[itemList[0]].appendRow(rowItemList)
+        #views and proxies are notified once, by the reset
+        self.beginResetModel()
+        self.blockSignals(True)
+        self.removeRows(0, self.rowCount())
+        for categoryItem in categoryItemList:
+            self.appendRow(categoryItem)
+        self.blockSignals(False)
+        self.endResetModel()
+
+class CategoryFilterProxyModel(QSortFilterProxyModel):
+    """
+    Filters the item rows, keeping the categories that have at least one accepted item.
+    """
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        sourceIndex = self.sourceModel().index(sourceRow, 0, sourceParent)
+        if sourceParent.isValid():
+            return super(CategoryFilterProxyModel, self).filterAcceptsRow(sourceRow, sourceParent)
+        for i in range(self.sourceModel().rowCount(sourceIndex)):
+            if super(CategoryFilterProxyModel, self).filterAcceptsRow(i, sourceIndex):
+                return True
+        return False
+
 class CustomTableSelector(QtGui.QWidget, FORM_CLASS):
     selectionChanged = pyqtSignal(list,str)
 
     def __init__(self, customNumber = None, parent = None):
         """Constructor."""
         super(self.__class__, self).__init__(parent)
+        #lists of column texts, kept sorted
         self.fromLs = []
         self.toLs = []
-        self.utils = Utils()
+        #hash lookups of the tuples of column texts in fromLs and toLs
+        self.fromSet = set()
+        self.toSet = set()
+        self.headerList = []
         self.setupUi(self)
+        self.fromModel = SelectorItemModel(self)
+        self.toModel = SelectorItemModel(self)
+        self.fromProxyModel = CategoryFilterProxyModel(self)
+        self.fromProxyModel.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.fromProxyModel.setSourceModel(self.fromModel)
+        self.fromTreeView.setModel(self.fromProxyModel)
+        self.toTreeView.setModel(self.toModel)
+        for treeView in [self.fromTreeView, self.toTreeView]:
+            treeView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            treeView.setSelectionBehavior(QAbstractItemView.SelectRows)
     
     def resizeTrees(self):
         """
         Expands headers
         """
-        self.fromTreeWidget.expandAll()
-        self.fromTreeWidget.header().setResizeMode(QtGui.QHeaderView.ResizeToContents)
-        self.fromTreeWidget.header().setStretchLastSection(False)
-        self.toTreeWidget.expandAll()
-        self.toTreeWidget.header().setResizeMode(QtGui.QHeaderView.ResizeToContents)
-        self.toTreeWidget.header().setStretchLastSection(False)
-    
-    def sortItems(self, treeWidget):
-        """
-        Sorts items from input treeWidget
-        """
-        rootNode = treeWidget.invisibleRootItem()
-        rootNode.sortChildren(0, Qt.AscendingOrder)
-        for i in range(rootNode.childCount()):
-            rootNode.child(i).sortChildren(1, Qt.AscendingOrder)
+        for treeView in [self.fromTreeView, self.toTreeView]:
+            treeView.expandAll()
+            treeView.header().setResizeMode(QtGui.QHeaderView.ResizeToContents)
+            treeView.header().setStretchLastSection(False)
     
     def setTitle(self,title):
         """
@@ -76,10 +123,11 @@ class CustomTableSelector(QtGui.QWidget, FORM_CLASS):
         """
         if isinstance(customNumber, int):
             self.filterColumnKey = self.headerList[customNumber]
-        elif self.headerList:
+        elif len(self.headerList) > 1:
             self.filterColumnKey = self.headerList[1]
         else:
             self.filterColumnKey = self.headerList[0]
+        self.fromProxyModel.setFilterKeyColumn(self.headerList.index(self.filterColumnKey))
     
     def clearAll(self):
         """
@@ -89,93 +137,69 @@ class CustomTableSelector(QtGui.QWidget, FORM_CLASS):
     
     def setHeaders(self, headerList, customNumber = None):
         """
-        Sets fromTreeWidget and toTreeWidget headers
+        Sets fromTreeView and toTreeView headers
         """
         self.headerList = headerList
-        self.fromTreeWidget.setHeaderLabels(headerList)
-        self.toTreeWidget.setHeaderLabels(headerList)
+        self.fromModel.setHorizontalHeaderLabels(headerList)
+        self.toModel.setHorizontalHeaderLabels(headerList)
         self.setFilterColumn(customNumber = customNumber)
     
     def setInitialState(self, fromDictList, unique=False):
         """
         Sets the initial state
         """
-        self.fromLs = []
-        self.toLs = []
-        self.fromTreeWidget.clear()
-        self.fromTreeWidget.clear()
+        self.fromLs, self.fromSet = [], set()
+        self.toLs, self.toSet = [], set()
         if not isinstance(fromDictList, int):
-            self.addItemsToTree(self.fromTreeWidget, fromDictList, self.fromLs, unique = unique)
-    
-    def getChildNode(self, parentNode, textList):
-        """
-        Returns child node with columns equals to textList items. If no node is found, return None
-        """
-        for i in range(parentNode.childCount()):
-            nodeFound = True
-            childNode = parentNode.child(i)
-            for j in range(len(textList)):
-                if childNode.text(j) != textList[j]:
-                    nodeFound = False
-                    break
-            if nodeFound:
-                return childNode
-        return None
+            self.addItemsToTree(self.fromModel, fromDictList, self.fromLs, unique = unique)
+        else:
+            self.resetModel(self.fromModel, self.fromLs)
+        self.resetModel(self.toModel, self.toLs)
+
+    def getControlSet(self, controlList):
+        return self.fromSet if controlList is self.fromLs else self.toSet
 
-    def addItemsToTree(self, treeWidget, addItemDictList, controlList, unique = False):
+    def resetModel(self, model, controlList):
+        """
+        Sorts controlList (by category and then by the other columns) and shows it in model
         """
-        Adds items from addItemDictList in treeWidget.
+        controlList.sort()
+        model.resetItems(controlList)
+        self.resizeTrees()
+
+    def addItemsToTree(self, model, addItemDictList, controlList, unique = False):
+        """
+        Adds items from addItemDictList in model.
         addItemDictList = [-list of dicts with keys corresponding to header list texts-]
-        unique: only adds item if it is not in already in tree
+        unique: only adds item if it is not in already in model
         """
-        rootNode = treeWidget.invisibleRootItem() #invisible root item
+        controlSet = self.getControlSet(controlList)
         for dictItem in addItemDictList:
-            firstColumnChild = self.getChildNode(rootNode, [dictItem[self.headerList[0]]]+['']*(len(self.headerList)-1)) #looks for a item in the format ['first column text', '','',...,'']
-            if not firstColumnChild:
-                firstColumnChild = self.utils.createWidgetItem(rootNode,dictItem[self.headerList[0]],0)
-            textList = [dictItem[self.headerList[i]] for i in range(len(self.headerList))]
-            if unique:
-                childNode = self.getChildNode(firstColumnChild, textList)
-                if not childNode:
-                    item = self.utils.createWidgetItem(firstColumnChild,textList)
-                    itemList = self.getItemList(item)
-                    if itemList not in controlList:
-                        controlList.append(itemList)
-            else:
-                item = self.utils.createWidgetItem(firstColumnChild,textList)
-                itemList = self.getItemList(item)
-                controlList.append(itemList)
-        self.resizeTrees()
-        self.sortItems(treeWidget)
-    
-    def getItemList(self, item, returnAsDict = False):
+            textList = [dictItem[header] for header in self.headerList]
+            if unique and tuple(textList) in controlSet:
+                continue
+            controlList.append(textList)
+            controlSet.add(tuple(textList))
+        self.resetModel(model, controlList)
+
+    def getItemList(self, model, index, returnAsDict = False):
         """
-        Gets item as a list
+        Gets the row of index as a list
         """
+        textList = [model.index(index.row(), i, index.parent()).data() for i in range(len(self.headerList))]
         if returnAsDict:
-            returnItem = dict()
-        else:
-            returnItem = []
-        for i in range(item.columnCount()):
-            if returnAsDict:
-                returnItem[self.headerList[i]] = item.text(i)
-            else:
-                returnItem.append(item.text(i))
-        return returnItem
+            return dict(zip(self.headerList, textList))
+        return textList
 
     def getLists(self, sender):
         """
-        Returns a list composed by (originTreeWidget, --list that controls previous originTreeWidget--, destinationTreeWidget, --list that controls previous destinationTreeWidget--)
+        Returns a list composed by (originTreeView, --list that controls originTreeView--, originModel, destinationModel, --list that controls destinationModel--, allItems)
         """
         text = sender.text()
-        if text == '>':
-            return self.fromTreeWidget, self.fromLs, self.toTreeWidget, self.toLs, False
-        if text == '>>':
-            return self.fromTreeWidget, self.fromLs, self.toTreeWidget, self.toLs, True
-        if text == '<':
-            return self.toTreeWidget, self.toLs, self.fromTreeWidget, self.fromLs, False
-        if text == '<<':
-            return self.toTreeWidget, self.toLs, self.fromTreeWidget, self.fromLs, True
+        if text in ['>', '>>']:
+            return self.fromTreeView, self.fromLs, self.fromModel, self.toModel, self.toLs, text == '>>'
+        if text in ['<', '<<']:
+            return self.toTreeView, self.toLs, self.toModel, self.fromModel, self.fromLs, text == '<<'
 
     @pyqtSlot(bool, name='on_pushButtonSelectOne_clicked')
     @pyqtSlot(bool, name='on_pushButtonDeselectOne_clicked')
@@ -183,164 +207,74 @@ class CustomTableSelector(QtGui.QWidget, FORM_CLASS):
     @pyqtSlot(bool, name='on_pushButtonDeselectAll_clicked')
     def selectItems(self, isSelected, selectedItems=[]):
         """
-        Adds the selected items to the "to" list
+        Moves the selected items (or all shown items) to the other list.
+        Each model is reset once, no matter how many items are moved.
         """
         #gets lists
-        originTreeWidget, originControlLs, destinationTreeWidget, destinationControlLs, allItems = self.getLists(self.sender())
-        #root nodes
-        originRoot = originTreeWidget.invisibleRootItem()
-        destinationRoot = destinationTreeWidget.invisibleRootItem()
-        selectedItemList = []
-        self.getSelectedItems(originRoot, selectedItemList)
-        for i in range(originRoot.childCount())[::-1]:
-            catChild = originRoot.child(i)
-            #if son of originRootNode is selected, adds it to destinationRootNode
-            moveNode = allItems or (catChild in selectedItemList)
-            #get destination parent, creates one in destination if not exists
-            destinationCatChild = self.getDestinationNode(destinationRoot, catChild)
-            for j in range(catChild.childCount())[::-1]:
-                nodeChild = catChild.child(j)
-                moveChild = (nodeChild in selectedItemList) or moveNode
-                if self.moveChild(catChild, j, destinationCatChild, moveChild):
-                    itemList = self.getItemList(nodeChild)
-                    destinationControlLs.append(itemList)
-                    originControlLs.pop(originControlLs.index(itemList))
-            destinationCatChild.sortChildren(1, Qt.AscendingOrder)
-            if catChild.childCount() == 0:
-                originRoot.takeChild(i)
-            destinationRoot.sortChildren(0, Qt.AscendingOrder)
-        for i in range(destinationRoot.childCount())[::-1]:
-            if destinationRoot.child(i).childCount() == 0:
-                destinationRoot.takeChild(i)
-        destinationRoot.sortChildren(0, Qt.AscendingOrder)
-        self.resizeTrees()
-
-    def getSelectedItems(self, treeWidgetNode, itemList):
-        """
-        Recursive method to get all selected nodes of treeWidget
-        """
-        for i in range(treeWidgetNode.childCount()):
-            childItem = treeWidgetNode.child(i)
-            if childItem.isSelected() and (childItem not in itemList):
-                itemList.append(childItem)
-            for j in range(childItem.childCount()):
-                self.getSelectedItems(childItem, itemList)
-    
-    def moveChild(self, parentNode, idx, destinationNode, isSelected):
-        """
-        If node is selected, removes node from parentNode and adds it to destinationNode
-        """
-        if isSelected:
-            child = parentNode.takeChild(idx)
-            destinationNode.addChild(child)
-            return True
-        else:
-            return False
-
-    def getDestinationNode(self, destinationRoot, catChild, returnNew = True):
-        """
-        Looks for node in destination and returns it. If none is found, creates one and returns it
-        """
-        #get destination parent, creates one in destination if not exists
-        destinationCatChild = None
-        if isinstance(catChild,list):
-            comparisonText = catChild[0]
-            if returnNew:
-                itemTextList = [catChild[i] for i in range(len(catChild))]
-        else:
-            comparisonText = catChild.text(0)
-            if returnNew:
-                itemTextList = [catChild.text(i) for i in range(catChild.columnCount())]
-
-        for i in range(destinationRoot.childCount()):
-            candidate = destinationRoot.child(i)
-            if candidate.text(0) == comparisonText:
-                #if candidate is found, returns candidate
-                return candidate
-        #if candidate is not found, creates one and returns it
-        if returnNew:
-            if not destinationCatChild:
-                return QTreeWidgetItem(destinationRoot,itemTextList)
+        originTreeView, originControlLs, originModel, destinationModel, destinationControlLs, allItems = self.getLists(self.sender())
+        viewModel = originTreeView.model()
+        moveSet = set()
+        if allItems:
+            #every item shown (i.e. accepted by the filter)
+            categoryIndexList = [viewModel.index(i, 0) for i in range(viewModel.rowCount())]
+            itemIndexList = []
         else:
-            return None
+            #rows are selected as a whole, so their first column is enough
+            selectedIndexList = [index for index in originTreeView.selectionModel().selectedIndexes() if index.column() == 0]
+            categoryIndexList = [index for index in selectedIndexList if not index.parent().isValid()]
+            itemIndexList = [index for index in selectedIndexList if index.parent().isValid()]
+        for categoryIndex in categoryIndexList:
+            itemIndexList += [viewModel.index(i, 0, categoryIndex) for i in range(viewModel.rowCount(categoryIndex))]
+        for index in itemIndexList:
+            moveSet.add(tuple(self.getItemList(viewModel, index)))
+        if not moveSet:
+            return
+        originControlSet = self.getControlSet(originControlLs)
+        destinationControlSet = self.getControlSet(destinationControlLs)
+        originControlLs[:] = [itemList for itemList in originControlLs if tuple(itemList) not in moveSet]
+        originControlSet -= moveSet
+        destinationControlLs += [list(item) for item in moveSet if item not in destinationControlSet]
+        destinationControlSet |= moveSet
+        self.resetModel(originModel, originControlLs)
+        self.resetModel(destinationModel, destinationControlLs)
     
     def on_filterLineEdit_textChanged(self, text):
         """
         Filters the items to make it easier to spot and select them
         """
-        classes = [node[1].lower() for node in self.fromLs if text.lower() in node[1].lower()] #text list
-        filteredClasses = [i for i in classes if i.lower() not in [j[1].lower() for j in self.toLs]] #text list
-        self.filterTree(self.fromTreeWidget, self.fromLs, filteredClasses, 1)
-        self.resizeTrees()
-    
-    def filterTree(self, treeWidget, controlList, filterList, columnIdx):
-        '''
-        Actual filter
-        '''
-        treeWidget.clear()
-        rootNode = treeWidget.invisibleRootItem()
-        #remove items that are not in filterList
-        for item in controlList:
-            if item[columnIdx].lower() in filterList:
-                firstColumnChild = self.getChildNode(rootNode, [item[0]]+['']*(len(item)-1)) #looks for a item in the format ['first column text', '','',...,'']
-                if not firstColumnChild:
-                    firstColumnChild = self.utils.createWidgetItem(rootNode, item[0], 0)
-                QTreeWidgetItem(firstColumnChild, item)
-        rootNode.sortChildren(0, Qt.AscendingOrder)
-        for i in range(rootNode.childCount()):
-            rootNode.child(i).sortChildren(1, Qt.AscendingOrder)
+        self.fromProxyModel.setFilterFixedString(text)
+        self.fromTreeView.expandAll()
     
     def getSelectedNodes(self, concatenated = True):
         """
         Returns a list of selected nodes converted into a string separated by ','
+        If concatenated is False, the lists of column texts are returned.
         """
-        selected = []
-        rootNode = self.toTreeWidget.invisibleRootItem()
-        for i in range(rootNode.childCount()):
-            catNode = rootNode.child(i)
-            for j in range(catNode.childCount()):
-                item = catNode.child(j)
-                if concatenated:
-                    catList = [item.text(i) for i in range(item.columnCount())]
-                    selected.append(','.join(catList))
-                else:
-                    selected.append(item)
-        return selected
+        if concatenated:
+            return [','.join(itemList) for itemList in self.toLs]
+        return [list(itemList) for itemList in self.toLs]
 
     def addItemsToWidget(self, itemList, unique = False):
         """
         Adds items to tree that is already built.
         """
-        self.addItemsToTree(self.fromTreeWidget, itemList, self.fromLs, unique = unique)
+        self.addItemsToTree(self.fromModel, itemList, self.fromLs, unique = unique)
     
     def removeItemsFromWidget(self, removeList):
         """
         Searches both lists and removes items that are in removeList
         """
-        self.removeItemsFromTree(removeList, self.fromTreeWidget, self.fromLs)
-        self.removeItemsFromTree(removeList, self.toTreeWidget, self.toLs)
+        self.removeItemsFromTree(removeList, self.fromModel, self.fromLs)
+        self.removeItemsFromTree(removeList, self.toModel, self.toLs)
     
-    def removeItemsFromTree(self, dictItemList, treeWidget, controlList):
-        """
-        Searches treeWidget and removes items that are in removeList and updates controlList
-        """        
-        treeRoot = treeWidget.invisibleRootItem()
-        catList = [i[self.headerList[0]] for i in dictItemList]
-        returnList = []
-        for i in range(treeRoot.childCount())[::-1]:
-            catChild = treeRoot.child(i)
-            if catChild.text(0) in catList:
-                for j in range(catChild.childCount())[::-1]:
-                    nodeChild = catChild.child(j)
-                    nodeChildDict = self.getItemList(nodeChild, returnAsDict = True)
-                    nodeChildDict[self.headerList[0]] = catChild.text(0)
-                    if nodeChildDict in dictItemList:
-                        catChild.takeChild(j)
-                        itemList = self.getItemList(nodeChild)
-                        controlList.pop(controlList.index(itemList))
-        for i in range(treeRoot.childCount())[::-1]:
-            if treeRoot.child(i).childCount() == 0:
-                treeRoot.takeChild(i)
-        treeRoot.sortChildren(0, Qt.AscendingOrder)
-        for i in range(treeRoot.childCount()):
-            treeRoot.child(i).sortChildren(1, Qt.AscendingOrder)
+    def removeItemsFromTree(self, dictItemList, model, controlList):
+        """
+        Removes the items that are in dictItemList from model and updates controlList
+        """
+        controlSet = self.getControlSet(controlList)
+        removeSet = set(tuple(dictItem[header] for header in self.headerList) for dictItem in dictItemList) & controlSet
+        if not removeSet:
+            return
+        controlList[:] = [itemList for itemList in controlList if tuple(itemList) not in removeSet]
+        controlSet -= removeSet
+        self.resetModel(model, controlList)
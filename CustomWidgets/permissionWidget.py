@@ -179,7 +179,7 @@ class PermissionWidget(QtGui.QWidget, FORM_CLASS):
             grantedUserList.append(currItem.child(i).text(2))
         userList = self.serverAbstractDb.getUsersFromServer()
         notGrantedUserList = [i[0] for i in userList if i[0] not in grantedUserList]
-        edgvVersion = self.dbDict[dbName].getDatabaseVersion()
+        edgvVersion = self.permissionManager.getDatabaseVersionDict()[dbName]
         try:
             dlg = ProfileUserManager(grantedUserList, notGrantedUserList, self.permissionManager, profileName, dbName, edgvVersion)
             dlg.exec_()
@@ -208,10 +208,8 @@ class PermissionWidget(QtGui.QWidget, FORM_CLASS):
         for i in range(dbChildCount):
             permissionNode = currItem.child(i)
             permissionName = permissionNode.text(1)
-            userCount = permissionNode.childCount()
-            for j in range(userCount):
-                userName = permissionNode.child(j).text(2)
-                self.permissionManager.revokePermission(dbName, permissionName, userName)
+            userList = [permissionNode.child(j).text(2) for j in range(permissionNode.childCount())]
+            self.permissionManager.revokePermissions(dbName, permissionName, userList)
         self.refresh()
     
     def revokeAllDbs(self):
@@ -236,7 +234,7 @@ class PermissionWidget(QtGui.QWidget, FORM_CLASS):
         for i in range(childCount):
             grantedProfileList.append(currItem.child(i).text(2))
         profileDict = self.permissionManager.getSettings()
-        edgvVersion = self.dbDict[dbName].getDatabaseVersion()
+        edgvVersion = self.permissionManager.getDatabaseVersionDict()[dbName]
         notGrantedProfileList = [i for i in profileDict[edgvVersion] if i not in grantedProfileList]
         try:
             dlg = DbProfileManager(grantedProfileList, notGrantedProfileList, self.permissionManager, userName, dbName, edgvVersion)
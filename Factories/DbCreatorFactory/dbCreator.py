@@ -66,70 +66,100 @@ class DbCreator(QObject):
         return dbNameList
     
     def batchCreateDb(self, dbNameList, srid, paramDict  = dict()):
-        outputDbDict = dict()
-        errorDict = dict()
-        templateDb = None
+        progress = None
         if self.parentWidget:
             progress = ProgressWidget(1,len(dbNameList),self.tr('Creating databases... '),parent = self.parentWidget)
             progress.initBar()
-        for dbName in dbNameList:
-            try:
-                if not templateDb: 
-                    newDb = self.createDb(dbName, srid, paramDict = paramDict, parentWidget = self.parentWidget)
-                    templateDb = dbName
-                else:
-                    paramDict['templateDb'] = templateDb
-                    newDb = self.createDb(dbName, srid, paramDict, parentWidget = self.parentWidget)
-                outputDbDict[dbName] = newDb
-            except Exception as e:
-                if dbName not in errorDict.keys():
-                    errorDict[dbName] = ':'.join(e.args)
-                else:
-                    errorDict[dbName] += '\n' + ':'.join(e.args)
-            if self.parentWidget:
-                progress.step()
-        return outputDbDict, errorDict
+        return self.createDbList(dbNameList, srid, paramDict, progress = progress)
     
     def createDbWithAutoIncrementingName(self, dbInitialBaseName, srid, numberOfDatabases, prefix = None, sufix = None, paramDict = dict()):
         dbNameList = self.buildAutoIncrementingDbNameList(dbInitialBaseName, numberOfDatabases, prefix, sufix)
         return self.batchCreateDb(dbNameList, srid, paramDict)
     
     def createDbFromMIList(self, miList, srid, prefix = None, sufix = None, createFrame = False,  paramDict = dict()):
-        outputDbDict = dict()
-        errorDict = dict()
-        templateDb = None
+        progress = None
         if self.parentWidget:
             progress = ProgressWidget(1,2*len(miList)+1,self.tr('Creating databases... '),parent = self.parentWidget)
             progress.initBar()
             progress.step()
+        miDict = dict()
+        dbNameList = []
         for mi in miList:
             dbName = self.buildDatabaseName(mi, prefix, sufix)
+            miDict[dbName] = mi
+            dbNameList.append(dbName)
+        outputDbDict, errorDict = self.createDbList(dbNameList, srid, paramDict, progress = progress)
+        if createFrame:
+            frameErrorDict = self.createFrames(outputDbDict, miDict, paramDict, progress = progress)
+            self.mergeErrorDict(errorDict, frameErrorDict)
+        return outputDbDict, errorDict
+
+    def createDbList(self, dbNameList, srid, paramDict, progress = None):
+        """
+        Creates the first database of dbNameList and uses it as template to create the others.
+        Returns (outputDbDict, errorDict).
+        """
+        outputDbDict = dict()
+        errorDict = dict()
+        remainingDbNameList = list(dbNameList)
+        templateDb = None
+        while remainingDbNameList and not templateDb:
+            dbName = remainingDbNameList.pop(0)
             try:
-                if not templateDb: 
-                    newDb = self.createDb(dbName, srid, paramDict, parentWidget = self.parentWidget)
-                    templateDb = dbName
-                else:
-                    paramDict['templateDb'] = templateDb
-                    newDb = self.createDb(dbName, srid, paramDict, parentWidget = self.parentWidget)
-                outputDbDict[dbName] = newDb
+                outputDbDict[dbName] = self.createDb(dbName, srid, paramDict = paramDict, parentWidget = self.parentWidget)
+                templateDb = dbName
             except Exception as e:
-                if dbName not in errorDict.keys():
-                    errorDict[dbName] = ':'.join(e.args)
-                else:
-                    errorDict[dbName] += '\n' + ':'.join(e.args)
-            if self.parentWidget:
+                self.addErrorMessage(errorDict, dbName, ':'.join(e.args))
+            if progress:
                 progress.step()
-        if createFrame:
-            for dbName in outputDbDict.keys():
-                try:           
-                    scale = self.scaleMIDict[len(mi.split('-'))]
-                    mi = [i for i in miList if i in dbName][0]
-                    outputDbDict[dbName].createFrame('mi', scale, mi, paramDict = paramDict)
-                except Exception as e:
-                    if dbName not in errorDict.keys():
-                        errorDict[dbName] = ':'.join(e.args)
-                    else:
-                        errorDict[dbName] += '\n' + ':'.join(e.args)
-                if self.parentWidget:
-                    progress.step()
-        return outputDbDict, errorDict
\ No newline at end of file
+        if templateDb:
+            templateParamDict = dict(paramDict)
+            templateParamDict['templateDb'] = templateDb
+            newDbDict, newErrorDict = self.createDbsFromTemplate(remainingDbNameList, srid, templateParamDict, progress = progress)
+            outputDbDict.update(newDbDict)
+            self.mergeErrorDict(errorDict, newErrorDict)
+        return outputDbDict, errorDict
+
+    def createDbsFromTemplate(self, dbNameList, srid, paramDict, progress = None):
+        """
+        Creates each database of dbNameList from paramDict['templateDb'].
+        Reimplemented in child classes that are able to create them concurrently.
+        """
+        outputDbDict = dict()
+        errorDict = dict()
+        for dbName in dbNameList:
+            try:
+                outputDbDict[dbName] = self.createDb(dbName, srid, paramDict, parentWidget = self.parentWidget)
+            except Exception as e:
+                self.addErrorMessage(errorDict, dbName, ':'.join(e.args))
+            if progress:
+                progress.step()
+        return outputDbDict, errorDict
+
+    def createFrames(self, outputDbDict, miDict, paramDict, progress = None):
+        """
+        Creates the frame of each database in outputDbDict according to miDict ({dbName: mi}).
+        Reimplemented in child classes that are able to create them concurrently.
+        Returns errorDict.
+        """
+        errorDict = dict()
+        for dbName in outputDbDict.keys():
+            try:
+                mi = miDict[dbName]
+                scale = self.scaleMIDict[len(mi.split('-'))]
+                outputDbDict[dbName].createFrame('mi', scale, mi, paramDict = paramDict)
+            except Exception as e:
+                self.addErrorMessage(errorDict, dbName, ':'.join(e.args))
+            if progress:
+                progress.step()
+        return errorDict
+
+    def addErrorMessage(self, errorDict, dbName, message):
+        if dbName not in errorDict.keys():
+            errorDict[dbName] = message
+        else:
+            errorDict[dbName] += '\n' + message
+
+    def mergeErrorDict(self, errorDict, newErrorDict):
+        for dbName, message in newErrorDict.iteritems():
+            self.addErrorMessage(errorDict, dbName, message)
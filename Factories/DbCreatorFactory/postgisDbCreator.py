@@ -23,6 +23,7 @@
 
 from DsgTools.Factories.DbCreatorFactory.dbCreator import DbCreator
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
+from DsgTools.Factories.DbFactory.dbConnectionPool import BatchDbRunner
 
 class PostgisDbCreator(DbCreator):
     
@@ -60,6 +61,50 @@ class PostgisDbCreator(DbCreator):
                 templateDb = self.instantiateNewDb(templateName)
                 templateDb.setStructureFromSql(version, 4674)
     
+    def checkAndCreateSridTemplate(self, version, srid, parentWidget = None):
+        '''
+        checks and creates the edgv template of version already reprojected to srid.
+        The srid template is recreated when its edgv version or implementation version
+        (model) differs from the ones of the edgv template.
+        Returns the name of the template to be used.
+        '''
+        self.checkAndCreateTemplate(version)
+        templateName = self.abstractDb.getTemplateName(version)
+        if int(srid) == 4674:
+            #edgv templates are created with 4674
+            return templateName
+        sridTemplateName = self.abstractDb.getSridTemplateName(version, srid)
+        if self.abstractDb.checkDatabaseExists(sridTemplateName):
+            if self.isSridTemplateUpToDate(templateName, sridTemplateName):
+                return sridTemplateName
+            self.abstractDb.dropDatabase(sridTemplateName, dropTemplate = True)
+        self.abstractDb.createDbFromTemplate(sridTemplateName, templateName = templateName, parentWidget = parentWidget)
+        sridTemplateDb = self.instantiateNewDb(sridTemplateName)
+        try:
+            sridTemplateDb.updateDbSRID(srid, parentWidget = parentWidget)
+            sridTemplateDb.checkAndCreateStyleTable()
+            sridTemplateDb.db.close()
+            self.abstractDb.setDbAsTemplate(dbName = sridTemplateName)
+        except Exception as e:
+            sridTemplateDb.db.close()
+            self.abstractDb.dropDatabase(sridTemplateName)
+            raise e
+        return sridTemplateName
+
+    def isSridTemplateUpToDate(self, templateName, sridTemplateName):
+        '''
+        Compares edgv version and implementation version of both templates
+        '''
+        templateDb = self.instantiateNewDb(templateName)
+        sridTemplateDb = self.instantiateNewDb(sridTemplateName)
+        try:
+            upToDate = templateDb.getDatabaseVersion() == sridTemplateDb.getDatabaseVersion() \
+                and templateDb.getImplementationVersion() == sridTemplateDb.getImplementationVersion()
+        finally:
+            templateDb.db.close()
+            sridTemplateDb.db.close()
+        return upToDate
+    
     def createDb(self, dbName, srid, paramDict = dict(), parentWidget = None):
         '''
         dbName: new database name
@@ -70,14 +115,65 @@ class PostgisDbCreator(DbCreator):
         if 'templateDb' in paramDict.keys():
             self.abstractDb.createDbFromTemplate(dbName, templateName = paramDict['templateDb'], parentWidget = parentWidget)
             return self.instantiateNewDb(dbName)
+        elif paramDict['isTemplateEdgv']:
+            #1. get (or create) the edgv template already reprojected to srid
+            #2. create db as a pure copy of it
+            sridTemplateName = self.checkAndCreateSridTemplate(paramDict['version'], srid, parentWidget = parentWidget)
+            self.abstractDb.createDbFromTemplate(dbName, templateName = sridTemplateName, parentWidget = parentWidget)
+            return self.instantiateNewDb(dbName)
         else:
-            #1. test if edgv template is created
-            #2. if edgv template is not created, create it
-            if paramDict['isTemplateEdgv']:
-                self.checkAndCreateTemplate(paramDict['version'])
-            #3. create db from template
+            #create db from template
             self.abstractDb.createDbFromTemplate(dbName, templateName = paramDict['templateName'], parentWidget = parentWidget)
             newDb = self.instantiateNewDb(dbName)
             newDb.updateDbSRID(srid, parentWidget = parentWidget)
             newDb.checkAndCreateStyleTable()
             return newDb
+
+    def createDbList(self, dbNameList, srid, paramDict, progress = None):
+        '''
+        When using edgv templates, every database is a concurrent copy of the srid template.
+        Otherwise, the first database is created and used as template to the others.
+        '''
+        if 'templateDb' in paramDict.keys() or not paramDict.get('isTemplateEdgv'):
+            return super(PostgisDbCreator, self).createDbList(dbNameList, srid, paramDict, progress = progress)
+        try:
+            sridTemplateName = self.checkAndCreateSridTemplate(paramDict['version'], srid, parentWidget = self.parentWidget)
+        except Exception as e:
+            errorDict = {dbName : ':'.join(e.args) for dbName in dbNameList}
+            return dict(), errorDict
+        templateParamDict = dict(paramDict)
+        templateParamDict['templateDb'] = sridTemplateName
+        return self.createDbsFromTemplate(dbNameList, srid, templateParamDict, progress = progress)
+
+    def createDbsFromTemplate(self, dbNameList, srid, paramDict, progress = None):
+        """
+        Creates the databases of dbNameList from paramDict['templateDb'] concurrently.
+        Each worker issues its CREATE DATABASE through its own pooled server connection.
+        """
+        serverDbName = self.abstractDb.getDatabaseName()
+        templateName = paramDict['templateDb']
+        #created once here to avoid concurrent creation by the workers
+        self.abstractDb.checkAndCreateStyleTable()
+        runner = BatchDbRunner.fromAbstractDb(self.abstractDb)
+        runner.pool.resolveCredentials(serverDbName)
+        try:
+            createdDict, errorDict = runner.runJobs(dbNameList, lambda dbName: runner.pool.getDb(serverDbName).createDbFromTemplate(dbName, templateName = templateName), progress = progress)
+        finally:
+            runner.shutdown()
+        outputDbDict = {dbName : self.instantiateNewDb(dbName) for dbName in createdDict.keys()}
+        return outputDbDict, errorDict
+
+    def createFrames(self, outputDbDict, miDict, paramDict, progress = None):
+        """
+        Creates the frames of the new databases concurrently.
+        """
+        def createFrame(abstractDb):
+            mi = miDict[abstractDb.getDatabaseName()]
+            scale = self.scaleMIDict[len(mi.split('-'))]
+            abstractDb.createFrame('mi', scale, mi, paramDict = paramDict)
+        runner = BatchDbRunner.fromAbstractDb(self.abstractDb)
+        try:
+            successList, errorDict = runner.run(outputDbDict.keys(), createFrame, progress = progress)
+        finally:
+            runner.shutdown()
+        return errorDict
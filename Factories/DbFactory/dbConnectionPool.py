@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2018-03-12
+        git sha              : $Format:%H$
+        copyright            : (C) 2018 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import threading
+from Queue import Queue, Empty
+from collections import OrderedDict
+
+from PyQt4.QtCore import QObject, QSettings, QEventLoop
+from PyQt4.QtGui import QApplication
+from qgis.core import QgsCredentials
+
+#DSG Tools imports
+from DsgTools.Factories.DbFactory.dbFactory import DbFactory
+
+def getMaxDbWorkers():
+    """
+    Gets the number of databases that batch operations may handle at the same time.
+    It is read from PythonPlugins/DsgTools/Options/maxDbWorkers (default 4).
+    """
+    settings = QSettings()
+    settings.beginGroup('PythonPlugins/DsgTools/Options')
+    maxDbWorkers = settings.value('maxDbWorkers')
+    settings.endGroup()
+    try:
+        return max(1, int(maxDbWorkers))
+    except (TypeError, ValueError):
+        return 4
+
+class DbConnectionPool(QObject):
+    """
+    Keeps reusable connections keyed by server and database.
+    QSqlDatabase connections can only be used by the thread that created them,
+    therefore each thread has its own set of pooled connections. At most
+    maxConnectionsPerThread connections are kept open by each thread (least
+    recently used connections are closed first).
+    """
+    def __init__(self, host, port, user, password, driverName = 'QPSQL', maxConnectionsPerThread = 4):
+        super(DbConnectionPool, self).__init__()
+        self.serverParameters = (host, port, user, password)
+        self.driverName = driverName
+        self.maxConnectionsPerThread = maxConnectionsPerThread
+        self.dbFactory = DbFactory()
+        self.threadData = threading.local()
+
+    @classmethod
+    def fromAbstractDb(cls, abstractDb, maxConnectionsPerThread = 4):
+        """
+        Builds a pool for the server abstractDb is connected to.
+        """
+        (host, port, user, password) = abstractDb.getDatabaseParameters()
+        return cls(host, port, user, password, maxConnectionsPerThread = maxConnectionsPerThread)
+
+    def resolveCredentials(self, dbName):
+        """
+        Asks for the pool server password when it is not known, as connectDatabaseWithParameters does
+        (same connection info, so that stored credentials are shared).
+        dbName: database the pool connects to first
+        It must be called in the GUI thread, before workers use the pool.
+        """
+        (host, port, user, password) = self.serverParameters
+        if password or not self.isGuiThread():
+            return
+        conInfo = 'host='+host+' port='+str(port)+' dbname='+dbName
+        (success, user, password) = QgsCredentials.instance().get(conInfo, user, None)
+        if success:
+            self.serverParameters = (host, port, user, password)
+            QgsCredentials.instance().put(conInfo, user, password)
+
+    def isGuiThread(self):
+        return isinstance(threading.current_thread(), threading._MainThread)
+
+    def getThreadConnections(self):
+        if not hasattr(self.threadData, 'connectionDict'):
+            self.threadData.connectionDict = OrderedDict()
+        return self.threadData.connectionDict
+
+    def getDb(self, dbName, serverParameters = None):
+        """
+        Gets an opened abstractDb for dbName on the server given by serverParameters
+        (host, port, user, password). If serverParameters is None, the pool server is used.
+        The connection belongs to the calling thread.
+        """
+        if not serverParameters:
+            serverParameters = self.serverParameters
+        (host, port, user, password) = serverParameters
+        key = (host, int(port), user, dbName)
+        connectionDict = self.getThreadConnections()
+        if key in connectionDict:
+            abstractDb = connectionDict.pop(key)
+        else:
+            if not password and not self.isGuiThread():
+                #asking for credentials would open a dialog outside the GUI thread
+                raise Exception(self.tr('No password available to connect to {0} on {1}:{2}.').format(dbName, host, port))
+            abstractDb = self.dbFactory.createDbFactory(self.driverName)
+            abstractDb.connectDatabaseWithParameters(host, str(port), dbName, user, password)
+        #reinserting to keep the least recently used connection at the beginning
+        connectionDict[key] = abstractDb
+        while len(connectionDict) > self.maxConnectionsPerThread:
+            oldKey, oldDb = connectionDict.popitem(last = False)
+            self.closeDb(oldDb)
+        abstractDb.checkAndOpenDb()
+        return abstractDb
+
+    def releaseDb(self, dbName, serverParameters = None):
+        """
+        Closes the calling thread connection to dbName (e.g. before dropping it or using it as template).
+        """
+        if not serverParameters:
+            serverParameters = self.serverParameters
+        (host, port, user, password) = serverParameters
+        key = (host, int(port), user, dbName)
+        abstractDb = self.getThreadConnections().pop(key, None)
+        if abstractDb:
+            self.closeDb(abstractDb)
+
+    def closeDb(self, abstractDb):
+        if abstractDb.db.isOpen():
+            abstractDb.db.close()
+
+    def closeThreadConnections(self):
+        """
+        Closes every connection opened by the calling thread.
+        """
+        connectionDict = self.getThreadConnections()
+        while connectionDict:
+            key, abstractDb = connectionDict.popitem()
+            self.closeDb(abstractDb)
+
+class BatchDbRunner(QObject):
+    """
+    Runs a function over a list of databases using a bounded pool of worker threads.
+    Each worker gets its connections from a DbConnectionPool, so connections are
+    reused by all jobs handled by the same worker until shutdown is called.
+    Functions run outside the GUI thread, therefore they must not touch widgets nor
+    connections created by other threads (use runner.pool.getDb instead).
+    """
+    def __init__(self, pool, maxWorkers = None):
+        super(BatchDbRunner, self).__init__()
+        self.pool = pool
+        self.maxWorkers = maxWorkers if maxWorkers else getMaxDbWorkers()
+        self.jobQueue = Queue()
+        self.workerList = []
+
+    @classmethod
+    def fromAbstractDb(cls, abstractDb, maxWorkers = None):
+        return cls(DbConnectionPool.fromAbstractDb(abstractDb), maxWorkers = maxWorkers)
+
+    def startWorkers(self, numberOfJobs):
+        """
+        Starts workers until there is one per job or maxWorkers is reached.
+        """
+        while len(self.workerList) < min(self.maxWorkers, numberOfJobs):
+            worker = threading.Thread(target = self.work)
+            worker.daemon = True
+            worker.start()
+            self.workerList.append(worker)
+
+    def work(self):
+        while True:
+            job = self.jobQueue.get()
+            if job is None:
+                self.pool.closeThreadConnections()
+                self.jobQueue.task_done()
+                return
+            key, function, resultQueue = job
+            try:
+                resultQueue.put((key, True, function(key)))
+            except Exception as e:
+                resultQueue.put((key, False, self.buildErrorMessage(e)))
+            finally:
+                self.jobQueue.task_done()
+
+    def buildErrorMessage(self, e):
+        errors = []
+        for arg in e.args:
+            if isinstance(arg, unicode):
+                errors.append(arg.encode('utf-8'))
+            else:
+                errors.append(str(arg))
+        return ':'.join(errors)
+
+    def runJobs(self, keyList, function, progress = None):
+        """
+        Runs function(key) for each key in keyList.
+        Blocks until every job is done, keeping the GUI painted meanwhile.
+        Each call has its own result queue, so calls made while events are processed do not block each other.
+        Functions that connect through the pool need pool.resolveCredentials called first (map does it).
+        progress: optional ProgressWidget stepped once per finished job.
+        Returns (resultDict, exceptionDict), both keyed by key.
+        """
+        resultDict = dict()
+        exceptionDict = dict()
+        if not keyList:
+            return resultDict, exceptionDict
+        resultQueue = Queue()
+        self.startWorkers(len(keyList))
+        for key in keyList:
+            self.jobQueue.put((key, function, resultQueue))
+        pending = len(keyList)
+        while pending > 0:
+            try:
+                key, success, result = resultQueue.get(timeout = 0.1)
+            except Empty:
+                QApplication.processEvents(QEventLoop.ExcludeUserInputEvents)
+                continue
+            pending -= 1
+            if success:
+                resultDict[key] = result
+            else:
+                exceptionDict[key] = result
+            if progress:
+                progress.step()
+        return resultDict, exceptionDict
+
+    def map(self, dbNameList, function, progress = None):
+        """
+        Runs function(abstractDb) for each database in dbNameList, abstractDb
+        being a pooled connection to the database.
+        Returns (resultDict, exceptionDict), both keyed by database name.
+        """
+        if dbNameList:
+            #credentials can only be asked in the GUI thread
+            self.pool.resolveCredentials(dbNameList[0])
+        return self.runJobs(dbNameList, lambda dbName: function(self.pool.getDb(dbName)), progress = progress)
+
+    def run(self, dbNameList, function, progress = None):
+        """
+        Same as map, returning (successList, exceptionDict) as the batch operations do.
+        successList keeps the order of dbNameList.
+        """
+        resultDict, exceptionDict = self.map(dbNameList, function, progress = progress)
+        successList = [dbName for dbName in dbNameList if dbName in resultDict]
+        return successList, exceptionDict
+
+    def shutdown(self):
+        """
+        Stops the workers, closing their pooled connections.
+        """
+        for worker in self.workerList:
+            self.jobQueue.put(None)
+        for worker in self.workerList:
+            worker.join()
+        self.workerList = []
@@ -24,7 +24,7 @@ from DsgTools.Factories.DbFactory.abstractDb import AbstractDb
 from PyQt4.QtSql import QSqlQuery, QSqlDatabase
 from PyQt4.QtCore import QSettings
 from DsgTools.Factories.SqlFactory.sqlGeneratorFactory import SqlGeneratorFactory
-from qgis.core import QgsCredentials, QgsMessageLog, QgsDataSourceURI, QgsFeature, QgsVectorLayer, QgsField, QgsGeometry
+from qgis.core import QgsCredentials, QgsMessageLog, QgsDataSourceURI, QgsFeature, QgsVectorLayer, QgsField, QgsGeometry, QgsCoordinateReferenceSystem
 from osgeo import ogr
 from uuid import uuid4
 import codecs, os, json, binascii, re
@@ -42,6 +42,8 @@ class PostgisDb(AbstractDb):
         #setting up a sql generator
         self.gen = SqlGeneratorFactory().createSqlGenerator(False)
         self.databaseEncoding = 'utf-8'
+        self.validationHistoryUpgraded = False
+        self.validationHistoryColumns = None
         # dict to text showing for no process or class selected
         self.dictNoClassNoProcess = { 'No Process' : self.tr("Select a process..."),
                                         'No Layer' : self.tr("Select a layer...") }
@@ -448,38 +450,27 @@ class PostgisDb(AbstractDb):
         if not query.isActive():
             raise Exception(self.tr("Problem loading associated features: ")+query.lastError().text())
 
+        linkList = []
         while query.next():
-            #setting the variables
-            complex_schema = query.value(0)
-            complex = query.value(1)
-            aggregated_schema = query.value(2)
-            aggregated_class = query.value(3)
-            column_name = query.value(4)
+            #complex_schema, complex, aggregated_schema, aggregated_class, column_name
+            linkList.append((query.value(0), query.value(1), query.value(2), query.value(3), query.value(4)))
+        if not linkList:
+            return associatedDict
 
-            #query to obtain the created complexes
-            sql = self.gen.getComplexData(complex_schema, complex)
-            complexQuery = QSqlQuery(sql, self.db)
-            if not complexQuery.isActive():
-                raise Exception(self.tr("Problem loading associated features: ")+complexQuery.lastError().text())
-
-            while complexQuery.next():
-                complex_uuid = complexQuery.value(0)
-                name = complexQuery.value(1)
-
-                if not (complex_uuid and name):
-                    continue
-                
-                associatedDict = self.utils.buildNestedDict(associatedDict, [name, complex_uuid, aggregated_class], [])
-                
-                #query to obtain the id of the associated feature
-                sql = self.gen.getAssociatedFeaturesData(aggregated_schema, aggregated_class, column_name, complex_uuid)
-                associatedQuery = QSqlQuery(sql, self.db)
-                if not associatedQuery.isActive():
-                    raise Exception(self.tr("Problem loading associated features: ")+associatedQuery.lastError().text())
-
-                while associatedQuery.next():
-                    ogc_fid = associatedQuery.value(0)
-                    associatedDict = self.utils.buildNestedDict(associatedDict, [name, complex_uuid, aggregated_class], [ogc_fid])
+        #one query for all links, each link being a join between the complex and the aggregated class
+        sql = self.gen.getAssociatedFeaturesFromComplexLinks(linkList)
+        associatedQuery = QSqlQuery(sql, self.db)
+        if not associatedQuery.isActive():
+            raise Exception(self.tr("Problem loading associated features: ")+associatedQuery.lastError().text())
+        while associatedQuery.next():
+            complex_uuid = associatedQuery.value(0)
+            name = associatedQuery.value(1)
+            aggregated_class = associatedQuery.value(2)
+            #text, the aggregated class may be a complex (uuid id)
+            ogc_fid = associatedQuery.value(3)
+            idList = associatedDict.setdefault(name, dict()).setdefault(complex_uuid, dict()).setdefault(aggregated_class, [])
+            if ogc_fid:
+                idList.append(ogc_fid)
         return associatedDict
     
     def isComplexClass(self, className):
@@ -765,8 +756,10 @@ class PostgisDb(AbstractDb):
     
     def getEDGVDbsFromServer(self, parentWidget = None):
         """
-        Gets edgv databases from 'this' server
+        Gets edgv databases from 'this' server.
+        Databases are inspected concurrently through pooled connections.
         """
+        from DsgTools.Factories.DbFactory.dbConnectionPool import BatchDbRunner
         #Can only be used in postgres database.
         self.checkAndOpenDb()
         query = QSqlQuery(self.gen.getDatabasesFromServer(),self.db)
@@ -778,39 +771,42 @@ class PostgisDb(AbstractDb):
         while query.next():
             dbList.append(query.value(0))
         
-        edvgDbList = []
+        progress = None
         if parentWidget:
             progress = ProgressWidget(1,len(dbList),self.tr('Reading selected databases... '), parent = parentWidget)
             progress.initBar()
-        for database in dbList:
-            db = None
-            db = QSqlDatabase("QPSQL")
-            db.setDatabaseName(database)
-            db.setHostName(self.db.hostName())
-            db.setPort(self.db.port())
-            db.setUserName(self.db.userName())
-            db.setPassword(self.db.password())
-            if not db.open():
-                raise Exception(self.tr("Problem opening databases: ")+db.lastError().databaseText())
-
-            query2 = QSqlQuery(db)
-            if query2.exec_(self.gen.getGeometryTablesCount()):
-                while query2.next():
-                    count = query2.value(0)
-                    if count > 0:
-                        query3 = QSqlQuery(db)
-                        if query3.exec_(self.gen.getEDGVVersion()):
-                            while query3.next():
-                                version = query3.value(0)
-                                if version:
-                                    edvgDbList.append((database,version))
-                                else:
-                                    edvgDbList.append((database,'Non_EDGV'))
-                        else:
-                            edvgDbList.append((database,'Non_EDGV'))
-            if parentWidget:
-                progress.step()
+        runner = BatchDbRunner.fromAbstractDb(self)
+        try:
+            versionDict, exceptionDict = runner.map(dbList, lambda abstractDb: abstractDb.getEDGVVersionIfGeometric(), progress = progress)
+        finally:
+            runner.shutdown()
+        if exceptionDict:
+            raise Exception(self.tr("Problem opening databases: ")+'\n'.join(exceptionDict.values()))
+        edvgDbList = [(database, versionDict[database]) for database in dbList if versionDict[database]]
         return edvgDbList
+
+    def getEDGVVersionIfGeometric(self):
+        """
+        Gets the EDGV version ('Non_EDGV' when it is not an EDGV database) of databases
+        with geometry tables. Returns None when there are no geometry tables.
+        """
+        self.checkAndOpenDb()
+        query = QSqlQuery(self.db)
+        if not query.exec_(self.gen.getGeometryTablesCount()):
+            return None
+        version = None
+        while query.next():
+            count = query.value(0)
+            if count > 0:
+                versionQuery = QSqlQuery(self.db)
+                if versionQuery.exec_(self.gen.getEDGVVersion()):
+                    while versionQuery.next():
+                        version = versionQuery.value(0)
+                        if not version:
+                            version = 'Non_EDGV'
+                else:
+                    version = 'Non_EDGV'
+        return version
     
     def getDbsFromServer(self):
         """
@@ -1027,7 +1023,61 @@ class PostgisDb(AbstractDb):
                     raise Exception(self.tr('Problem creating structure: ') + query.lastError().text())
             if useTransaction:
                 self.db.commit()
-                
+        try:
+            self.checkAndUpgradeValidationHistory()
+        except Exception as e:
+            # users that do not own the validation schema still validate, their history is written as before
+            QgsMessageLog.logMessage(':'.join(e.args), "DSG Tools Plugin", QgsMessageLog.WARNING)
+
+    def checkAndUpgradeValidationHistory(self):
+        """
+        Adds the username and run id columns to validation.process_history if the structure
+        was created before them and creates the consolidated history views when they are missing.
+        The catalog is read first, so nothing is written when the structure is up to date.
+        It runs only once per connection and only from the structure creation path.
+        """
+        if self.validationHistoryUpgraded:
+            return
+        self.checkAndOpenDb()
+        if all(self.getValidationHistoryStructure().values()):
+            query = QSqlQuery(self.gen.getValidationHistoryMissingRunIdQuery(), self.db)
+            if not query.isActive():
+                raise Exception(self.tr('Problem upgrading validation history: ') + query.lastError().text())
+            while query.next():
+                if not query.value(0):
+                    self.validationHistoryUpgraded = True
+                    return
+        query = QSqlQuery(self.db)
+        if not query.exec_(self.gen.upgradeValidationHistoryQuery()):
+            raise Exception(self.tr('Problem upgrading validation history: ') + query.lastError().text())
+        self.validationHistoryUpgraded = True
+        self.validationHistoryColumns = True
+
+    def getValidationHistoryStructure(self):
+        """
+        Returns a dict telling which parts of the validation history structure exist
+        (has_username, has_run_id, has_username_idx, has_run_id_idx, has_compact_view, has_history_view).
+        """
+        self.checkAndOpenDb()
+        query = QSqlQuery(self.gen.getValidationHistoryStructureQuery(), self.db)
+        if not query.isActive():
+            raise Exception(self.tr('Problem reading validation history structure: ') + query.lastError().text())
+        structureDict = dict()
+        while query.next():
+            record = query.record()
+            for i in range(record.count()):
+                structureDict[record.fieldName(i)] = query.value(i)
+        return structureDict
+
+    def hasValidationHistoryColumns(self):
+        """
+        Tells if validation.process_history has the username and run id columns. It is read once per connection.
+        """
+        if self.validationHistoryColumns is None:
+            structureDict = self.getValidationHistoryStructure()
+            self.validationHistoryColumns = structureDict['has_username'] and structureDict['has_run_id']
+        return self.validationHistoryColumns
+
     def getValidationStatus(self, processName):
         """
         Gets the validation status for a specific process
@@ -1058,13 +1108,17 @@ class PostgisDb(AbstractDb):
             ret = query.value(0)
         return ret
 
-    def setValidationProcessStatus(self, processName, log, status):
+    def setValidationProcessStatus(self, processName, log, status, username = None, runId = None):
         """
         Sets the validation status for a specific process
         processName: process name
+        username: database user that ran the process
+        runId: identifier shared by all status records of the same process run
         """
         self.checkAndOpenDb()
-        sql = self.gen.setValidationStatusQuery(processName, log, status)
+        if not self.hasValidationHistoryColumns():
+            username, runId = None, None
+        sql = self.gen.setValidationStatusQuery(processName, log, status, username = username, runId = runId)
         query = QSqlQuery(self.db)
         if not query.exec_(sql):
             raise Exception(self.tr('Problem setting status: ') + query.lastError().text())
@@ -1132,12 +1186,13 @@ class PostgisDb(AbstractDb):
             dimension = query.value(0)
         return dimension
     
-    def getExplodeCandidates(self, cl):
+    def getExplodeCandidates(self, cl, keyColumn = 'id', geomColumn = 'geom', idList = None):
         """
         Gets multi geometries (i.e number of parts > 1) that will be deaggregated later
+        idList: optional list of key values the search is restricted to
         """
         self.checkAndOpenDb()
-        sql= self.gen.getMulti(cl)
+        sql= self.gen.getMulti(cl, keyColumn = keyColumn, geomColumn = geomColumn, idList = idList)
         query = QSqlQuery(sql, self.db)
         if not query.isActive():
             raise Exception(self.tr('Problem exploding candidates: ') + query.lastError().text())
@@ -1146,6 +1201,35 @@ class PostgisDb(AbstractDb):
             idList.append(query.value(0))
         return idList
 
+    def deaggregateGeometries(self, tableSchema, tableName, keyColumn = 'id', geomColumn = 'geom', idList = None, subsetString = None, useTransaction = True):
+        """
+        Deaggregates the multi part geometries of tableSchema.tableName on the server, in one transaction.
+        Records without geometry are deleted, as done by the edit buffer deaggregation.
+        idList: optional list of key values the deaggregation is restricted to
+        subsetString: optional layer filter (where clause) the deaggregation is restricted to
+        Returns the number of new records (parts) created.
+        """
+        self.checkAndOpenDb()
+        cl = '{0}.{1}'.format(tableSchema, tableName)
+        attributeList = [attribute for attribute in self.getAttributesFromTable(tableSchema, tableName) if attribute not in (keyColumn, geomColumn)]
+        if useTransaction:
+            self.db.transaction()
+        query = QSqlQuery(self.db)
+        if not query.exec_(self.gen.deleteNullGeometries(cl, keyColumn = keyColumn, geomColumn = geomColumn, idList = idList, subsetString = subsetString)):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem deaggregating geometries from {0}: ').format(cl) + query.lastError().text())
+        if not query.exec_(self.gen.deaggregateGeometries(cl, attributeList, keyColumn = keyColumn, geomColumn = geomColumn, idList = idList, subsetString = subsetString)):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem deaggregating geometries from {0}: ').format(cl) + query.lastError().text())
+        newParts = 0
+        while query.next():
+            newParts = query.value(0)
+        if useTransaction:
+            self.db.commit()
+        return newParts
+
     def getURI(self, table, useOnly = True, geomColumn = 'geom'):
         """
         Gets tabel URI
@@ -1348,6 +1432,74 @@ class PostgisDb(AbstractDb):
             flagsDict[cl].append({'id':str(id), 'geometry_column':geometry_column})
         return flagsDict
     
+    def getFlaggedClassesByProcess(self, processName):
+        """
+        Gets the classes flagged by a process, without fetching the flags themselves
+        processName: process name
+        returns: dict {class: {'geometry_column': geometry column, 'count': number of flagged features}}
+        """
+        self.checkAndOpenDb()
+        classDict = dict()
+        sql = self.gen.getFlaggedClassesByProcess(processName)
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(self.tr('Problem getting flagged classes: ') + query.lastError().text())
+        while query.next():
+            classDict[query.value(0)] = {'geometry_column':query.value(1), 'count':query.value(2)}
+        return classDict
+
+    def forceValidityFromFlags(self, cl, flagClass, processName, geometryColumn, keyColumn, useTransaction = True):
+        """
+        Forces geometry validity (i.e uses ST_MakeValid) of the features flagged by processName.
+        Flags are joined on the server instead of being sent back as an id list.
+        cl: class to be fixed (e.g. the temp table of flagClass)
+        flagClass: class name stored on the flags
+        processName: name of the process that raised the flags
+        geometryColumn: geometry column
+        keyColumn: pk column
+        returns: number of changed features
+        """
+        self.checkAndOpenDb()
+        tableSchema, tableName = self.getTableSchema(cl)
+        # specific EPSG search
+        parameters = {'tableSchema':tableSchema, 'tableName':tableName, 'geometryColumn':geometryColumn}
+        srid = self.findEPSG(parameters=parameters)
+        sql = self.gen.forceValidityFromFlags(tableSchema, tableName, processName, flagClass, srid, keyColumn, geometryColumn)
+        query = QSqlQuery(self.db)
+        if useTransaction:
+            self.db.transaction()
+        if not query.exec_(sql):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem forcing validity of features from ')+cl+': '+ query.lastError().text())
+        changed = query.numRowsAffected()
+        if useTransaction:
+            self.db.commit()
+        return changed
+
+    def removeFlaggedFeatures(self, cl, processName, keyColumn, useTransaction = True):
+        """
+        Removes the features of cl flagged by processName, joining the flags on the server
+        cl: class name
+        processName: name of the process that raised the flags
+        keyColumn: pk column
+        returns: number of removed features
+        """
+        self.checkAndOpenDb()
+        tableSchema, tableName = self.getTableSchema(cl)
+        sql = self.gen.deleteFlaggedFeatures(tableSchema, tableName, processName, cl, keyColumn)
+        query = QSqlQuery(self.db)
+        if useTransaction:
+            self.db.transaction()
+        if not query.exec_(sql):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem deleting features from ')+cl+': '+ query.lastError().text())
+        removed = query.numRowsAffected()
+        if useTransaction:
+            self.db.commit()
+        return removed
+
     def forceValidity(self, cl, processList, keyColumn, useTransaction = True):
         """
         Forces geometry validity (i.e uses ST_MakeValid)
@@ -1728,6 +1880,81 @@ class PostgisDb(AbstractDb):
         if useTransaction:
             self.db.commit()
     
+    def cleanGeometries(self, cl, snap, minArea, geometryColumn, keyColumn, isPolygon, smallAngle, useTransaction = True):
+        """
+        Cleans the geometries of cl (usually a temp table) on the server, in one transaction:
+        features are snapped to each other, lines (or area boundaries) are noded over a shared
+        edge network, duplicated edges are dropped and small areas are merged into their neighbours.
+        Returns a list of (feature id, error code, geometry) with the cleaning errors.
+        """
+        self.checkAndOpenDb()
+        tableSchema, tableName = cl.replace('"', '').split('.')
+        attributeList = [attribute for attribute in self.getAttributesFromTable(tableSchema, tableName) if attribute not in (keyColumn, geometryColumn)]
+        networkTables = ['dsg_clean_lines', 'dsg_clean_edges', 'dsg_clean_owners', 'dsg_clean_faces', 'dsg_clean_face_owners']
+        sqlList = []
+        if snap > 0:
+            sqlList.append(self.gen.snapWithinClass(cl, snap, geometryColumn, keyColumn))
+        sqlList += self.gen.buildEdgeNetwork([(cl, geometryColumn, keyColumn, isPolygon)], *networkTables[0:3]).split('#')
+        if isPolygon:
+            sqlList += self.gen.buildCleanedFaces(cl, minArea, geometryColumn, keyColumn, networkTables[1], *networkTables[3:5]).split('#')
+        if useTransaction:
+            self.db.transaction()
+        query = QSqlQuery(self.db)
+        for sql in sqlList:
+            if not query.exec_(sql):
+                if useTransaction:
+                    self.db.rollback()
+                raise Exception(self.tr('Problem cleaning geometries from {0}: ').format(cl) + query.lastError().text())
+        # flags are read before the features are rebuilt
+        if not query.exec_(self.gen.getCleaningFlags(isPolygon, smallAngle, *networkTables)):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem getting cleaning flags from {0}: ').format(cl) + query.lastError().text())
+        flagList = []
+        while query.next():
+            flagList.append((query.value(0), query.value(1), query.value(2)))
+        if isPolygon:
+            sqlList = self.gen.rebuildCleanedPolygons(cl, geometryColumn, keyColumn, *networkTables[3:5]).split('#')
+        else:
+            sqlList = [self.gen.rebuildCleanedLines(cl, attributeList, geometryColumn, keyColumn, networkTables[1], networkTables[2])]
+        sqlList += self.gen.dropEdgeNetwork(networkTables).split('#')
+        for sql in sqlList:
+            if not query.exec_(sql):
+                if useTransaction:
+                    self.db.rollback()
+                raise Exception(self.tr('Problem cleaning geometries from {0}: ').format(cl) + query.lastError().text())
+        if useTransaction:
+            self.db.commit()
+        return flagList
+
+    def topologicalSimplification(self, tableList, tol, snap, useTransaction = True):
+        """
+        Simplifies the tables of tableList (list of (table, geometry column, key column, isPolygon))
+        with Douglas-Peucker, preserving the topology between all of them: the edges shared by
+        features (of any table) are simplified once and the features are rebuilt from them.
+        """
+        self.checkAndOpenDb()
+        networkTables = ['dsg_simplify_lines', 'dsg_simplify_edges', 'dsg_simplify_owners']
+        sqlList = []
+        if snap > 0:
+            for cl, geometryColumn, keyColumn, isPolygon in tableList:
+                sqlList.append(self.gen.snapWithinClass(cl, snap, geometryColumn, keyColumn))
+        sqlList += self.gen.buildEdgeNetwork(tableList, *networkTables).split('#')
+        sqlList.append(self.gen.simplifyEdges(networkTables[1], tol))
+        for cl, geometryColumn, keyColumn, isPolygon in tableList:
+            sqlList.append(self.gen.rebuildSimplifiedGeometries(cl, geometryColumn, keyColumn, isPolygon, networkTables[1], networkTables[2]))
+        sqlList += self.gen.dropEdgeNetwork(networkTables).split('#')
+        if useTransaction:
+            self.db.transaction()
+        query = QSqlQuery(self.db)
+        for sql in sqlList:
+            if not query.exec_(sql):
+                if useTransaction:
+                    self.db.rollback()
+                raise Exception(self.tr('Problem simplifying geometries: ') + query.lastError().text())
+        if useTransaction:
+            self.db.commit()
+
     def runQuery(self, sql, errorMsg, params, useTransaction = True):
         self.checkAndOpenDb()
         if useTransaction:
@@ -1808,6 +2035,12 @@ class PostgisDb(AbstractDb):
             if useTransaction:
                 self.db.rollback()
             raise Exception(self.tr('Problem creating spatial index on temp table {}: '.format(tableName)) + query.lastError().text())
+        #statistics let the planner use the spatial index on the freshly populated table
+        analyzeSql = self.gen.analyzeTempTable(tableName)
+        if not query.exec_(analyzeSql):
+            if useTransaction:
+                self.db.rollback()
+            raise Exception(self.tr('Problem analyzing temp table {}: '.format(tableName)) + query.lastError().text())
         if useTransaction:
             self.db.commit()        
         
@@ -1885,6 +2118,26 @@ class PostgisDb(AbstractDb):
                 qml = self.utils.parseStyle(qml)
         return qml
     
+    def getStyleDict(self, styleName, tableList, parsing = True):
+        """
+        Gets styleName for each table in tableList with one query.
+        Returns {tableName: qml}
+        """
+        self.checkAndOpenDb()
+        styleDict = dict()
+        if not tableList:
+            return styleDict
+        sql = self.gen.getStyles(styleName, tableList)
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(self.tr("Problem getting styles from db: ") + query.lastError().text())
+        while query.next():
+            qml = query.value(1)
+            if parsing and qml:
+                qml = self.utils.parseStyle(qml)
+            styleDict[query.value(0)] = qml
+        return styleDict
+    
     def importStyle(self, styleName, table_name, qml, tableSchema, useTransaction = True):
         self.checkAndOpenDb()
         if useTransaction:
@@ -2597,6 +2850,20 @@ class PostgisDb(AbstractDb):
             return 'template_edgv_fter_2a_ed'
         elif version == '3.0':
             return 'template_edgv_3'
+
+    def getSridTemplateName(self, version, srid):
+        """
+        Name of the template of version already reprojected to srid
+        """
+        return '{0}_{1}'.format(self.getTemplateName(version), srid)
+
+    def checkDatabaseExists(self, dbName):
+        self.checkAndOpenDb()
+        sql = self.gen.checkIfTemplate(dbName)
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(self.tr("Problem checking database: ")+query.lastError().text())
+        return query.next()
     
     def setDbAsTemplate(self, version = None, dbName = None, setTemplate = True, useTransaction = True):
         self.checkAndOpenDb()
@@ -2820,6 +3087,58 @@ class PostgisDb(AbstractDb):
         if not query.exec_(sql):
             raise Exception(self.tr("Problem dropping profile: ")+ roleName + ' :' + query.lastError().text())
     
+    def dropRolesOnDatabase(self, roleList):
+        """
+        Drops all roles in roleList with a single drop owned by and drop role.
+        """
+        self.checkAndOpenDb()
+        sql = self.gen.dropRolesOnDatabase(roleList)
+        query = QSqlQuery(self.db)
+        if not query.exec_(sql):
+            raise Exception(self.tr("Problem dropping profile: ")+ ', '.join(roleList) + ' :' + query.lastError().text())
+
+    def grantRoles(self, userList, roleList):
+        """
+        Grants all roles in roleList to all users in userList with a single statement
+        """
+        self.checkAndOpenDb()
+        sql = self.gen.grantRoles(userList, roleList)
+        query = QSqlQuery(self.db)
+        if not query.exec_(sql):
+            raise Exception(self.tr('Problem granting profile: ') + ', '.join(roleList) + '\n' + query.lastError().text())
+
+    def revokeRoles(self, userList, roleList):
+        """
+        Revokes all roles in roleList from all users in userList with a single statement
+        """
+        self.checkAndOpenDb()
+        sql = self.gen.revokeRoles(userList, roleList)
+        query = QSqlQuery(self.db)
+        if not query.exec_(sql):
+            raise Exception(self.tr('Problem revoking profile: ') + ', '.join(roleList) + '\n' + query.lastError().text())
+
+    def getRoleCatalogSnapshot(self):
+        """
+        Reads the roles of the whole server with a single query. Returns a tuple:
+        dbRolesDict = { 'dbname' : [-list of roles-] }
+        grantedRoleDict = { roleName : set(-users and roles granted to it-) }
+        """
+        self.checkAndOpenDb()
+        sql = self.gen.getRoleCatalogSnapshot()
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(self.tr("Problem getting roles dict: ")+query.lastError().text())
+        dbRoleSetDict = dict()
+        grantedRoleDict = dict()
+        while query.next():
+            dbName, roleName, userName = query.value(0), query.value(1), query.value(2)
+            dbRoleSetDict.setdefault(dbName, set()).add(roleName)
+            userSet = grantedRoleDict.setdefault(roleName, set())
+            if userName:
+                userSet.add(userName)
+        dbRolesDict = dict((dbName, sorted(roleSet)) for dbName, roleSet in dbRoleSetDict.iteritems())
+        return dbRolesDict, grantedRoleDict
+
     def getRoleFromAdminDb(self, roleName, edgvVersion):
         """
         Gets role from public.permission_profile
@@ -3386,6 +3705,25 @@ class PostgisDb(AbstractDb):
         while query.next():
             return query.value(0)
     
+    def getPrimaryKeyColumnDict(self, tableList):
+        """
+        Gets the primary key column of each table in tableList (list of (tableSchema, tableName)) with one query.
+        Returns {(tableSchema, tableName): pkColumn}
+        """
+        self.checkAndOpenDb()
+        pkDict = dict()
+        if not tableList:
+            return pkDict
+        sql = self.gen.getPrimaryKeyColumns(tableList)
+        query = QSqlQuery(sql, self.db)
+        if not query.isActive():
+            raise Exception(self.tr("Problem getting primary key columns: ")+query.lastError().text())
+        while query.next():
+            key = (query.value(0), query.value(1))
+            if key not in pkDict:
+                pkDict[key] = query.value(2)
+        return pkDict
+    
     def dropAllConections(self, dbName):
         """
         Terminates all database conections
@@ -3620,74 +3958,37 @@ class PostgisDb(AbstractDb):
             nrFlags += 1
         return nrFlags
 
-    def createValidationHistoryViewTable(self, idListString=None):
-        """
-        Creates the view table for validation processes history. 
-        """
-        self.checkAndOpenDb()
-        sql = self.gen.createValidationHistoryViewTableQuery(idListString=idListString)
-        query = QSqlQuery(sql, self.db)
-        if not query.isActive():
-            raise Exception(self.tr("Problem while retrieving validation processes history table: ")+query.lastError().text())
-        return
-    
-    def getValidationLog(self, idList=False):
+    def getValidationHistoryUsernames(self):
         """
-        Returns a list of all logs registered for each process executed.
+        Returns the sorted list of usernames that ran validation processes.
         """
-        # ALTERAR PARA FUNÇÃO DE UPDATE DA TABELA PARA QUE INCLUA OS NOMES DE USUÁRIOS
         self.checkAndOpenDb()
-        sql = self.gen.getValidationLogQuery()
+        sql = self.gen.getValidationHistoryUsernamesQuery(historyColumns = self.hasValidationHistoryColumns())
         query = QSqlQuery(sql, self.db)
-        log = [] # list of logs
-        idL = [] # list of ID in the same order as the logs appears
         if not query.isActive():
-            raise Exception(self.tr("Problem while retrieving validation processes history table: ")+query.lastError().text())
+            raise Exception(self.tr("Problem while retrieving validation processes history users: ")+query.lastError().text())
+        usernameList = []
         while query.next():
-            log.append(query.value(0).encode(self.databaseEncoding))
-            idL.append(query.value(1))
-        if idList:            
-            return log, idL
-        else:
-            return log
-        
-    def getValidationHistory(self, idListString=False):
+            usernameList.append(query.value(0))
+        return usernameList
+
+    def getValidationHistoryPage(self, username = None, withoutUsername = False, limit = 200, offset = 0):
         """
-        Returns a list of all logs registered for each process executed.
-        :param idList: boolean indicating whether or not to return the list of IDs as well.
-        :param consolidate: boolean indicating whether or not the logs should be consoliodated into one.
+        Returns a page of the consolidated validation history (one row per process run, newest first)
+        as a list of [process_name, log, status, finished, username].
+        :param username: if given, only runs from this user are returned.
+        :param withoutUsername: if True, only runs with no username are returned.
         """
-        # ALTERAR PARA FUNÇÃO DE UPDATE DA TABELA PARA QUE INCLUA OS NOMES DE USUÁRIOS
         self.checkAndOpenDb()
-        sql = self.gen.getValidationHistoryQuery(idListString=idListString)
+        sql = self.gen.getValidationHistoryPageQuery(username = username, withoutUsername = withoutUsername, limit = limit, offset = offset, historyColumns = self.hasValidationHistoryColumns())
         query = QSqlQuery(sql, self.db)
-        history = [] # list of logs
         if not query.isActive():
             raise Exception(self.tr("Problem while retrieving validation processes history table: ")+query.lastError().text())
+        history = []
         while query.next():
             history.append([query.value(0), query.value(1), query.value(2), query.value(3), query.value(4)])
         return history
 
-    def createCompactValidationHistory(self, compactHistory):
-        """
-        Creates and populates the compact validation history table from a given list of logs.
-        """
-        self.checkAndOpenDb()
-        # table creation
-        sql = self.gen.createCompactValidationHistoryQuery()
-        query = QSqlQuery(sql, self.db)
-        if not query.isActive():
-            raise Exception(self.tr("Problem while creating compact validation processes history table: ")+query.lastError().text())
-        # table population
-        for log in compactHistory:
-            sql = self.gen.populateCompactValidationHistoryQuery(logList=log)
-            query = QSqlQuery(sql, self.db)
-            if not query.isActive():
-                self.db.rollback()
-                raise Exception(self.tr("Problem while populating compact validation processes history table: ")+query.lastError().text())
-        self.db.commit()
-        return True
-
     def createHidNodeTable(self, crs, useTransaction=True):
         """
         Creates the aux_hid_nodes_p table into validation schema.
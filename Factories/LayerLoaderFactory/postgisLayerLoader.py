@@ -107,14 +107,14 @@ class PostGISLayerLoader(EDGVLayerLoader):
             finalList = semifinalList
         return finalList
 
-    def load(self, inputList, useQml = False, uniqueLoad = False, useInheritance = False, stylePath = None, onlyWithElements = False, geomFilterList = [], isEdgv = True, parent = None):
+    def load(self, inputList, useQml = False, uniqueLoad = False, useInheritance = False, stylePath = None, onlyWithElements = False, geomFilterList = [], isEdgv = True, parent = None, bulkLoad = False):
         """
         1. Get loaded layers
         2. Filter layers;
         3. Load domains;
         4. Get Aux Dicts;
         5. Build Groups;
-        6. Load Layers;
+        6. Load Layers (one by one or, if bulkLoad, all at once through bulkLoadLayers);
         """
         layerList, isDictList = self.preLoadStep(inputList)
         #1. Get Loaded Layers
@@ -145,6 +145,8 @@ class PostGISLayerLoader(EDGVLayerLoader):
         #5. Build Groups
         groupDict = self.prepareGroups(loadedGroups, dbGroup, lyrDict)
         #6. load layers
+        if bulkLoad:
+            return self.bulkLoadLayers(lyrDict, groupDict, loadedLayers, useInheritance, useQml, uniqueLoad, stylePath, domainDict, multiColumnsDict, domLayerDict, edgvVersion, parent = parent)
         loadedDict = dict()
         if parent:
             primNumber = 0
@@ -187,25 +189,14 @@ class PostGISLayerLoader(EDGVLayerLoader):
         :param domLayerDict: domain dictionary
         :return:
         """
-        if isinstance(inputParam,dict):
-            lyrName = inputParam['lyrName']
-            schema = inputParam['tableSchema']
-            geomColumn = inputParam['geom']
-            tableName = inputParam['tableName']
-            srid =  self.geomDict['tablePerspective'][tableName]['srid']
-        else:
-            lyrName = inputParam
-            tableName = self.geomDict['tablePerspective'][lyrName]['tableName']
-            schema = self.geomDict['tablePerspective'][lyrName]['schema']
-            geomColumn = self.geomDict['tablePerspective'][lyrName]['geometryColumn']
-            srid =  self.geomDict['tablePerspective'][lyrName]['srid']
+        lyrName, schema, tableName, geomColumn, srid = self.getLayerParameters(inputParam)
         if uniqueLoad:
             lyr = self.checkLoaded(tableName, loadedLayers)
             if lyr:
                 return lyr
         fullName = '''"{0}"."{1}"'''.format(schema, tableName)
         pkColumn = self.abstractDb.getPrimaryKeyColumn(fullName)
-        if useInheritance or self.abstractDb.getDatabaseVersion() in ['3.0', 'Non_Edgv']:
+        if useInheritance or edgvVersion in ['3.0', 'Non_Edgv']:
             sql = ''
         else:
             sql = self.abstractDb.gen.loadLayerFromDatabase(fullName, pkColumn=pkColumn)            
@@ -229,6 +220,102 @@ class PostGISLayerLoader(EDGVLayerLoader):
         vlayer = self.createMeasureColumn(vlayer)
         return vlayer
 
+    def getLayerParameters(self, inputParam):
+        """
+        Returns (lyrName, schema, tableName, geomColumn, srid) for a layer name or layer dict
+        """
+        if isinstance(inputParam,dict):
+            lyrName = inputParam['lyrName']
+            schema = inputParam['tableSchema']
+            geomColumn = inputParam['geom']
+            tableName = inputParam['tableName']
+            srid =  self.geomDict['tablePerspective'][tableName]['srid']
+        else:
+            lyrName = inputParam
+            tableName = self.geomDict['tablePerspective'][lyrName]['tableName']
+            schema = self.geomDict['tablePerspective'][lyrName]['schema']
+            geomColumn = self.geomDict['tablePerspective'][lyrName]['geometryColumn']
+            srid =  self.geomDict['tablePerspective'][lyrName]['srid']
+        return lyrName, schema, tableName, geomColumn, srid
+
+    def bulkLoadLayers(self, lyrDict, groupDict, loadedLayers, useInheritance, useQml, uniqueLoad, stylePath, domainDict, multiColumnsDict, domLayerDict, edgvVersion, parent = None):
+        """
+        Loads every layer of lyrDict at once:
+        1. Gets primary keys (and db styles) of all layers with one query each;
+        2. Builds the layers off-screen;
+        3. Adds them to the registry with a single addMapLayers call, with the canvas frozen.
+        """
+        loadedDict = dict()
+        layerInfoList = []
+        for prim in lyrDict.keys():
+            for cat in lyrDict[prim].keys():
+                for lyr in lyrDict[prim][cat]:
+                    lyrName, schema, tableName, geomColumn, srid = self.getLayerParameters(lyr)
+                    if uniqueLoad:
+                        loadedLyr = self.checkLoaded(tableName, loadedLayers)
+                        if loadedLyr:
+                            loadedDict[lyrName] = loadedLyr
+                            continue
+                    layerInfoList.append((lyrName, schema, tableName, geomColumn, srid, groupDict[prim][cat]))
+        if not layerInfoList:
+            return loadedDict
+        #1. catalog queries
+        pkDict = self.abstractDb.getPrimaryKeyColumnDict([(schema, tableName) for lyrName, schema, tableName, geomColumn, srid, idSubgrupo in layerInfoList])
+        dbStyleDict = dict()
+        if stylePath and 'db:' in stylePath['style']:
+            dbStyleDict = self.abstractDb.getStyleDict(stylePath['style'].split(':')[-1], [info[2] for info in layerInfoList])
+        if parent:
+            localProgress = ProgressWidget(1, len(layerInfoList), self.tr('Loading layers... '), parent=parent)
+        #2. off-screen layer building
+        newLayerList = []
+        for lyrName, schema, tableName, geomColumn, srid, idSubgrupo in layerInfoList:
+            try:
+                pkColumn = pkDict.get((schema, tableName))
+                fullName = '''"{0}"."{1}"'''.format(schema, tableName)
+                if useInheritance or edgvVersion in ['3.0', 'Non_Edgv']:
+                    sql = ''
+                else:
+                    sql = self.abstractDb.gen.loadLayerFromDatabase(fullName, pkColumn=pkColumn)
+                self.setDataSource(schema, tableName, geomColumn, sql, pkColumn=pkColumn)
+                vlayer = QgsVectorLayer(self.uri.uri(), tableName, self.provider)
+                if not vlayer.isValid():
+                    QgsMessageLog.logMessage(vlayer.error().summary(), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
+                    continue
+                vlayer.setCrs(QgsCoordinateReferenceSystem(int(srid), QgsCoordinateReferenceSystem.EpsgCrsId))
+                if useQml:
+                    vlayer = self.setDomainsAndRestrictionsWithQml(vlayer)
+                else:
+                    vlayer = self.setDomainsAndRestrictions(vlayer, tableName, domainDict, multiColumnsDict, domLayerDict)
+                if stylePath:
+                    if 'db:' in stylePath['style']:
+                        style = dbStyleDict.get(tableName)
+                    else:
+                        style = self.getStyleFromFile(stylePath['style'], tableName)
+                    if style:
+                        vlayer.applyNamedStyle(style)
+                vlayer = self.createMeasureColumn(vlayer)
+                newLayerList.append((vlayer, idSubgrupo))
+                loadedDict[lyrName] = vlayer
+            except Exception as e:
+                self.logErrorDict[lyrName] = self.tr('Error for layer ')+lyrName+': '+':'.join(e.args)
+                self.logError()
+            if parent:
+                localProgress.step()
+        #3. single registry insertion
+        canvas = self.iface.mapCanvas()
+        frozen = canvas.isFrozen()
+        canvas.freeze(True)
+        try:
+            QgsMapLayerRegistry.instance().addMapLayers([vlayer for vlayer, idSubgrupo in newLayerList])
+            for vlayer, idSubgrupo in newLayerList:
+                self.iface.legendInterface().moveLayer(vlayer, idSubgrupo)
+        finally:
+            canvas.freeze(frozen)
+        if not frozen:
+            canvas.refresh()
+        loadedLayers.extend([vlayer for vlayer, idSubgrupo in newLayerList])
+        return loadedDict
+
     def getDomainsFromDb(self, layerList, loadedLayers, domainDict, multiColumnsDict):
         """
         Gets domain data for each layer to be loaded
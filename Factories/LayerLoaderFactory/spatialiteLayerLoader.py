@@ -73,7 +73,7 @@ class SpatialiteLayerLoader(EDGVLayerLoader):
                     return ll
         return loaded
 
-    def load(self, inputList, useQml = False, uniqueLoad = False, useInheritance = False, stylePath = None, onlyWithElements = False, geomFilterList = [], isEdgv = True, parent = None):
+    def load(self, inputList, useQml = False, uniqueLoad = False, useInheritance = False, stylePath = None, onlyWithElements = False, geomFilterList = [], isEdgv = True, parent = None, bulkLoad = False):
         """
         1. Get loaded layers
         2. Filter layers;
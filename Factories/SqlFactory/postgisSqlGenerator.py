@@ -41,6 +41,20 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = "SELECT id from only "+aggregated_schema+"."+aggregated_class+" where "+column_name+"="+'\''+complex_uuid+'\''
         return sql
 
+    def getAssociatedFeaturesFromComplexLinks(self, linkList):
+        """
+        Gets (complex uuid, complex name, aggregated class, aggregated id) rows of every link
+        in linkList at once. linkList is a list of (complex_schema, complex, aggregated_schema,
+        aggregated_class, column_name) tuples, each one becoming a LEFT JOIN between the complex
+        and the aggregated class (complexes without associated features return a NULL id).
+        Aggregated ids are integers in cb classes and uuids in complexos classes, so they are returned as text.
+        """
+        sqlList = []
+        for complex_schema, complex, aggregated_schema, aggregated_class, column_name in linkList:
+            sqlList.append("""SELECT c.id::text as complex_uuid, c.nome as name, '{3}'::text as aggregated_class, a.id::text as aggregated_id FROM {0}.{1} as c LEFT JOIN ONLY {2}.{3} as a ON a.{4} = c.id WHERE c.id IS NOT NULL AND c.nome IS NOT NULL AND c.nome <> ''""".format(complex_schema, complex, aggregated_schema, aggregated_class, column_name))
+        sql = ' UNION ALL '.join(sqlList)
+        return sql
+
     def getLinkColumn(self, complexClass, aggregatedClass):
         sql = "SELECT column_name from complex_schema where complex = \'"+complexClass+'\''+" and aggregated_class = "+'\''+aggregatedClass+'\''
         return sql
@@ -361,6 +375,10 @@ class PostGISSqlGenerator(SqlGenerator):
             CONSTRAINT aux_flags_validacao_a_pk PRIMARY KEY (id)
         )INHERITS(validation.aux_flags_validacao)#
         
+        CREATE INDEX aux_flags_validacao_p_process_idx ON validation.aux_flags_validacao_p (process_name, layer, feat_id)#
+        CREATE INDEX aux_flags_validacao_l_process_idx ON validation.aux_flags_validacao_l (process_name, layer, feat_id)#
+        CREATE INDEX aux_flags_validacao_a_process_idx ON validation.aux_flags_validacao_a (process_name, layer, feat_id)#
+        
         CREATE TABLE validation.status
         (
           id smallint NOT NULL,
@@ -373,6 +391,8 @@ class PostGISSqlGenerator(SqlGenerator):
             log text NOT NULL,
             status int NOT NULL,
             finished timestamp NOT NULL default now(),
+            username varchar(200),
+            run_id varchar(36),
             CONSTRAINT process_history_pk PRIMARY KEY (id),
             CONSTRAINT process_history_status_fk FOREIGN KEY (status) REFERENCES validation.status (id) MATCH FULL ON UPDATE NO ACTION ON DELETE NO ACTION
         
@@ -427,8 +447,14 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = "SELECT sta.status FROM validation.process_history as hist left join validation.status as sta on sta.id = hist.status where hist.process_name = '%s' ORDER BY hist.finished DESC LIMIT 1 " % processName
         return sql
     
-    def setValidationStatusQuery(self, processName,log,status):
-        sql = "INSERT INTO validation.process_history (process_name, log, status) values ('%s','%s',%s)" % (processName,log,status)
+    def setValidationStatusQuery(self, processName, log, status, username = None, runId = None):
+        if username is None and runId is None:
+            # process_history without the username and run_id columns
+            sql = "INSERT INTO validation.process_history (process_name, log, status) values ('%s','%s',%s)" % (processName, log, status)
+            return sql
+        usernameValue = "'%s'" % username.replace("'", "''") if username else 'NULL'
+        runIdValue = "'%s'" % runId if runId else 'NULL'
+        sql = "INSERT INTO validation.process_history (process_name, log, status, username, run_id) values ('%s','%s',%s,%s,%s)" % (processName, log, status, usernameValue, runIdValue)
         return sql
     
     def insertFlagIntoDb(self, layer, feat_id, reason, geom, srid, processName, dimension, geometryColumn, flagSRID):
@@ -482,6 +508,12 @@ class PostGISSqlGenerator(SqlGenerator):
         return sql
     
     def testSpatialRule(self, class_a, necessity, predicate_function, class_b, min_card, max_card, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn):
+        """
+        Builds the query that returns (id, geom) of class_a features that break the rule.
+        Matches are searched per feature of class_a with EXISTS/LATERAL subqueries
+        prefiltered by bounding box (&&), so that the gist indexes are used, and counting
+        stops as soon as the cardinality is known to be broken.
+        """
         #TODO: Add SRIDS
         class_a = '"'+'"."'.join(class_a.replace('"','').split('.'))+'"'
         class_b = '"'+'"."'.join(class_b.replace('"','').split('.'))+'"'
@@ -490,49 +522,45 @@ class PostGISSqlGenerator(SqlGenerator):
         if class_a!=class_b:
             sameClassRestriction=''
         else:
-            sameClassRestriction=' WHERE a.{0} <> b.{1} '.format(aKeyColumn, bKeyColumn)
-                    
+            sameClassRestriction=' AND a.{0} <> b.{1} '.format(aKeyColumn, bKeyColumn)
+
         if predicate_function == 'ST_Disjoint':
+            # not being disjoint is intersecting, which can use the index
+            matchSql = """SELECT 1 FROM {0} as b
+                WHERE a.{2} && b.{3} AND ST_Intersects(a.{2},b.{3}) {1} """.format(class_b, sameClassRestriction, aGeomColumn, bGeomColumn)
             if necessity == '\'f\'':
-                sql = """SELECT DISTINCT foo.id, foo.geom FROM
-                (SELECT a.{4} id, SUM(CASE WHEN {0}(a.{6},b.{7}) = 'f' THEN 1 ELSE 0 END) count, a.{6} geom 
-                    FROM {1} as a,{2} as b {3} GROUP BY a.{4}, a.{6}) as foo
-                WHERE foo.count > 0
-                """.format(predicate_function, class_a, class_b, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn)                
+                sql = """SELECT a.{0} id, a.{1} geom FROM {2} as a
+                WHERE EXISTS ({3})
+                """.format(aKeyColumn, aGeomColumn, class_a, matchSql)
             elif necessity == '\'t\'':
-                sql = """SELECT DISTINCT foo.id, foo.geom FROM
-                (SELECT a.{4} id, SUM(CASE WHEN {0}(a.{6},b.{7}) = 'f' THEN 1 ELSE 0 END) count, a.{6} geom 
-                    FROM {1} as a,{2} as b {3} GROUP BY a.{4}, a.{6}) as foo
-                WHERE foo.count = 0
-                """.format(predicate_function, class_a, class_b, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn)
+                sql = """SELECT a.{0} id, a.{1} geom FROM {2} as a
+                WHERE NOT EXISTS ({3})
+                """.format(aKeyColumn, aGeomColumn, class_a, matchSql)
         else:
+            # every other predicate implies that the bounding boxes intersect
+            matchSql = """SELECT 1 FROM {0} as b
+                WHERE a.{3} && b.{4} AND {2}(a.{3},b.{4}) {1} """.format(class_b, sameClassRestriction, predicate_function, aGeomColumn, bGeomColumn)
             if necessity == '\'f\'':# must (be)
-                if max_card == '*':
-                    sql = """SELECT DISTINCT foo.id, foo.geom FROM
-                    (SELECT a.{4} id, SUM(CASE WHEN {0}(a.{6},b.{7}) THEN 1 ELSE 0 END) count, a.{6} geom 
-                        FROM {1} as a,{2} as b {3} GROUP BY a.{4}, a.{6}) as foo
-                    WHERE foo.count < {8}
-                    """.format(predicate_function, class_a, class_b, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn, min_card)
-                elif min_card is None and max_card is None:
-                    sql = """SELECT DISTINCT foo.id, foo.geom FROM
-                    (SELECT a.{4} id, SUM(CASE WHEN {0}(a.{6},b.{7}) THEN 1 ELSE 0 END) count, a.{6} geom 
-                        FROM {1} as a,{2} as b {3} GROUP BY a.{4}, a.{6}) as foo
-                    WHERE foo.count != 0;
-                    """.format(predicate_function, class_a, class_b, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn, min_card)
+                if min_card is None and max_card is None:
+                    sql = """SELECT a.{0} id, a.{1} geom FROM {2} as a
+                    WHERE EXISTS ({3})
+                    """.format(aKeyColumn, aGeomColumn, class_a, matchSql)
                 else:
-                    sql = """SELECT DISTINCT foo.id, foo.geom FROM
-                    (SELECT a.{4} id, SUM(CASE WHEN {0}(a.{6},b.{7}) THEN 1 ELSE 0 END) count, a.{6} geom 
-                        FROM {1} as a,{2} as b {3} GROUP BY a.{4}, a.{6}) as foo
-                    WHERE foo.count < {8} OR foo.count > {9}
-                    """.format(predicate_function, class_a, class_b, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn, min_card, max_card)
+                    if max_card == '*':
+                        # only counting up to min_card matches
+                        limit = int(min_card)
+                        condition = 'foo.count < {0}'.format(min_card)
+                    else:
+                        # only counting up to max_card + 1 matches
+                        limit = int(max_card) + 1
+                        condition = 'foo.count < {0} OR foo.count > {1}'.format(min_card, max_card)
+                    sql = """SELECT a.{0} id, a.{1} geom FROM {2} as a
+                    LEFT JOIN LATERAL (SELECT count(*) as count FROM ({3} LIMIT {4}) as matches) as foo ON true
+                    WHERE {5}
+                    """.format(aKeyColumn, aGeomColumn, class_a, matchSql, limit, condition)
             elif necessity == '\'t\'':# must not (be)
-                if class_a!=class_b:
-                    sameClassRestriction=''
-                else:
-                    sameClassRestriction=' AND a.{0} <> b.{1} '.format(aKeyColumn, bKeyColumn)
-                    
                 sql = """SELECT DISTINCT a.{5} id, (ST_Dump(ST_Intersection(a.{7}, b.{8}))).geom as geom
-                FROM {0} as a, {1} as b 
+                FROM {0} as a JOIN {1} as b ON a.{7} && b.{8}
                     WHERE {2}(a.{7},b.{8}) = {3} {4}
                 """.format(class_a, class_b, predicate_function, necessity, sameClassRestriction, aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn)
         return sql
@@ -541,10 +569,55 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = "select ST_Dimension('%s')" % geom
         return sql
     
-    def getMulti(self,cl):
-        #TODO: get pk
+    def getMulti(self, cl, keyColumn = 'id', geomColumn = 'geom', idList = None, subsetString = None):
+        cl = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        if idList is not None:
+            idFilter = """ and "{0}" in ({1})""".format(keyColumn, ','.join(map(str, idList)) if idList else 'null')
+        else:
+            idFilter = ''
+        if subsetString:
+            # the layer filter (subset string) is a where clause over cl
+            idFilter += """ and ({0})""".format(subsetString)
+        sql = """select "{1}" from only {0} where ST_NumGeometries("{2}") > 1{3}""".format(cl, keyColumn, geomColumn, idFilter)
+        return sql
+
+    def deaggregateGeometries(self, cl, attributeList, keyColumn = 'id', geomColumn = 'geom', idList = None, subsetString = None):
+        """
+        Explodes the multi geometries of cl: the first part updates the original record
+        and the other parts are inserted as new records with the same attributes.
+        Only records matching subsetString (a layer filter), if given, are exploded.
+        Returns the number of inserted parts.
+        """
+        multiSql = self.getMulti(cl, keyColumn = keyColumn, geomColumn = geomColumn, idList = idList, subsetString = subsetString)
         cl = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
-        sql = """select id from only {0} where ST_NumGeometries(geom) > 1""".format(cl)
+        columns = ','.join(['"{0}"'.format(attribute) for attribute in attributeList])
+        aColumns = ','.join(['a."{0}"'.format(attribute) for attribute in attributeList])
+        sql = """WITH parts AS (
+            SELECT a."{1}" as id, dump.path[1] as part, ST_Multi(dump.geom) as geom
+            FROM ONLY {0} as a, LATERAL ST_Dump(a."{2}") as dump
+            WHERE a."{1}" in ({3}) AND NOT ST_IsEmpty(dump.geom)
+        ), inserted AS (
+            INSERT INTO {0} ({4}{5}"{2}")
+            SELECT {6}{5}parts.geom FROM parts JOIN ONLY {0} as a ON a."{1}" = parts.id
+            WHERE parts.part > 1
+            RETURNING 1
+        ), updated AS (
+            UPDATE ONLY {0} as a SET "{2}" = parts.geom FROM parts
+            WHERE a."{1}" = parts.id AND parts.part = 1
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated)""".format(cl, keyColumn, geomColumn, multiSql, columns, ',' if columns else '', aColumns)
+        return sql
+
+    def deleteNullGeometries(self, cl, keyColumn = 'id', geomColumn = 'geom', idList = None, subsetString = None):
+        cl = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        if idList is not None:
+            idFilter = """ and "{0}" in ({1})""".format(keyColumn, ','.join(map(str, idList)) if idList else 'null')
+        else:
+            idFilter = ''
+        if subsetString:
+            idFilter += """ and ({0})""".format(subsetString)
+        sql = """delete from only {0} where "{1}" is null{2}""".format(cl, geomColumn, idFilter)
         return sql
 
     def getDuplicatedGeom(self, schema, cl, geometryColumn, keyColumn):
@@ -669,6 +742,35 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = """select layer, feat_id, geometry_column from validation.aux_flags_validacao where process_name = '%s'""" % processName
         return sql
     
+    def getFlaggedClassesByProcess(self, processName):
+        sql = """select layer, geometry_column, count(distinct feat_id) from validation.aux_flags_validacao where process_name = '{0}' group by layer, geometry_column""".format(processName)
+        return sql
+
+    def getFlaggedIdsSubquery(self, processName, flagLayer):
+        """
+        Subquery with the ids of flagLayer features flagged by processName.
+        It is meant to be joined by the fix processes, so that the flagged ids never leave the server.
+        """
+        sql = """select distinct feat_id from validation.aux_flags_validacao where process_name = '{0}' and layer = '{1}'""".format(processName, flagLayer)
+        return sql
+
+    def forceValidityFromFlags(self, tableSchema, tableName, processName, flagLayer, srid, keyColumn, geometryColumn):
+        """
+        Same as forceValidity, fixing the features of tableSchema.tableName whose keys are flagged
+        by processName on flagLayer (a temp table may be fixed using the flags of the original layer).
+        """
+        sql = """update "{0}"."{1}" set "{5}" = ST_Multi(result."{5}") from (
+        select distinct parts."{4}", ST_Union(parts."{5}") as "{5}" from "{0}"."{1}" as source, 
+                                        (select t."{4}" as "{4}", ST_Multi(((ST_Dump(ST_SetSRID(ST_MakeValid(t."{5}"), {3}))).geom)) as "{5}" from 
+                                        "{0}"."{1}" as t join ({2}) as flags on flags.feat_id = t."{4}") as parts where parts."{4}" = source."{4}" and ST_GeometryType(parts."{5}") = ST_GeometryType(source."{5}") group by parts."{4}"
+        ) as result where  result."{4}" = "{0}"."{1}"."{4}" """.format(tableSchema, tableName, self.getFlaggedIdsSubquery(processName, flagLayer), srid, keyColumn, geometryColumn)
+        return sql
+
+    def deleteFlaggedFeatures(self, tableSchema, tableName, processName, flagLayer, keyColumn):
+        sql = """DELETE FROM "{0}"."{1}" as t USING ({2}) as flags 
+        WHERE t."{3}" = flags.feat_id""".format(tableSchema, tableName, self.getFlaggedIdsSubquery(processName, flagLayer), keyColumn)
+        return sql
+
     def forceValidity(self, tableSchema, tableName, idList, srid, keyColumn, geometryColumn):
         sql = """update "{0}"."{1}" set "{5}" = ST_Multi(result."{5}") from (
         select distinct parts."{4}", ST_Union(parts."{5}") as "{5}" from "{0}"."{1}" as source, 
@@ -891,6 +993,156 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = 'SELECT dsgsnap(\'{0}\', {1})'.format(cl, str(tol))
         return sql
     
+    def snapWithinClass(self, cl, tol, geometryColumn, keyColumn):
+        """
+        Snaps each feature of cl to the features of cl closer than tol, one feature at a time (as dsgsnap),
+        so that each feature snaps to the already snapped geometries of its neighbours and close vertices
+        end up coincident instead of swapping positions. Neighbours are found through the spatial index.
+        """
+        cl = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        sql = """DO $$
+        DECLARE
+            feat record;
+        BEGIN
+            FOR feat IN SELECT "{3}" as id FROM {0} WHERE NOT ST_IsEmpty("{2}") ORDER BY "{3}"
+            LOOP
+                UPDATE {0} as a SET "{2}" = ST_Multi(ST_Snap(a."{2}", n.geom, {1}))
+                FROM (SELECT ST_Collect(b."{2}") as geom
+                    FROM {0} as c JOIN {0} as b ON b."{3}" <> c."{3}" AND ST_DWithin(c."{2}", b."{2}", {1})
+                    WHERE c."{3}" = feat.id) as n
+                WHERE a."{3}" = feat.id AND n.geom IS NOT NULL;
+            END LOOP;
+        END
+        $$""".format(cl, tol, geometryColumn, keyColumn)
+        return sql
+
+    def buildEdgeNetwork(self, tableList, lineTable, edgeTable, ownerTable, tol = 1e-9):
+        """
+        Builds the edge network shared by the tables of tableList.
+        tableList: list of (table, geometry column, key column, isPolygon); area boundaries are used for polygons
+        lineTable: temp table with the lines (or boundaries) of each feature
+        edgeTable: temp table with the noded edges (ST_Node breaks the lines at intersections and drops duplicated edges)
+        ownerTable: temp table relating each edge to the features it lies on (the feature with the lowest id has owner_rank 1)
+        """
+        selectList = []
+        for table, geometryColumn, keyColumn, isPolygon in tableList:
+            quotedTable = '"'+'"."'.join(table.replace('"','').split('.'))+'"'
+            lineExpression = 'ST_Boundary("{0}")'.format(geometryColumn) if isPolygon else '"{0}"'.format(geometryColumn)
+            selectList.append("""SELECT '{0}'::text as source, "{1}" as id, ST_Multi({2}) as geom FROM {3} WHERE NOT ST_IsEmpty("{4}")""".format(table, keyColumn, lineExpression, quotedTable, geometryColumn))
+        sql = """DROP TABLE IF EXISTS {0}#
+        CREATE TEMP TABLE {0} AS {3}#
+        CREATE INDEX ON {0} USING gist (geom)#
+        DROP TABLE IF EXISTS {1}#
+        CREATE TEMP TABLE {1} AS SELECT row_number() over () as edge_id, dump.geom as geom
+            FROM ST_Dump((SELECT ST_Node(ST_Collect(lines.geom)) FROM (SELECT (ST_Dump(geom)).geom as geom FROM {0}) as lines)) as dump#
+        CREATE INDEX ON {1} USING gist (geom)#
+        DROP TABLE IF EXISTS {2}#
+        CREATE TEMP TABLE {2} AS SELECT e.edge_id, l.source, l.id, rank() over (PARTITION BY e.edge_id ORDER BY l.source, l.id) as owner_rank
+            FROM {1} as e JOIN {0} as l ON e.geom && l.geom AND ST_DWithin(ST_LineInterpolatePoint(e.geom, 0.5), l.geom, {4})#
+        CREATE INDEX ON {2} (source, id)""".format(lineTable, edgeTable, ownerTable, ' UNION ALL '.join(selectList), tol)
+        return sql
+
+    def dropEdgeNetwork(self, tableNameList):
+        sql = '#'.join(['DROP TABLE IF EXISTS {0}'.format(tableName) for tableName in tableNameList])
+        return sql
+
+    def rebuildCleanedLines(self, cl, attributeList, geometryColumn, keyColumn, edgeTable, ownerTable):
+        """
+        Replaces the features of cl by one record per edge they own (i.e. lines are broken at the nodes
+        and duplicated edges are kept only by the first feature).
+        """
+        quotedTable = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        columns = ','.join(['"{0}"'.format(attribute) for attribute in attributeList])
+        oldColumns = ','.join(['old."{0}"'.format(attribute) for attribute in attributeList])
+        sql = """WITH old AS (DELETE FROM {0} RETURNING *)
+        INSERT INTO {0} ("{2}",{3}"{1}")
+        SELECT old."{2}",{4}ST_Multi(e.geom) FROM old
+            JOIN {6} as o ON o.source = '{5}' AND o.id = old."{2}" AND o.owner_rank = 1
+            JOIN {7} as e ON e.edge_id = o.edge_id""".format(quotedTable, geometryColumn, keyColumn, columns+',' if columns else '', oldColumns+',' if oldColumns else '', cl, ownerTable, edgeTable)
+        return sql
+
+    def buildCleanedFaces(self, cl, minArea, geometryColumn, keyColumn, edgeTable, faceTable, faceOwnerTable):
+        """
+        Polygonizes the edge network and assigns each face to the feature of cl it lies in.
+        Faces smaller than minArea are given to the neighbour face with the longest shared boundary.
+        """
+        quotedTable = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        sql = """DROP TABLE IF EXISTS {3}#
+        CREATE TEMP TABLE {3} AS SELECT row_number() over () as face_id, dump.geom as geom, ST_Area(dump.geom) as area
+            FROM ST_Dump((SELECT ST_Polygonize(geom) FROM {2})) as dump#
+        CREATE INDEX ON {3} USING gist (geom)#
+        DROP TABLE IF EXISTS {4}#
+        CREATE TEMP TABLE {4} AS SELECT f.face_id, a."{6}" as id, rank() over (PARTITION BY f.face_id ORDER BY a."{6}") as owner_rank, f.area < {1} as small, NULL::bigint as target_id
+            FROM {3} as f JOIN {0} as a ON f.geom && a."{5}" AND ST_Intersects(ST_PointOnSurface(f.geom), a."{5}")#
+        UPDATE {4} as o SET target_id = CASE WHEN o.small THEN
+            (SELECT n.id FROM {4} as n JOIN {3} as nf ON nf.face_id = n.face_id, {3} as f
+                WHERE f.face_id = o.face_id AND n.owner_rank = 1 AND NOT n.small AND f.geom && nf.geom AND ST_Intersects(f.geom, nf.geom)
+                ORDER BY ST_Length(ST_Intersection(f.geom, nf.geom)) DESC LIMIT 1)
+            ELSE o.id END
+            WHERE o.owner_rank = 1""".format(quotedTable, minArea, edgeTable, faceTable, faceOwnerTable, geometryColumn, keyColumn)
+        return sql
+
+    def rebuildCleanedPolygons(self, cl, geometryColumn, keyColumn, faceTable, faceOwnerTable):
+        """
+        Rebuilds each feature of cl from the faces assigned to it. Features without faces are removed.
+        """
+        quotedTable = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        sql = """UPDATE {0} as a SET "{1}" = ST_Multi(u.geom)
+        FROM (SELECT o.target_id as id, ST_Union(f.geom) as geom FROM {4} as o JOIN {3} as f ON f.face_id = o.face_id
+            WHERE o.owner_rank = 1 AND o.target_id IS NOT NULL GROUP BY o.target_id) as u
+        WHERE a."{2}" = u.id#
+        DELETE FROM {0} WHERE "{2}" NOT IN (SELECT target_id FROM {4} WHERE owner_rank = 1 AND target_id IS NOT NULL)""".format(quotedTable, geometryColumn, keyColumn, faceTable, faceOwnerTable)
+        return sql
+
+    def getCleaningFlags(self, isPolygon, smallAngle, lineTable, edgeTable, ownerTable, faceTable = None, faceOwnerTable = None):
+        """
+        Gets (feature id, error code, geometry) of the cleaning errors, as written by v.clean:
+        break: points where features cross; rmdupl: duplicated edges (overlapping faces for areas)
+        dropped from the feature; rmsa: nodes where two edges leave with an angle smaller than
+        smallAngle (radians); rmarea: faces smaller than the minimum area.
+        """
+        breakSql = """SELECT a.id, 'break' as code, dump.geom FROM {0} as a JOIN {0} as b ON a.id < b.id AND a.geom && b.geom AND ST_Crosses(a.geom, b.geom),
+            LATERAL ST_Dump(ST_Intersection(a.geom, b.geom)) as dump
+            WHERE ST_GeometryType(dump.geom) = 'ST_Point'""".format(lineTable)
+        smallAngleSql = """WITH ends AS (
+                SELECT edge_id, 1 as side, ST_StartPoint(geom) as node, ST_Azimuth(ST_StartPoint(geom), ST_PointN(geom, 2)) as azimuth FROM {0}
+                UNION ALL
+                SELECT edge_id, 2 as side, ST_EndPoint(geom) as node, ST_Azimuth(ST_EndPoint(geom), ST_PointN(geom, ST_NPoints(geom) - 1)) as azimuth FROM {0}
+            )
+            SELECT DISTINCT ON (o.id, ST_X(a.node), ST_Y(a.node)) o.id, 'rmsa' as code, a.node as geom
+            FROM ends as a JOIN ends as b ON ST_X(a.node) = ST_X(b.node) AND ST_Y(a.node) = ST_Y(b.node) AND (a.edge_id, a.side) < (b.edge_id, b.side)
+            JOIN {1} as o ON o.edge_id = a.edge_id AND o.owner_rank = 1
+            WHERE LEAST(abs(a.azimuth - b.azimuth), 2*pi() - abs(a.azimuth - b.azimuth)) < {2}""".format(edgeTable, ownerTable, smallAngle)
+        if isPolygon:
+            duplicateSql = """SELECT o.id, 'rmdupl' as code, f.geom FROM {0} as o JOIN {1} as f ON f.face_id = o.face_id WHERE o.owner_rank > 1""".format(faceOwnerTable, faceTable)
+            smallAreaSql = """SELECT o.id, 'rmarea' as code, f.geom FROM {0} as o JOIN {1} as f ON f.face_id = o.face_id WHERE o.owner_rank = 1 AND o.small""".format(faceOwnerTable, faceTable)
+            sqlList = [breakSql, duplicateSql, smallAngleSql, smallAreaSql]
+        else:
+            duplicateSql = """SELECT o.id, 'rmdupl' as code, e.geom FROM {0} as o JOIN {1} as e ON e.edge_id = o.edge_id WHERE o.owner_rank > 1""".format(ownerTable, edgeTable)
+            sqlList = [breakSql, duplicateSql, smallAngleSql]
+        sql = ' UNION ALL '.join(['SELECT * FROM ({0}) as flags{1}'.format(s, i) for i, s in enumerate(sqlList)])
+        return sql
+
+    def rebuildSimplifiedGeometries(self, cl, geometryColumn, keyColumn, isPolygon, edgeTable, ownerTable):
+        """
+        Rebuilds each feature of cl from the (already simplified) edges it lies on.
+        Edges shared by neighbours were simplified once, so the features still share them.
+        """
+        quotedTable = '"'+'"."'.join(cl.replace('"','').split('.'))+'"'
+        if isPolygon:
+            buildExpression = 'ST_BuildArea(ST_Collect(e.geom))'
+        else:
+            buildExpression = 'ST_LineMerge(ST_Collect(e.geom))'
+        sql = """UPDATE {0} as a SET "{1}" = ST_Multi(r.geom)
+        FROM (SELECT o.id, {3} as geom FROM {5} as o JOIN {4} as e ON e.edge_id = o.edge_id
+            WHERE o.source = '{6}' GROUP BY o.id) as r
+        WHERE a."{2}" = r.id AND r.geom IS NOT NULL AND NOT ST_IsEmpty(r.geom)""".format(quotedTable, geometryColumn, keyColumn, buildExpression, edgeTable, ownerTable, cl)
+        return sql
+
+    def simplifyEdges(self, edgeTable, tol):
+        sql = """UPDATE {0} SET geom = ST_SimplifyPreserveTopology(geom, {1})""".format(edgeTable, tol)
+        return sql
+
     def createTempTable(self, layerName):
         schema, tableName = layerName.split('.')
         sql = '''
@@ -915,6 +1167,11 @@ class PostGISSqlGenerator(SqlGenerator):
         tableName = '"'+'"."'.join(tableName.replace('"','').split('.'))
         sql = 'create index "{0}_temp_gist" on {1}_temp" using gist ({2})'.format(tableName.split('.')[-1].replace('"',''), tableName, geomColumnName)
         return sql
+
+    def analyzeTempTable(self, tableName):
+        tableName = '"'+'"."'.join(tableName.replace('"','').split('.'))
+        sql = 'analyze {0}_temp"'.format(tableName)
+        return sql
     
     def getStyles(self):
         sql = 'select description, f_table_schema, f_table_name, stylename from public.layer_styles where f_table_catalog = current_database()'
@@ -958,6 +1215,11 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = """SELECT styleqml from public.layer_styles where f_table_name = '{0}' and description = '{1}' and f_table_catalog = current_database()""".format(table_name, styleName)
         return sql
     
+    def getStyles(self, styleName, tableList):
+        tableClause = ','.join(["'{0}'".format(tableName) for tableName in tableList])
+        sql = """SELECT f_table_name, styleqml from public.layer_styles where f_table_name in ({0}) and description = '{1}' and f_table_catalog = current_database()""".format(tableClause, styleName)
+        return sql
+    
     def updateStyle(self, styleName, table_name, parsedQml, tableSchema):
         sql = """UPDATE public.layer_styles SET styleqml = '{0}', update_time = now() where f_table_name = '{1}' and description = '{2}'""".format(parsedQml.replace("'","''"),table_name, styleName)
         return sql
@@ -1081,7 +1343,7 @@ class PostGISSqlGenerator(SqlGenerator):
         """
         return sql
     
-    def insertFrame(self,scale,mi,inom,frame,srid,geoSrid, paramDict = dict()):
+    def getFrameTableParameters(self, paramDict = dict()):
         paramKeys = paramDict.keys()
         if 'tableSchema' not in paramKeys:
             tableSchema = 'public'
@@ -1107,13 +1369,16 @@ class PostGISSqlGenerator(SqlGenerator):
             geomType = 'MULTIPOLYGON'
         else:
             geomType = paramDict['geomType']
+        return tableSchema, tableName, miAttr, inomAttr, geometryColumn, geomType
 
+    def insertFrame(self,scale,mi,inom,frame,srid,geoSrid, paramDict = dict()):
+        tableSchema, tableName, miAttr, inomAttr, geometryColumn, geomType = self.getFrameTableParameters(paramDict)
         if geomType == 'MULTIPOLYGON':
             sql = """INSERT INTO "{5}"."{6}" ({7},{8},{9}) VALUES ('{0}','{1}',ST_Transform(ST_SetSRID(ST_Multi('{2}'),{3}), {4}))""".format(mi, inom, frame, geoSrid, srid, tableSchema, tableName, miAttr, inomAttr, geometryColumn)
         else:
             sql = """INSERT INTO "{5}"."{6}" ({7},{8},{9}) VALUES ('{0}','{1}',ST_Transform((ST_SetSRID( (ST_Dump('{2}')).geom,{3})), {4}))""".format(mi, inom, frame, geoSrid, srid, tableSchema, tableName, miAttr, inomAttr, geometryColumn)
         return sql
-    
+
     def createFromTemplate(self,dbName, templateName):
         sql = """CREATE DATABASE "{0}" with template = "{1}";""".format(dbName,templateName)
         return sql
@@ -1218,6 +1483,34 @@ class PostGISSqlGenerator(SqlGenerator):
             drop role "{0}";""".format(roleName)
         return sql
     
+    def getRoleCatalogSnapshot(self):
+        """
+        Non login roles of the whole server, with the databases they have objects on
+        and the roles granted to them (one row per database, role and member; member may be null).
+        """
+        sql = """select pgd.datname as dbname, pgr.rolname as rolename, member.rolname as username from 
+                    (select distinct dbid, refobjid from pg_shdepend) as shd 
+                    join pg_roles as pgr on shd.refobjid = pgr.oid and pgr.rolcanlogin = 'f' 
+                    join pg_database as pgd on shd.dbid = pgd.oid 
+                    left join pg_auth_members as pgam on pgam.roleid = pgr.oid 
+                    left join pg_roles as member on pgam.member = member.oid
+        """
+        return sql
+
+    def grantRoles(self, userList, roleList):
+        sql = """GRANT {0} TO {1}""".format(', '.join(['"{0}"'.format(role) for role in roleList]), ', '.join(['"{0}"'.format(user) for user in userList]))
+        return sql
+
+    def revokeRoles(self, userList, roleList):
+        sql = """REVOKE {0} FROM {1}""".format(', '.join(['"{0}"'.format(role) for role in roleList]), ', '.join(['"{0}"'.format(user) for user in userList]))
+        return sql
+
+    def dropRolesOnDatabase(self, roleList):
+        roles = ', '.join(['"{0}"'.format(role) for role in roleList])
+        sql = """drop owned by {0} cascade;
+            drop role {0};""".format(roles)
+        return sql
+
     def getRolesWithGrantedUsers(self):
         sql = """select row_to_json(a) from (
                     select pgr.rolname as profile, array_agg(pgr2.rolname) as users  from pg_auth_members as pgam 
@@ -1517,6 +1810,23 @@ class PostGISSqlGenerator(SqlGenerator):
         '''.format(tableName)
         return sql
     
+    def getPrimaryKeyColumns(self, tableList):
+        """
+        tableList: list of (tableSchema, tableName)
+        """
+        tableClause = ','.join(["('{0}','{1}')".format(tableSchema, tableName) for tableSchema, tableName in tableList])
+        sql = '''
+        SELECT n.nspname, c.relname, a.attname
+        FROM   pg_index i
+        JOIN   pg_class c ON c.oid = i.indrelid
+        JOIN   pg_namespace n ON n.oid = c.relnamespace
+        JOIN   pg_attribute a ON a.attrelid = i.indrelid
+                             AND a.attnum = ANY(i.indkey)
+        WHERE  i.indisprimary
+        AND    (n.nspname, c.relname) in ({0});
+        '''.format(tableClause)
+        return sql
+
     def getGeometryTablesCount(self):
         sql = '''select count(*) from public.geometry_columns'''
         return sql
@@ -1665,25 +1975,6 @@ class PostGISSqlGenerator(SqlGenerator):
         """.format(tableSchema, tableName, geomColumn, keyColumn)
         return sql
 
-    def createValidationHistoryViewTableQuery(self, idListString=None):
-        """
-        Returns the query for creating and populating a view table.
-        Shows the history of validation processes, ordered by execution.
-        If the optional parameter idListString is given, the list will
-        be filtered to a list of given IDs (format: "(int)(id_1, id_2, ...)").
-        This method uses the data on compact_process_history.
-        """
-        sql = """
-        CREATE OR REPLACE VIEW validation.process_history_view AS 
-        SELECT t.process_name, t.log, s.status, t.finished
-        FROM validation.compact_process_history AS t
-        JOIN validation.status AS s ON t.status = s.id
-        ORDER BY t.finished DESC;
-        """
-        if idListString:
-            sql = sql.replace("ORDER BY t.finished DESC;", "WHERE t.id in {0} ORDER BY t.finished DESC;").format(idListString)
-        return sql
-
     def getQmlRecords(self, layerList):
         sql = """select layername, domainqml from public.domain_qml where layername in ('{0}')""".format("','".join(layerList))
         return sql
@@ -1692,60 +1983,147 @@ class PostGISSqlGenerator(SqlGenerator):
         sql = """select dbimplversion from public.db_metadata limit 1"""
         return sql
     
-    def getValidationLogQuery(self):
+    def getValidationHistoryStructureQuery(self):
+        """
+        Returns the query that checks (reading the catalog only) which parts of the validation
+        history structure exist: username and run_id columns, their indexes, the compact_process_history
+        and process_history_view views and whether old records still lack their run id.
         """
-        Returns the query for a list of all logs UNIQUE registered for each
-        process executed.
+        sql = """
+        SELECT
+            EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'validation' AND table_name = 'process_history' AND column_name = 'username') AS has_username,
+            EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'validation' AND table_name = 'process_history' AND column_name = 'run_id') AS has_run_id,
+            EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_username_idx') AS has_username_idx,
+            EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_run_id_idx') AS has_run_id_idx,
+            EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'compact_process_history' AND c.relkind = 'v') AS has_compact_view,
+            EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_view' AND c.relkind = 'v') AS has_history_view
         """
-        sql = """SELECT DISTINCT log, id FROM validation.compact_process_history;"""
-        # ALTERAR PARA FUNÇÃO DE UPDATE DA TABELA PARA QUE INCLUA OS NOMES DE USUÁRIOS
         return sql
-    
-    def getValidationHistoryQuery(self, idListString=None):
+
+    def getValidationHistoryMissingRunIdQuery(self):
         """
-        Returns the query of all validation processes available informations.
-        :param idListString:
+        Returns the query that checks whether records without run id (written before it existed) are left.
         """
-        sql = """SELECT * FROM validation.process_history;"""
-        if idListString:
-            sql = sql.replace(";", " WHERE id IN {};".format(idListString))
+        sql = """SELECT EXISTS (SELECT 1 FROM validation.process_history WHERE run_id IS NULL);"""
         return sql
-    
-    def createCompactValidationHistoryQuery(self):
+
+    def upgradeValidationHistoryQuery(self):
         """
-        Returns the query for compact validation history table creation.
+        Returns the query that adds the username and run id columns (and their indexes) to
+        validation.process_history when they are missing. Old records get the run id and the
+        username of their run: a run starts at each 'Running' record or whenever the process
+        name changes, as it was grouped before. Views validation.compact_process_history (one row
+        per process run) and validation.process_history_view are created only when missing.
         """
         sql = """
-            DROP TABLE IF EXISTS validation.compact_process_history CASCADE;
-            CREATE TABLE validation.compact_process_history (
-                id serial NOT NULL,
-                process_name varchar(200) NOT NULL,
-                log text NOT NULL,
-                status int NOT NULL,
-                finished timestamp NOT NULL,
-                CONSTRAINT compact_process_history_pk PRIMARY KEY (id),
-                CONSTRAINT compact_process_history_status_fk FOREIGN KEY (status) REFERENCES validation.status (id) MATCH FULL ON UPDATE NO ACTION ON DELETE NO ACTION
-        ); """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'validation' AND table_name = 'process_history' AND column_name = 'username') THEN
+                ALTER TABLE validation.process_history ADD COLUMN username varchar(200);
+                UPDATE validation.process_history SET username = substring(log from 'Database username: ([^\n]*)') WHERE log LIKE '%Database username: %';
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'validation' AND table_name = 'process_history' AND column_name = 'run_id') THEN
+                ALTER TABLE validation.process_history ADD COLUMN run_id varchar(36);
+            END IF;
+            IF EXISTS (SELECT 1 FROM validation.process_history WHERE run_id IS NULL) THEN
+                UPDATE validation.process_history AS h SET run_id = 'legacy_' || r.run_key
+                FROM (
+                    SELECT id, sum(new_run) OVER (ORDER BY id) AS run_key
+                    FROM (
+                        SELECT id, run_id, CASE WHEN status = 3 OR process_name IS DISTINCT FROM lag(process_name) OVER (ORDER BY id) THEN 1 ELSE 0 END AS new_run
+                        FROM validation.process_history
+                    ) AS a
+                ) AS r
+                WHERE h.id = r.id AND h.run_id IS NULL;
+                UPDATE validation.process_history AS h SET username = u.username
+                FROM (SELECT run_id, max(username) AS username FROM validation.process_history WHERE run_id LIKE 'legacy_%' GROUP BY run_id) AS u
+                WHERE h.run_id = u.run_id AND h.username IS NULL AND u.username IS NOT NULL;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_username_idx') THEN
+                CREATE INDEX process_history_username_idx ON validation.process_history (username);
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_run_id_idx') THEN
+                CREATE INDEX process_history_run_id_idx ON validation.process_history (run_id);
+            END IF;
+            IF EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'compact_process_history' AND c.relkind = 'r') THEN
+                DROP TABLE validation.compact_process_history CASCADE;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'compact_process_history') THEN
+                EXECUTE $view$
+                CREATE VIEW validation.compact_process_history AS
+                SELECT min(id) AS id, min(process_name) AS process_name, string_agg(log, E'\n' ORDER BY id) AS log,
+                    (array_agg(status ORDER BY id DESC))[1] AS status, min(finished) AS finished, max(username) AS username, coalesce(run_id, 'id_' || id) AS run_id
+                FROM validation.process_history
+                GROUP BY coalesce(run_id, 'id_' || id)
+                $view$;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'validation' AND c.relname = 'process_history_view') THEN
+                EXECUTE $view$
+                CREATE VIEW validation.process_history_view AS
+                SELECT t.process_name, t.log, s.status, t.finished, t.username, t.id
+                FROM validation.compact_process_history AS t
+                JOIN validation.status AS s ON t.status = s.id
+                ORDER BY t.finished DESC
+                $view$;
+            END IF;
+        END
+        $$;
+        """
         return sql
 
-    def populateCompactValidationHistoryQuery(self, logList):
+    def getValidationHistoryUsernamesQuery(self, historyColumns = True):
         """
-        Returns the query for compact validation history table population.
-        :param logList: either a list of logs or a log line [id, process_name, log_text, status, finished_timestamp]
+        Returns the query for the usernames that ran validation processes.
+        :param historyColumns: False when process_history has no username column (not upgraded),
+        usernames are then read from the logs.
         """
-        sql = ""
-        if isinstance(logList, list):
-            if isinstance(logList[0], list):
-                for log in logList:
-                    sql += u"""INSERT INTO validation.compact_process_history (id, process_name, log, status, finished) VALUES ({0}, '{1}', '{2}', {3}, '{4}');\n""".\
-                    format(log[0], log[1], log[2].replace(r"\n", "\n"), log[3], log[4].toPyDateTime())
+        if not historyColumns:
+            sql = """SELECT DISTINCT substring(log from 'Database username: ([^\n]*)') AS username FROM validation.process_history WHERE log LIKE '%Database username: %' ORDER BY username;"""
+            return sql
+        sql = """SELECT DISTINCT username FROM validation.process_history WHERE username IS NOT NULL ORDER BY username;"""
+        return sql
+
+    def getValidationHistoryPageQuery(self, username = None, withoutUsername = False, limit = 200, offset = 0, historyColumns = True):
+        """
+        Returns the query for a page of the consolidated validation history, newest runs first.
+        Records are filtered by username (indexed) before they are grouped by run, and only the
+        runs of the page have their logs merged. Records written without run id are runs of their own.
+        :param username: if given, only runs from this user are returned.
+        :param withoutUsername: if True, only runs with no username are returned.
+        :param historyColumns: False when process_history has no username and run_id columns (not upgraded),
+        each record is then a row and usernames are read from the logs.
+        """
+        if not historyColumns:
+            usernameExpression = "substring(h.log from 'Database username: ([^\n]*)')"
+            if withoutUsername:
+                whereClause = "WHERE h.log NOT LIKE '%Database username: %'"
+            elif username:
+                whereClause = "WHERE {0} = '{1}'".format(usernameExpression, username.replace("'", "''"))
             else:
-                log = logList
-                sql += u"""INSERT INTO validation.compact_process_history (id, process_name, log, status, finished) VALUES ({0}, '{1}', '{2}', {3}, '{4}');\n""".\
-                    format(log[0], log[1], log[2].replace(r"\n", "\n"), log[3], log[4].toPyDateTime())
-        elif logList:
-            sql += u"""INSERT INTO validation.compact_process_history (id, process_name, log, status, finished) VALUES ({0}, '{1}', '{2}', {3}, '{4}');\n""".\
-                format(logList[0], logList[1], logList[2].replace(r"\n", "\n"), logList[3], logList[4].toPyDateTime())
+                whereClause = ""
+            sql = """SELECT h.process_name, h.log, s.status, h.finished, {0} FROM validation.process_history AS h JOIN validation.status AS s ON s.id = h.status {1} ORDER BY h.finished DESC, h.id DESC LIMIT {2} OFFSET {3};""".format(usernameExpression, whereClause, limit, offset)
+            return sql
+        if withoutUsername:
+            whereClause = "WHERE username IS NULL"
+        elif username:
+            whereClause = "WHERE username = '{0}'".format(username.replace("'", "''"))
+        else:
+            whereClause = ""
+        sql = """
+        WITH page AS (
+            SELECT coalesce(run_id, 'id_' || id) AS run_key, min(run_id) AS run_id, min(id) AS id, min(finished) AS finished
+            FROM validation.process_history {0}
+            GROUP BY coalesce(run_id, 'id_' || id)
+            ORDER BY min(finished) DESC, min(id) DESC
+            LIMIT {1} OFFSET {2}
+        )
+        SELECT min(h.process_name), string_agg(h.log, E'\n' ORDER BY h.id), (array_agg(s.status ORDER BY h.id DESC))[1], page.finished, max(h.username)
+        FROM page
+        JOIN validation.process_history AS h ON h.run_id = page.run_id OR (page.run_id IS NULL AND h.id = page.id)
+        JOIN validation.status AS s ON s.id = h.status
+        GROUP BY page.run_key, page.id, page.finished
+        ORDER BY page.finished DESC, page.id DESC;
+        """.format(whereClause, limit, offset)
         return sql
 
     def createHidNodeTableQuery(self, crs):
@@ -183,7 +183,7 @@ class DpiThread(GenericThread):
                 b1 = imgIn.GetRasterBand(bandNumber+1)
                 arr = b1.ReadAsArray()
                 # Updating progress
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
 
                 #computing percentile
                 newArr = arr.flatten()
@@ -197,27 +197,27 @@ class DpiThread(GenericThread):
                     maxValue = float(newArr[int(math.ceil(topPercent*total))])
                 del newArr
                 # Updating progress
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
 
                 #Transformation parameters
                 #Rouding the values out of bounds
                 numpy.putmask(arr, arr > maxValue, maxValue)
                 numpy.putmask(arr, arr < minValue, minValue)
                 # Updating progress
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
 
                 #The maxOutValue and the minOutValue must be set according to the convertion that will be applied (e.g. 8 bits, 16 bits, 32 bits)
                 a = (maxOutValue-minOutValue)/(maxValue-minValue)
                 newArr = (arr-minValue)*a+minOutValue
                 # Updating progress
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
 
                 outB = imgOut.GetRasterBand(outBandNumber)
                 outBandNumber += 1
                 outB.WriteArray(newArr)
                 outB.FlushCache()
                 # Updating progress
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
 
                 QgsMessageLog.logMessage("Band " + str(bandNumber) + ": "+str(minValue)+" , "+str(maxValue), "DSG Tools Plugin", QgsMessageLog.INFO)
             else:
@@ -236,7 +236,7 @@ class DpiThread(GenericThread):
         if os.path.exists(outFile):
             QgsMessageLog.logMessage(self.messenger.getSuccessfullFileCreation() + outFile, "DSG Tools Plugin", QgsMessageLog.INFO)
             # Updating progress
-            self.signals.stepProcessed.emit(self.getId())
+            self.step()
 
         #Deleting the objects
         imgWGS = None
@@ -40,9 +40,30 @@ class GenericThread(QRunnable):
         self.id = str(uuid4())
         
         self.signals = ProcessSignals()
+        #kind of job, used by the scheduler to limit concurrent jobs of the same kind
+        self.kind = None
+        self.stopped = [False]
+        #written only by the worker thread, read periodically by the scheduler
+        self.processedSteps = 0
 
     def run(self):
         pass
 
     def getId(self):
         return self.id
+
+    def step(self, steps = 1):
+        """
+        Counts processed steps. Progress is not signaled per step, the scheduler
+        reads the count at a fixed interval instead.
+        """
+        self.processedSteps += steps
+
+    def getProcessedSteps(self):
+        return self.processedSteps
+
+    def cancel(self):
+        """
+        Asks the running job to stop
+        """
+        self.stopped[0] = True
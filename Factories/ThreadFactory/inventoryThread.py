@@ -164,7 +164,7 @@ class InventoryThread(GenericThread):
                             gdalSrc = None
                             ogrSrc = None
                             
-                        self.signals.stepProcessed.emit(self.getId())
+                        self.step()
                     else:
                         QgsMessageLog.logMessage(self.messenger.getUserCanceledFeedbackMessage(), "DSG Tools Plugin", QgsMessageLog.INFO)
                         return (-1, self.messenger.getUserCanceledFeedbackMessage())
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                              -------------------
+        begin                : 2018-09-03
+        git sha              : $Format:%H$
+        copyright            : (C) 2018 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from collections import OrderedDict, deque
+
+from PyQt4.QtCore import QObject, QRunnable, QThreadPool, QThread, QTimer, pyqtSignal, pyqtSlot
+
+class JobRunner(QRunnable):
+    """
+    Runs a GenericThread job, making sure processingFinished is emitted even if the job raises.
+    """
+    def __init__(self, job):
+        super(JobRunner, self).__init__()
+        self.job = job
+
+    def run(self):
+        try:
+            self.job.run()
+        except Exception as e:
+            self.job.signals.processingFinished.emit(0, ':'.join([unicode(arg) for arg in e.args]), self.job.getId())
+
+class JobScheduler(QObject):
+    """
+    Runs GenericThread jobs on a dedicated thread pool (QGIS global pool is left alone).
+    - At most kindLimitDict[kind] jobs of each kind run at the same time, the others wait in a queue;
+    - Jobs are registered by uuid;
+    - Progress is not signaled per step: the processed steps of running jobs are read every
+      progressInterval milliseconds and only changes are signaled;
+    - Queued jobs can be canceled before they start, running jobs are asked to stop.
+    """
+    jobStarted = pyqtSignal(str)
+    jobCanceled = pyqtSignal(str)
+    jobFinished = pyqtSignal(int, str, str)
+    progressUpdated = pyqtSignal(str, int)
+
+    def __init__(self, kindLimitDict = None, progressInterval = 200, parent = None):
+        super(JobScheduler, self).__init__(parent)
+        self.kindLimitDict = {'pgdb' : 2, 'dpi' : max(1, QThread.idealThreadCount() / 2), 'inventory' : 1}
+        if kindLimitDict:
+            self.kindLimitDict.update(kindLimitDict)
+        #uuid: job, for every queued or running job
+        self.jobDict = OrderedDict()
+        #uuid: JobRunner, registered while the job runs
+        self.runnerDict = dict()
+        #kind: deque of queued uuids
+        self.queueDict = dict()
+        #kind: set of running uuids
+        self.runningDict = dict()
+        #uuid: last signaled processed steps
+        self.reportedDict = dict()
+        self.pool = QThreadPool(self)
+        self.updatePoolSize()
+        self.timer = QTimer(self)
+        self.timer.setInterval(progressInterval)
+        self.timer.timeout.connect(self.reportProgress)
+
+    def getKindLimit(self, kind):
+        return max(1, self.kindLimitDict.get(kind, 1))
+
+    def setKindLimit(self, kind, limit):
+        self.kindLimitDict[kind] = limit
+        self.updatePoolSize()
+        self.startQueuedJobs(kind)
+
+    def updatePoolSize(self):
+        """
+        The pool must be able to run the limit of every known kind at the same time.
+        """
+        kindSet = set(self.kindLimitDict.keys()) | set(self.queueDict.keys())
+        self.pool.setMaxThreadCount(sum([self.getKindLimit(kind) for kind in kindSet]))
+
+    def getJob(self, uuid):
+        return self.jobDict.get(uuid)
+
+    def isQueued(self, uuid):
+        job = self.jobDict.get(uuid)
+        return job is not None and uuid in self.queueDict[job.kind]
+
+    def submit(self, job, kind):
+        """
+        Registers job and starts it as soon as the limit of its kind allows.
+        Returns the job uuid.
+        """
+        job.kind = kind
+        uuid = job.getId()
+        self.jobDict[uuid] = job
+        if kind not in self.queueDict:
+            self.queueDict[kind] = deque()
+            self.runningDict[kind] = set()
+            self.updatePoolSize()
+        self.queueDict[kind].append(uuid)
+        self.startQueuedJobs(kind)
+        return uuid
+
+    def startQueuedJobs(self, kind):
+        queue = self.queueDict.get(kind)
+        if queue is None:
+            return
+        running = self.runningDict[kind]
+        while queue and len(running) < self.getKindLimit(kind):
+            uuid = queue.popleft()
+            job = self.jobDict[uuid]
+            job.signals.processingFinished.connect(self.finishJob)
+            #the pool takes ownership of the runner and deletes it when it is done
+            runner = JobRunner(job)
+            self.runnerDict[uuid] = runner
+            running.add(uuid)
+            self.reportedDict[uuid] = 0
+            self.pool.start(runner)
+            self.jobStarted.emit(uuid)
+        if self.runnerDict and not self.timer.isActive():
+            self.timer.start()
+
+    @pyqtSlot(int, str, str)
+    def finishJob(self, feedback, message, uuid):
+        """
+        Unregisters a finished job and starts the next queued job of its kind.
+        """
+        job = self.jobDict.pop(uuid, None)
+        if job is None:
+            return
+        self.runningDict[job.kind].discard(uuid)
+        self.runnerDict.pop(uuid, None)
+        self.reportJobProgress(uuid, job)
+        self.reportedDict.pop(uuid, None)
+        if not self.runnerDict:
+            self.timer.stop()
+        #queued jobs must not wait for the handlers of jobFinished (e.g. message boxes)
+        self.startQueuedJobs(job.kind)
+        self.jobFinished.emit(feedback, message, uuid)
+
+    def cancel(self, uuid):
+        """
+        Cancels a job. Queued jobs are removed (jobCanceled is emitted), running jobs are
+        asked to stop and finish as usual.
+        """
+        job = self.jobDict.get(uuid)
+        if job is None:
+            return
+        if uuid in self.queueDict[job.kind]:
+            self.queueDict[job.kind].remove(uuid)
+            self.jobDict.pop(uuid)
+            self.jobCanceled.emit(uuid)
+        else:
+            job.cancel()
+
+    def cancelAll(self):
+        for uuid in self.jobDict.keys():
+            self.cancel(uuid)
+
+    def reportJobProgress(self, uuid, job):
+        steps = job.getProcessedSteps()
+        if steps != self.reportedDict.get(uuid):
+            self.reportedDict[uuid] = steps
+            self.progressUpdated.emit(uuid, steps)
+
+    def reportProgress(self):
+        """
+        Signals the processed steps of running jobs that changed since the last report.
+        """
+        for uuid in self.runnerDict.keys():
+            self.reportJobProgress(uuid, self.jobDict[uuid])
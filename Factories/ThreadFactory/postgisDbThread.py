@@ -162,9 +162,9 @@ class PostgisDbThread(GenericThread):
         if not hasTemplate:
             try:
                 self.abstractDb.createTemplateDatabase(self.version)
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
                 self.connectToTemplate()
-                self.signals.stepProcessed.emit(self.getId())
+                self.step()
             except Exception as e:
                 return (0, self.messenger.getProblemFeedbackMessage()+'\n'+':'.join(e.args))
             self.db.open()
@@ -181,7 +181,7 @@ class PostgisDbThread(GenericThread):
                         return (0, self.messenger.getProblemFeedbackMessage())
     
                     # Updating progress
-                    self.signals.stepProcessed.emit(self.getId())
+                    self.step()
                 else:
                     self.db.rollback()
                     self.db.close()
@@ -209,7 +209,7 @@ class PostgisDbThread(GenericThread):
         if not self.stopped[0]:
             templateName = self.abstractDb.getTemplateName(self.version)
             self.abstractDb.createDbFromTemplate(self.dbName, templateName, parentWidget = self.parent)
-            self.signals.stepProcessed.emit(self.getId())
+            self.step()
             #5. alter spatial structure
             createdDb = self.dbFactory.createDbFactory('QPSQL')
             createdDb.connectDatabaseWithParameters(self.abstractDb.db.hostName(), self.abstractDb.db.port(), self.dbName, self.abstractDb.db.userName(), self.abstractDb.db.password())
@@ -218,7 +218,7 @@ class PostgisDbThread(GenericThread):
             if errorTuple:
                 QgsMessageLog.logMessage(self.messenger.getProblemMessage(errorTuple[0], errorTuple[1]), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
                 return (0, self.messenger.getProblemFeedbackMessage())                
-            self.signals.stepProcessed.emit(self.getId())
+            self.step()
         else:
             QgsMessageLog.logMessage(self.messenger.getUserCanceledFeedbackMessage(), "DSG Tools Plugin", QgsMessageLog.INFO)
             return (-1, self.messenger.getUserCanceledFeedbackMessage())
@@ -47,8 +47,11 @@ class UtmGrid(QObject):
         self.stepsDone=0
         self.stepsTotal=0
         self.featureBuffer=[]
+        self.batchSize=1000
         self.MIdict=[]
         self.MIRdict=[]
+        self.inomToMIdict=[]
+        self.inomToMIRdict=[]
         
     def __del__(self):
         """Destructor."""
@@ -242,66 +245,93 @@ class UtmGrid(QObject):
         return poly
     
     def populateQgsLayer(self, iNomen, stopScale, layer):
-        """Generic recursive method to create frame polygon for the given
-        stopScale within the given map index (iNomen)
+        """Generic method to create frame polygons for the given
+        stopScale within the given map index (iNomen).
+        Features are sent to the provider in chunks of self.batchSize
         """
-        scale = self.getScale(iNomen)            
-        #first run
-        if (self.stepsTotal==0):
-            self.stepsTotal=self.computeNumberOfSteps(self.getScaleIdFromScale(scale), self.getScaleIdFromScale(stopScale))
-            print "Total:",self.stepsTotal
-            self.stepsDone=0
-        if scale == stopScale:
-            (x, y) = self.getLLCorner(iNomen)
-            dx = self.getSpacingX(stopScale)
-            dy = self.getSpacingY(stopScale)
-            poly = self.makeQgsPolygon(x, y, x + dx, y + dy)
-            
-            self.insertFrameIntoQgsLayer(layer, poly, iNomen)
-            
+        scale = self.getScale(iNomen)
+        self.stepsTotal=self.computeNumberOfSteps(self.getScaleIdFromScale(scale), self.getScaleIdFromScale(stopScale))
+        self.stepsDone=0
+        self.featureBuffer=[]
+        for inomen in self.getINomenList(iNomen, stopScale):
+            poly = self.getQgsPolygonFrame(inomen)
+            self.insertFrameIntoQgsLayer(layer, poly, inomen)
             self.stepsDone+=1
-            print self.stepsDone, '/', self.stepsTotal
-        else:
-            scaleId = self.getScaleIdFromiNomen(iNomen)
-            matrix = self.scaleText[ scaleId+1 ]
-            
-            for i in range(len(matrix)):
-                line = matrix[i]
-                for j in range(len(line)):
-                    inomen2 = iNomen + '-' + line[j]
-                    self.populateQgsLayer(inomen2, stopScale, layer)
-                    
-    def insertFrameIntoQgsLayer(self, layer, poly, map_index):
-        """Inserts the poly into layer
+        self.flushFeatureBuffer(layer)
+
+    def getINomenList(self, iNomen, stopScale):
+        """Generates, without recursion, every map index of stopScale
+        contained in the given map index (iNomen)
         """
-        provider = layer.dataProvider()
+        scaleId = self.getScaleIdFromiNomen(iNomen)
+        stopScaleId = self.getScaleIdFromScale(stopScale)
+        inomenList = [iNomen]
+        for i in range(scaleId+1, stopScaleId+1):
+            suffixList = [text for line in self.scaleText[i] for text in line]
+            inomenList = [inomen + '-' + suffix for inomen in inomenList for suffix in suffixList]
+        return inomenList
 
+    def insertFrameIntoQgsLayer(self, layer, poly, map_index):
+        """Buffers the poly to be inserted into layer.
+        The buffer is flushed each self.batchSize features
+        """
         #Creating the feature
         feature = QgsFeature()
         feature.initAttributes(1)
         feature.setAttribute(0, map_index)
         feature.setGeometry(poly)
 
-        # Adding the feature into the file
-        provider.addFeatures([feature])
+        self.featureBuffer.append(feature)
+        if len(self.featureBuffer) >= self.batchSize:
+            self.flushFeatureBuffer(layer)
+
+    def flushFeatureBuffer(self, layer):
+        """Adds the buffered features into layer in a single call
+        """
+        if self.featureBuffer:
+            layer.dataProvider().addFeatures(self.featureBuffer)
+            self.featureBuffer=[]
     
     def getMIdict(self):
         if not self.MIdict:
-            self.MIdict = self.getDict("MI100.csv")
+            self.MIdict, self.inomToMIdict = self.getDict("MI100.csv")
         return self.MIdict
             
     def getMIRdict(self):
         if not self.MIRdict:
-            self.MIRdict = self.getDict("MIR250.csv")
+            self.MIRdict, self.inomToMIRdict = self.getDict("MIR250.csv")
         return self.MIRdict    
+
+    def getInomToMIdict(self):
+        if not self.inomToMIdict:
+            self.getMIdict()
+        return self.inomToMIdict
+
+    def getInomToMIRdict(self):
+        if not self.inomToMIRdict:
+            self.getMIRdict()
+        return self.inomToMIRdict
     
-    def getDict(self, file_name):    
+    def getDict(self, file_name):
+        """Returns the mi->inom and the inom->mi dictionaries from the csv file
+        """
         csvFile = open(os.path.join(os.path.dirname(__file__),file_name))
         data = csvFile.readlines()
         csvFile.close()
         l1 = map(lambda x: (x.strip()).split(';'),data)
         dicionario = dict((a[1].lstrip('0'),a[0]) for a in l1)
-        return dicionario
+        inverseDict = dict((v,k) for k,v in dicionario.iteritems())
+        return dicionario, inverseDict
+
+    def getInverseDict(self, miDict):
+        """Returns the precomputed inom->mi dictionary for miDict
+        """
+        #identity checks only, so that looking up one index does not load the csv of the other
+        if miDict is self.MIdict:
+            return self.getInomToMIdict()
+        if miDict is self.MIRdict:
+            return self.getInomToMIRdict()
+        return dict((v,k) for k,v in miDict.iteritems())
 
     def getINomenFromMI(self,mi):
         return self.getINomen(self.getMIdict(), mi)
@@ -322,22 +352,25 @@ class UtmGrid(QObject):
     
     def getMIfromInom(self,inom):
         return self.getMI(self.getMIdict(),inom)
-    
+
+    def getMIRfromInom(self,inom):
+        return self.getMIR(self.getMIRdict(),inom)
+
     def getMI(self, miDict, inom):
         parts = inom.split('-')
         hundredInom = '-'.join(parts[0:5])
         remains = parts[5::]
-        for k,v in miDict.iteritems():
-            if v == hundredInom:
-                return '-'.join([k]+remains)
+        inverseDict = self.getInverseDict(miDict)
+        if hundredInom in inverseDict:
+            return '-'.join([inverseDict[hundredInom]]+remains)
     
     def getMIR(self, miDict, inom):
         parts = inom.split('-')
         hundredInom = '-'.join(parts[0:4])
         remains = parts[4::]
-        for k,v in miDict.iteritems():
-            if v == hundredInom:
-                return '-'.join([k]+remains)
+        inverseDict = self.getInverseDict(miDict)
+        if hundredInom in inverseDict:
+            return '-'.join([inverseDict[hundredInom]]+remains)
 
 if (__name__=="__main__"):
     test=UtmGrid()
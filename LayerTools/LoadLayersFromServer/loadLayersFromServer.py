@@ -163,7 +163,7 @@ class LoadLayersFromServer(QtGui.QDialog, FORM_CLASS):
                     if i in self.lyrDict.keys():
                         if dbName in self.lyrDict[i].keys():
                             selectedClasses.append(self.lyrDict[i][dbName])
-                factoryDict[dbName].load(selectedClasses, uniqueLoad=uniqueLoad, onlyWithElements=withElements, stylePath=selectedStyle, useInheritance=onlyParents, isEdgv=isEdgv, parent=self)
+                factoryDict[dbName].load(selectedClasses, uniqueLoad=uniqueLoad, onlyWithElements=withElements, stylePath=selectedStyle, useInheritance=onlyParents, isEdgv=isEdgv, parent=self, bulkLoad=True)
                 progress.step()
             except Exception as e:
                 exceptionDict[dbName] = ':'.join(e.args)
@@ -27,6 +27,8 @@ from qgis._core import QgsAction
 import sip
 
 from DsgTools.Factories.ThreadFactory.threadFactory import ThreadFactory
+from DsgTools.Factories.ThreadFactory.jobScheduler import JobScheduler
+from DsgTools.Factories.DbFactory.dbConnectionPool import getMaxDbWorkers
 
 class ProcessManager(QObject):
     def __init__(self, iface):
@@ -36,29 +38,34 @@ class ProcessManager(QObject):
         super(ProcessManager, self).__init__()
 
         self.iface = iface
+        #uuid: (process, progressBar)
         self.processDict = dict()
 
         self.threadFactory = ThreadFactory()
+        self.scheduler = JobScheduler(kindLimitDict = {'pgdb' : getMaxDbWorkers()}, parent = self)
+        self.scheduler.jobStarted.connect(self.processStarted)
+        self.scheduler.jobCanceled.connect(self.processCanceled)
+        self.scheduler.jobFinished.connect(self.processFinished)
+        self.scheduler.progressUpdated.connect(self.setProgressValue)
 
     def findProgressBar(self, uuid):
         """
         Gets a process progress bar by its uuid
         """
-        for key in self.processDict.keys():
-            id = key.getId()
-            if id == uuid:
-                return self.processDict[key]
-        return None
+        if uuid not in self.processDict:
+            return None
+        progressBar = self.processDict[uuid][1]
+        if sip.isdeleted(progressBar):
+            return None
+        return progressBar
 
     def findProcess(self, uuid):
         """
         Finds a process by its uuid
         """
-        for key in self.processDict.keys():
-            id = key.getId()
-            if id == uuid:
-                return key
-        return None
+        if uuid not in self.processDict:
+            return None
+        return self.processDict[uuid][0]
 
     @pyqtSlot(int, str)
     def setProgressRange(self, maximum, uuid):
@@ -68,18 +75,35 @@ class ProcessManager(QObject):
         uuid: process uuid
         """
         progressBar = self.findProgressBar(uuid)
-        if not sip.isdeleted(progressBar):
+        if progressBar:
             progressBar.setRange(0, maximum)
 
-    @pyqtSlot(str)
-    def stepProcessed(self, uuid):
+    @pyqtSlot(str, int)
+    def setProgressValue(self, uuid, value):
         """
-        Updates the process progress bar
+        Updates the process progress bar with the steps processed so far (signaled by the scheduler at a fixed interval)
         uuid: process uuid
+        value: processed steps
+        """
+        progressBar = self.findProgressBar(uuid)
+        if progressBar:
+            progressBar.setValue(min(value, progressBar.maximum()))
+
+    @pyqtSlot(str)
+    def processStarted(self, uuid):
+        """
+        Shows the progress of a process that left the queue
         """
         progressBar = self.findProgressBar(uuid)
-        if not sip.isdeleted(progressBar):
-            progressBar.setValue(progressBar.value() + 1)
+        if progressBar:
+            progressBar.setFormat('%p%')
+
+    @pyqtSlot(str)
+    def processCanceled(self, uuid):
+        """
+        Forgets a process canceled before it started
+        """
+        self.processDict.pop(uuid, None)
 
     @pyqtSlot(int,str,str)
     def processFinished( self, feedback, message, uuid):
@@ -94,34 +118,37 @@ class ProcessManager(QObject):
         process = self.findProcess(uuid)
         if process != None:
             process.stopped[0] = True
-            self.processDict.pop(process, None)
+            self.processDict.pop(uuid, None)
             process = None
 
-        if feedback == 1:
+        if feedback == 1 and progressBar:
             progressBar.setValue(progressBar.maximum())
         QMessageBox.information(self.iface.mainWindow(), 'DSG Tools', message)
 
-    def prepareProcess(self, process, message):
+    def prepareProcess(self, process, message, kind):
         """
         Prepares the process to be executed.
         Creates a message bar.
         Connects the destroyed progress bar signal to the process cancel method
+        kind: kind of process, processes of the same kind share a concurrency limit and wait in a queue
         """
         # Setting the progress bar
         progressMessageBar = self.iface.messageBar().createMessage(message)
         progressBar = QProgressBar()
         progressBar.setAlignment(Qt.AlignLeft|Qt.AlignVCenter)
+        progressBar.setFormat(self.tr('Queued'))
         progressMessageBar.layout().addWidget(progressBar)
         self.iface.messageBar().pushWidget(progressMessageBar, self.iface.messageBar().INFO)
 
-        #connecting the destroyed signal
-        progressMessageBar.destroyed.connect(process.messenger.progressCanceled)
+        #closing the message bar cancels the process (or removes it from the queue)
+        uuid = process.getId()
+        progressMessageBar.destroyed.connect(lambda *args : self.scheduler.cancel(uuid))
 
         #storing the process and its related progressBar
-        self.processDict[process] = progressBar
+        self.processDict[uuid] = (process, progressBar)
 
-        #initiating processing
-        QThreadPool.globalInstance().start(process)
+        #queueing processing
+        self.scheduler.submit(process, kind)
 
     def createPostgisDatabaseProcess(self, dbName, abstractDb, version, epsg):
         """
@@ -133,10 +160,8 @@ class ProcessManager(QObject):
         process.setParameters(abstractDb,dbName,version,epsg,stopped)
         #connecting signal/slots
         process.signals.rangeCalculated.connect(self.setProgressRange)
-        process.signals.stepProcessed.connect(self.stepProcessed)
-        process.signals.processingFinished.connect(self.processFinished)
         #preparing the progressBar that will be created
-        self.prepareProcess(process, self.tr("Creating database structure..."))
+        self.prepareProcess(process, self.tr("Creating database structure..."), 'pgdb')
 
     def createDpiProcess(self, filesList, rasterType, minOutValue, maxOutValue, outDir, percent, epsg):
         """
@@ -149,11 +174,9 @@ class ProcessManager(QObject):
 
         #connecting signal/slots
         process.signals.rangeCalculated.connect(self.setProgressRange)
-        process.signals.stepProcessed.connect(self.stepProcessed)
-        process.signals.processingFinished.connect(self.processFinished)
 
         #preparing the progressBar that will be created
-        self.prepareProcess(process, self.tr("Processing images..."))
+        self.prepareProcess(process, self.tr("Processing images..."), 'dpi')
 
     def createInventoryProcess(self, parentFolder, outputFile, makeCopy, destinationFolder, formatsList, isWhitelist, isOnlyGeo):
         """
@@ -166,12 +189,10 @@ class ProcessManager(QObject):
 
         #connecting signal/slots
         process.signals.rangeCalculated.connect(self.setProgressRange)
-        process.signals.stepProcessed.connect(self.stepProcessed)
-        process.signals.processingFinished.connect(self.processFinished)
         process.signals.loadFile.connect(self.loadInventoryFile)
 
         #preparing the progressBar that will be created
-        self.prepareProcess(process, self.tr("Making inventory, please wait..."))
+        self.prepareProcess(process, self.tr("Making inventory, please wait..."), 'inventory')
 
     @pyqtSlot(str, bool)
     def loadInventoryFile(self, outputFile, isOnlyGeo):
@@ -21,17 +21,50 @@
  ***************************************************************************/
 """
 
-from qgis.core import QgsFeatureRequest, QgsGeometry, QGis, QgsSpatialIndex, QgsCoordinateTransform
+from qgis.core import QgsFeatureRequest, QgsGeometry, QGis, QgsSpatialIndex, QgsCoordinateTransform, QgsFeature
 from DsgTools.ProductionTools.ContourTool.contour_value import ContourValue
 
 class ContourTool():
+    def __init__(self):
+        self.reference = None
+        self.first_value = None
+        self.index = QgsSpatialIndex()
+        #bounding boxes of the indexed features, needed to remove them from the index
+        self.bboxDict = dict()
+
     def updateReference(self, referenceLayer):
         """
-        Updates the reference layer and updates the spatial index
+        Updates the reference layer and updates the spatial index.
+        The index is only rebuilt when the reference layer changes, afterwards
+        it is kept up to date by the layer edit signals.
         """
         self.first_value = None
+        if referenceLayer == self.reference:
+            return
+        self.disconnectReferenceSignals()
         self.reference = referenceLayer
         self.populateIndex()
+        self.connectReferenceSignals()
+
+    def connectReferenceSignals(self):
+        self.reference.featureAdded.connect(self.addToIndex)
+        self.reference.featureDeleted.connect(self.removeFromIndex)
+        self.reference.geometryChanged.connect(self.updateIndex)
+        self.reference.committedFeaturesAdded.connect(self.addCommittedToIndex)
+        self.reference.editingStopped.connect(self.removeUncommittedFromIndex)
+
+    def disconnectReferenceSignals(self):
+        if not self.reference:
+            return
+        try:
+            self.reference.featureAdded.disconnect(self.addToIndex)
+            self.reference.featureDeleted.disconnect(self.removeFromIndex)
+            self.reference.geometryChanged.disconnect(self.updateIndex)
+            self.reference.committedFeaturesAdded.disconnect(self.addCommittedToIndex)
+            self.reference.editingStopped.disconnect(self.removeUncommittedFromIndex)
+        except (RuntimeError, TypeError):
+            #the previous reference layer was already removed
+            pass
 
     def populateIndex(self):
         """
@@ -39,24 +72,91 @@ class ContourTool():
         """
         #spatial index
         self.index = QgsSpatialIndex()
-        for feat in self.reference.getFeatures():
-            self.index.insertFeature(feat)
-            
+        self.bboxDict = dict()
+        #attributes are not needed to build the index
+        request = QgsFeatureRequest().setSubsetOfAttributes([])
+        for feat in self.reference.getFeatures(request):
+            self.insertIntoIndex(feat.id(), feat.geometry())
+
+    def insertIntoIndex(self, featId, geom):
+        if not geom or geom.isEmpty():
+            return
+        feat = QgsFeature(featId)
+        feat.setGeometry(QgsGeometry(geom))
+        if self.index.insertFeature(feat):
+            self.bboxDict[featId] = geom.boundingBox()
+
+    def deleteFromIndex(self, featId):
+        bbox = self.bboxDict.pop(featId, None)
+        if bbox is None:
+            return
+        feat = QgsFeature(featId)
+        feat.setGeometry(QgsGeometry.fromRect(bbox))
+        self.index.deleteFeature(feat)
+
+    def addToIndex(self, featId):
+        """
+        Slot called when a feature is added to the reference layer
+        """
+        request = QgsFeatureRequest().setFilterFid(featId).setSubsetOfAttributes([])
+        for feat in self.reference.getFeatures(request):
+            self.deleteFromIndex(featId)
+            self.insertIntoIndex(featId, feat.geometry())
+
+    def removeFromIndex(self, featId):
+        """
+        Slot called when a feature is deleted from the reference layer
+        """
+        self.deleteFromIndex(featId)
+
+    def updateIndex(self, featId, geom):
+        """
+        Slot called when a feature geometry of the reference layer is changed
+        """
+        self.deleteFromIndex(featId)
+        self.insertIntoIndex(featId, geom)
+
+    def addCommittedToIndex(self, layerId, addedFeatures):
+        """
+        Slot called when added features are committed and receive their definitive ids
+        """
+        for feat in addedFeatures:
+            self.deleteFromIndex(feat.id())
+            self.insertIntoIndex(feat.id(), feat.geometry())
+
+    def removeUncommittedFromIndex(self):
+        """
+        Slot called when editing stops. Features added during the edit session
+        have temporary (negative) ids that are no longer valid.
+        """
+        for featId in [featId for featId in self.bboxDict if featId < 0]:
+            self.deleteFromIndex(featId)
+
     def getCandidates(self, bbox):
         """
         Gets candidates using the spatial index to speedup the process
         """
         #features that might satisfy the query
         ids = self.index.intersects(bbox)
-        candidates = []
-        for id in ids:
-            candidates.append(self.reference.getFeatures(QgsFeatureRequest().setFilterFid(id)).next())
-        return candidates            
-            
-    def getFeatures(self, geom):
+        if not ids:
+            return []
+        #fetching all candidates with a single request
+        return [feat for feat in self.reference.getFeatures(QgsFeatureRequest().setFilterFids(ids))]
+
+    def getPreparedEngine(self, geom):
+        """
+        Gets a prepared geometry engine for geom, used to test it against many features
+        """
+        engine = QgsGeometry.createGeometryEngine(geom.geometry())
+        engine.prepareGeometry()
+        return engine
+
+    def getFeatures(self, geom, engine = None):
         """
         Gets the features that intersect geom to be updated
         """
+        if not engine:
+            engine = self.getPreparedEngine(geom)
         #features that satisfy the query
         ret = []
         
@@ -64,7 +164,7 @@ class ContourTool():
         candidates = self.getCandidates(rect)
         for candidate in candidates:
             featGeom = candidate.geometry()
-            if featGeom.intersects(geom):
+            if featGeom and not featGeom.isEmpty() and engine.intersects(featGeom.geometry()):
                 ret.append(candidate)
                 
         return ret
@@ -75,10 +175,12 @@ class ContourTool():
         """
         return item[0]
                 
-    def sortFeatures(self, geom, features):
+    def sortFeatures(self, geom, features, engine = None):
         """
         Sorts features according to the distance
         """
+        if not engine:
+            engine = self.getPreparedEngine(geom)
         #sorting by distance
         distances = []
         
@@ -86,7 +188,10 @@ class ContourTool():
         pointGeom = QgsGeometry.fromPoint(firstPoint)
 
         for intersected in features:
-            intersection = geom.intersection(intersected.geometry())
+            intersectionGeometry = engine.intersection(intersected.geometry().geometry())
+            if not intersectionGeometry:
+                continue
+            intersection = QgsGeometry(intersectionGeometry)
             if intersection.type() == QGis.Point:
                 distance = intersection.distance(pointGeom)
                 distances.append((distance, intersected))
@@ -112,11 +217,13 @@ class ContourTool():
         Assigns attribute values to all features that intersect geom.
         """
         self.reproject(geom, canvasCrs)
-        features = self.getFeatures(geom)
+        #the drawn line is prepared once and tested against all candidates
+        engine = self.getPreparedEngine(geom)
+        features = self.getFeatures(geom, engine)
         if len(features) == 0:
             return -2
         
-        ordered = self.sortFeatures(geom, features)
+        ordered = self.sortFeatures(geom, features, engine)
         if len(ordered) == 0:
             return -1
 
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+layerHitTester
+                                 A QGIS plugin
+Finds the features of many layers under a canvas rectangle.
+                             -------------------
+        begin                : 2018-08-27
+        git sha              : $Format:%H$
+        copyright            : (C) 2018 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from collections import OrderedDict
+
+from qgis.core import QgsMapLayerRegistry, QgsFeatureRequest, QgsSpatialIndex, QgsCoordinateTransform, QgsFeature, QgsGeometry
+from PyQt4.QtCore import QObject
+
+class LayerHitTester(QObject):
+    """
+    Finds the features of a list of layers that intersect a rectangle given in canvas coordinates.
+    Each layer has a spatial index of its feature bounding boxes. It is filled lazily: the first
+    hit inside a canvas extent that is not covered yet fetches the features of that extent (one
+    rectangle request, no attributes) and the covered area is kept, so panning back costs nothing.
+    The index is kept up to date by the layer edit signals and dropped when the layer data changes.
+    Only layers with indexed candidates are queried (once, by feature id) on each hit.
+    Canvas to layer coordinate transforms are cached per layer.
+    """
+    def __init__(self, canvas):
+        super(LayerHitTester, self).__init__()
+        self.canvas = canvas
+        #layer id: {'index': QgsSpatialIndex, 'bboxDict': {featId: QgsRectangle}, 'coveredList': [QgsRectangle]}
+        self.indexDict = dict()
+        #layer id: (canvas crs authid, layer crs authid, QgsCoordinateTransform or None)
+        self.transformDict = dict()
+        self.connectedLayerIdList = []
+        self.canvas.destinationCrsChanged.connect(self.clearTransforms)
+        QgsMapLayerRegistry.instance().layersWillBeRemoved.connect(self.removeLayers)
+
+    def clearTransforms(self):
+        self.transformDict = dict()
+
+    def removeLayers(self, layerIdList):
+        for layerId in layerIdList:
+            self.removeLayer(layerId)
+
+    def removeLayer(self, layerId):
+        self.indexDict.pop(layerId, None)
+        self.transformDict.pop(layerId, None)
+        if layerId in self.connectedLayerIdList:
+            self.connectedLayerIdList.remove(layerId)
+
+    def invalidateLayerIndex(self, layerId):
+        """
+        Drops the index of layerId. It is filled again on the next hits.
+        """
+        self.indexDict.pop(layerId, None)
+
+    def getTransform(self, layer):
+        """
+        Gets the transform from canvas coordinates to layer coordinates (None if both CRS are the same).
+        """
+        canvasAuthId = self.canvas.mapSettings().destinationCrs().authid()
+        layerAuthId = layer.crs().authid()
+        cached = self.transformDict.get(layer.id())
+        if cached and cached[0] == canvasAuthId and cached[1] == layerAuthId:
+            return cached[2]
+        if canvasAuthId == layerAuthId:
+            coordinateTransformer = None
+        else:
+            coordinateTransformer = QgsCoordinateTransform(self.canvas.mapSettings().destinationCrs(), layer.crs())
+        self.transformDict[layer.id()] = (canvasAuthId, layerAuthId, coordinateTransformer)
+        return coordinateTransformer
+
+    def toLayerRect(self, layer, rect):
+        """
+        Reprojects rect (canvas coordinates) to layer coordinates.
+        """
+        coordinateTransformer = self.getTransform(layer)
+        if not coordinateTransformer:
+            return rect
+        return coordinateTransformer.transformBoundingBox(rect)
+
+    def connectLayerSignals(self, layer):
+        layerId = layer.id()
+        if layerId in self.connectedLayerIdList:
+            return
+        self.connectedLayerIdList.append(layerId)
+        invalidate = lambda *args : self.invalidateLayerIndex(layerId)
+        layer.featureAdded.connect(lambda featId : self.addFeature(layerId, featId))
+        layer.featureDeleted.connect(lambda featId : self.deleteFeature(layerId, featId))
+        layer.geometryChanged.connect(lambda featId, geom : self.updateFeature(layerId, featId, geom))
+        #committed or rolled back edits change feature ids
+        layer.editingStopped.connect(invalidate)
+        if hasattr(layer, 'dataChanged'):
+            layer.dataChanged.connect(invalidate)
+        if hasattr(layer, 'subsetStringChanged'):
+            layer.subsetStringChanged.connect(invalidate)
+        layer.destroyed.connect(lambda *args : self.removeLayer(layerId))
+
+    def getLayerIndex(self, layer, searchRect):
+        """
+        Gets the bounding box index of layer, making sure it covers searchRect (layer coordinates).
+        When it does not, the features of the visible canvas extent (plus searchRect) are indexed.
+        """
+        entry = self.indexDict.get(layer.id())
+        if entry is None:
+            entry = {'index' : QgsSpatialIndex(), 'bboxDict' : dict(), 'coveredList' : []}
+            self.indexDict[layer.id()] = entry
+            self.connectLayerSignals(layer)
+        if not any(covered.contains(searchRect) for covered in entry['coveredList']):
+            fetchRect = self.toLayerRect(layer, self.canvas.extent())
+            fetchRect.combineExtentWith(searchRect)
+            #only geometries are needed to build the index
+            request = QgsFeatureRequest(fetchRect).setSubsetOfAttributes([])
+            for feat in layer.getFeatures(request):
+                self.deleteFromIndex(entry, feat.id())
+                self.insertIntoIndex(entry, feat.id(), feat.geometry())
+            entry['coveredList'].append(fetchRect)
+        return entry['index']
+
+    def insertIntoIndex(self, entry, featId, geom):
+        if not geom or geom.isEmpty():
+            return
+        feat = QgsFeature(featId)
+        feat.setGeometry(QgsGeometry(geom))
+        if entry['index'].insertFeature(feat):
+            entry['bboxDict'][featId] = geom.boundingBox()
+
+    def deleteFromIndex(self, entry, featId):
+        bbox = entry['bboxDict'].pop(featId, None)
+        if bbox is None:
+            return
+        feat = QgsFeature(featId)
+        feat.setGeometry(QgsGeometry.fromRect(bbox))
+        entry['index'].deleteFeature(feat)
+
+    def addFeature(self, layerId, featId):
+        if layerId not in self.indexDict:
+            return
+        layer = QgsMapLayerRegistry.instance().mapLayer(layerId)
+        request = QgsFeatureRequest().setFilterFid(featId).setSubsetOfAttributes([])
+        for feat in layer.getFeatures(request):
+            self.updateFeature(layerId, featId, feat.geometry())
+
+    def deleteFeature(self, layerId, featId):
+        if layerId in self.indexDict:
+            self.deleteFromIndex(self.indexDict[layerId], featId)
+
+    def updateFeature(self, layerId, featId, geom):
+        if layerId not in self.indexDict:
+            return
+        entry = self.indexDict[layerId]
+        self.deleteFromIndex(entry, featId)
+        self.insertIntoIndex(entry, featId, geom)
+
+    def getFeatures(self, layerList, rect):
+        """
+        Gets the features of each layer in layerList that intersect rect (canvas coordinates).
+        Layers whose indexed bounding boxes do not intersect rect are not queried.
+        Returns an OrderedDict {layer: [features]} (layers without features are not present),
+        following the order of layerList.
+        """
+        layerFeatureDict = OrderedDict()
+        for layer in layerList:
+            layerRect = self.toLayerRect(layer, rect)
+            featIdList = self.getLayerIndex(layer, layerRect).intersects(layerRect)
+            if not featIdList:
+                continue
+            searchGeom = QgsGeometry.fromRect(layerRect)
+            featureList = []
+            for feature in layer.getFeatures(QgsFeatureRequest().setFilterFids(featIdList)):
+                geom = feature.geometry()
+                if geom and geom.intersects(searchGeom):
+                    featureList.append(feature)
+            if featureList:
+                layerFeatureDict[layer] = featureList
+        return layerFeatureDict
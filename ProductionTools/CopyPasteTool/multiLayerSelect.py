@@ -31,6 +31,8 @@ from PyQt4.QtGui import QColor, QMenu, QCursor
 import numpy as np
 from PyQt4.QtCore import Qt
 
+from DsgTools.ProductionTools.CopyPasteTool.layerHitTester import LayerHitTester
+
 class MultiLayerSelection(QgsMapTool):
     finished = QtCore.pyqtSignal(list)
     def __init__(self, canvas, iface):
@@ -60,6 +62,8 @@ class MultiLayerSelection(QgsMapTool):
         self.cursorChanged = False
         self.cursorChangingHotkey = QtCore.Qt.Key_Alt
         self.menuHovered = False # indicates hovering actions over context menu
+        # finds features under the cursor without querying layers that are not hit
+        self.hitTester = LayerHitTester(self.canvas)
     
     def keyPressEvent(self, e):
         """
@@ -369,8 +373,7 @@ class MultiLayerSelection(QgsMapTool):
         geom = None
         for layer in self.iface.legendInterface().layers():
             if isinstance(layer, QgsVectorLayer):
-                selection = layer.selectedFeatures()
-                if len(selection):
+                if layer.selectedFeatureCount():
                     if geom == None:
                         geom = layer.geometryType()
                         continue
@@ -603,19 +606,8 @@ class MultiLayerSelection(QgsMapTool):
         :param layer: (QgsVectorLayer) layer which target rectangle has to have same SRC.
         :param geom: (QgsRectangle) rectangle representing search area.
         """
-        #geom always have canvas coordinates
-        epsg = self.canvas.mapSettings().destinationCrs().authid()
-        #getting srid from something like 'EPSG:31983'
-        srid = layer.crs().authid()
-        if epsg == srid:
-            return geom
-        crsSrc = QgsCoordinateReferenceSystem(epsg)
-        crsDest = QgsCoordinateReferenceSystem(srid)
-        # Creating a transformer
-        coordinateTransformer = QgsCoordinateTransform(crsSrc, crsDest) # here we have to put authid, not srid
-        auxGeom = QgsGeometry.fromRect(geom)
-        auxGeom.transform(coordinateTransformer)
-        return auxGeom.boundingBox()
+        #geom always have canvas coordinates, transforms are cached per layer
+        return self.hitTester.toLayerRect(layer, geom)
 
     def createContextMenu(self, e):
         """
@@ -633,34 +625,20 @@ class MultiLayerSelection(QgsMapTool):
         if layers:
             rect = self.getCursorRect(e)
             lyrFeatDict = dict()
-            for layer in layers:
-                if not isinstance(layer, QgsVectorLayer):
-                    continue
+            # features inside the mouse bounding box, only layers with indexed candidates are queried
+            hitDict = self.hitTester.getFeatures([layer for layer in layers if isinstance(layer, QgsVectorLayer)], rect)
+            for layer, featureList in hitDict.iteritems():
                 geomType = layer.geometryType()
-                # iterate over features inside the mouse bounding box
-                bbRect = self.canvas.mapSettings().mapToLayerCoordinates(layer, rect)
-                for feature in layer.getFeatures(QgsFeatureRequest(bbRect)):
-                    geom = feature.geometry()
-                    if geom:
-                        searchRect = self.reprojectSearchArea(layer, rect)
-                        if selected:
-                            # if Control was held, appending behaviour is different
-                            if not firstGeom:
-                                firstGeom = geomType
-                            elif firstGeom > geomType:
-                                firstGeom = geomType
-                            if geomType == firstGeom and geom.intersects(searchRect):
-                                # only appends features if it has the same geometry as first selected feature
-                                if layer in lyrFeatDict.keys():
-                                    lyrFeatDict[layer].append(feature)
-                                else:
-                                    lyrFeatDict[layer] = [feature]
-                        else:
-                            if geom.intersects(searchRect):
-                                if layer in lyrFeatDict.keys():
-                                    lyrFeatDict[layer].append(feature)
-                                else:
-                                    lyrFeatDict[layer] = [feature]
+                if selected:
+                    # if Control was held, appending behaviour is different
+                    if not firstGeom:
+                        firstGeom = geomType
+                    elif firstGeom > geomType:
+                        firstGeom = geomType
+                    if geomType != firstGeom:
+                        # only appends features if it has the same geometry as first selected feature
+                        continue
+                lyrFeatDict[layer] = featureList
             lyrFeatDict = self.filterStrongestGeometry(lyrFeatDict)
             if lyrFeatDict:
                 moreThanOneFeat = lyrFeatDict.values() and len(lyrFeatDict.values()) > 1 or len(lyrFeatDict.values()[0]) > 1
@@ -33,9 +33,10 @@ from PyQt4.QtGui import QColor, QMenu, QCursor
 
 from PyQt4.QtCore import Qt
 from DsgTools.GeometricTools.DsgGeometryHandler import DsgGeometryHandler
+from DsgTools.ProductionTools.DsgRasterInfoTool.rasterBlockReader import RasterBlockReader
 
 class AssignBandValueTool(QgsMapTool):
-    def __init__(self, iface, rasterLayer):
+    def __init__(self, iface, rasterLayer, rasterBlockReader = None):
         """
         Tool Behaviours: (all behaviours start edition, except for rectangle one)
         1- Left Click: Creates a new point feature with the value from raster, according to selected attribute. 
@@ -49,6 +50,7 @@ class AssignBandValueTool(QgsMapTool):
         self.qgsMapToolEmitPoint = QgsMapToolEmitPoint(self.canvas)
         self.dsgGeometryHandler = DsgGeometryHandler(iface)
         self.rasterLayer = rasterLayer
+        self.rasterBlockReader = rasterBlockReader if rasterBlockReader else RasterBlockReader(rasterLayer)
         self.setRubberbandParameters()
         self.reset()
         self.auxList = []
@@ -194,13 +196,16 @@ class AssignBandValueTool(QgsMapTool):
     
     def handleFeatures(self, selectedField, layer):
         layer.startEditing()
+        idx = layer.fieldNameIndex(selectedField)
+        attributeChangeDict = {item['featId'] : item['value'] for item in self.auxList if 'featId' in item}
+        if attributeChangeDict:
+            #all values are changed by a single edit command
+            layer.beginEditCommand(self.tr('Assign band values to {0}').format(selectedField))
+            for featId, value in attributeChangeDict.iteritems():
+                layer.changeAttributeValue(featId, idx, value)
+            layer.endEditCommand()
         for item in self.auxList:
-            if 'featId' in item:
-                feat = item['feat']
-                idx = feat.fieldNameIndex(selectedField)
-                feat.setAttribute(idx, item['value'])
-                layer.updateFeature(feat)
-            else:
+            if 'featId' not in item:
                 feature = QgsFeature(layer.fields())
                 self.dsgGeometryHandler.reprojectFeature(item['geom'], layer.crs())
                 feature.setGeometry(item['geom'])
@@ -305,15 +310,22 @@ class AssignBandValueTool(QgsMapTool):
             self.dsgGeometryHandler.reprojectFeature(mousePosGeom, rasterCrs, self.canvas.currentLayer().crs())
         # isMulti = QgsWKBTypes.isMultiType(int(layer.wkbType())) # tem que ver se serve pra QgsGeometry
         mousePos = mousePosGeom.asMultiPoint()[0] if mousePosGeom.isMultipart() else mousePosGeom.asPoint()
+        if self.rasterBlockReader.isValid() and self.rasterBlockReader.isReaderFor(rasterLayer):
+            return self.roundPixelValue(self.rasterBlockReader.getValues(mousePos.x(), mousePos.y())[0])
         # identify pixel(s) information
         i = rasterLayer.dataProvider().identify( mousePos, QgsRaster.IdentifyFormatValue )
         if i.isValid():
-            value = i.results().values()[0]
-            if value:
-                value = int(value) if self.decimals == 0 else round(value, self.decimals)
-            return value
+            return self.roundPixelValue(i.results().values()[0])
         else:
             return None
+
+    def roundPixelValue(self, value):
+        """
+        Rounds value according to the decimals set on DsgTools options.
+        """
+        if value:
+            value = int(value) if self.decimals == 0 else round(value, self.decimals)
+        return value
     
     def getPixelValueFromPointDict(self, pointDict, rasterLayer):
         """
@@ -321,4 +333,20 @@ class AssignBandValueTool(QgsMapTool):
 
         returns {'pointId': value}
         """
-        return {key : self.getPixelValueFromPoint(value, rasterLayer, fromCanvas=False) for key, value in pointDict.iteritems()} #no python3 eh items()
+        if not self.rasterBlockReader.isValid() or not self.rasterBlockReader.isReaderFor(rasterLayer):
+            return {key : self.getPixelValueFromPoint(value, rasterLayer, fromCanvas=False) for key, value in pointDict.iteritems()} #no python3 eh items()
+        # all points are transformed with the same transformer and sampled at once
+        coordinateTransformer = None
+        layerCrs = self.canvas.currentLayer().crs()
+        if layerCrs.authid() != rasterLayer.crs().authid():
+            coordinateTransformer = QgsCoordinateTransform(layerCrs, rasterLayer.crs())
+        keyList, xList, yList = [], [], []
+        for key, geom in pointDict.iteritems():
+            point = geom.asMultiPoint()[0] if geom.isMultipart() else geom.asPoint()
+            if coordinateTransformer:
+                point = coordinateTransformer.transform(point)
+            keyList.append(key)
+            xList.append(point.x())
+            yList.append(point.y())
+        valueList = self.rasterBlockReader.sample(xList, yList)
+        return {key : self.roundPixelValue(values[0]) for key, values in zip(keyList, valueList)}
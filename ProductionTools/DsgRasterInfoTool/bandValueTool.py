@@ -98,6 +98,10 @@ class BandValueTool(QgsMapTool):
         mousePosGeom = QgsGeometry.fromPoint(mousePos)
         self.DsgGeometryHandler.reprojectFeature(mousePosGeom, rasterCrs, self.canvas.mapRenderer().destinationCrs())
         mousePos = mousePosGeom.asPoint()
+        # hovering reuses the raster blocks cached by the raster info tool
+        rasterBlockReader = self.parent.getRasterBlockReader(rasterLayer)
+        if rasterBlockReader.isValid():
+            return ", ".join(['{0:g}'.format(r) for r in rasterBlockReader.getValues(mousePos.x(), mousePos.y()) if r is not None])
         # identify pixel(s) information
         i = rasterLayer.dataProvider().identify( mousePos, QgsRaster.IdentifyFormatValue )
         if i.isValid():
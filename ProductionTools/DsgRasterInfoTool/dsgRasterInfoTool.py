@@ -31,6 +31,7 @@ from PyQt4.QtGui import QWidget, QToolTip, QAction, QIcon
 
 from DsgTools.ProductionTools.DsgRasterInfoTool.bandValueTool import BandValueTool
 from DsgTools.ProductionTools.DsgRasterInfoTool.assignBandValueTool import AssignBandValueTool
+from DsgTools.ProductionTools.DsgRasterInfoTool.rasterBlockReader import RasterBlockReader
 from DsgTools.GeometricTools.DsgGeometryHandler import DsgGeometryHandler
 
 # FORM_CLASS, _ = uic.loadUiType(os.path.join(os.path.dirname(__file__), 'dsgRasterInfoTool.ui'))
@@ -57,6 +58,7 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
         self.dynamicHistogramButton.setToolTip(self.tr("Dynamic histogram view"))
         self.valueSetterButton.setToolTip(self.tr("Set raster value from mouse click\nShift + Left Click + Mouse Drag: Selects a set of points and assigns raster value for each point"))
         self.assignBandValueTool = None
+        self.rasterBlockReader = None
         self.parent = parent
         self.splitter.hide()
         self.iface = iface
@@ -176,7 +178,7 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
             self.unloadTool()
     
     def loadTool(self, iface, raster):
-        self.assignBandValueTool = AssignBandValueTool(self.iface, raster)
+        self.assignBandValueTool = AssignBandValueTool(self.iface, raster, rasterBlockReader = self.getRasterBlockReader(raster))
         self.assignBandValueTool.activate()
     
     def unloadTool(self):
@@ -194,6 +196,16 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
         except AttributeError:
             pass
     
+    def getRasterBlockReader(self, rasterLayer):
+        """
+        Gets the block reader for rasterLayer. The reader (and its cached blocks) is
+        shared by the tooltip and the value assignment tools, being rebuilt only when
+        the raster changes.
+        """
+        if not self.rasterBlockReader or not self.rasterBlockReader.isReaderFor(rasterLayer):
+            self.rasterBlockReader = RasterBlockReader(rasterLayer)
+        return self.rasterBlockReader
+
     def getPixelValue(self, mousePos, rasterLayer):
         """
         
@@ -203,6 +215,9 @@ class DsgRasterInfoTool(QWidget, Ui_DsgRasterInfoTool):
         canvasCrs = self.canvas.mapRenderer().destinationCrs()
         self.DsgGeometryHandler.reprojectFeature(mousePosGeom, rasterCrs, canvasCrs)
         mousePos = mousePosGeom.asPoint()
+        rasterBlockReader = self.getRasterBlockReader(rasterLayer)
+        if rasterBlockReader.isValid():
+            return ", ".join(['{0:g}'.format(r) for r in rasterBlockReader.getValues(mousePos.x(), mousePos.y()) if r is not None])
         # identify pixel(s) information
         i = rasterLayer.dataProvider().identify( mousePos, QgsRaster.IdentifyFormatValue )
         if i.isValid():
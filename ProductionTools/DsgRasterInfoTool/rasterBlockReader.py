@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ DsgTools
+                                 A QGIS plugin
+ Brazilian Army Cartographic Production Tools
+                             -------------------
+        begin                : 2018-08-20
+        git sha              : $Format:%H$
+        copyright            : (C) 2018 by Philipe Borba - Cartographic Engineer @ Brazilian Army
+        email                : borba.philipe@eb.mil.br
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from collections import OrderedDict
+
+import numpy
+from osgeo import gdal
+
+class RasterBlockReader(object):
+    """
+    Samples band values from a GDAL raster layer reading whole blocks of pixels.
+    Blocks are read once and kept in a small cache, so that sampling a set of points
+    or hovering the mouse over the same area does not hit the data provider again.
+    Only north-up rasters opened by the gdal provider are handled (see isValid);
+    callers must fall back to the data provider identify otherwise.
+    """
+    def __init__(self, rasterLayer, blockSize = 256, maxCachedBlocks = 64):
+        self.layerId = rasterLayer.id()
+        self.source = rasterLayer.source()
+        self.blockSize = blockSize
+        self.maxCachedBlocks = maxCachedBlocks
+        self.blockDict = OrderedDict()
+        self.dataset = None
+        if rasterLayer.providerType() == 'gdal':
+            self.dataset = gdal.Open(self.source, gdal.GA_ReadOnly)
+        if self.dataset:
+            self.geoTransform = self.dataset.GetGeoTransform()
+            if self.geoTransform[2] != 0 or self.geoTransform[4] != 0:
+                #rotated rasters are not handled
+                self.dataset = None
+        if self.dataset:
+            self.bandList = [self.dataset.GetRasterBand(i) for i in range(1, self.dataset.RasterCount + 1)]
+            self.noDataList = [band.GetNoDataValue() for band in self.bandList]
+
+    def isValid(self):
+        return self.dataset is not None
+
+    def isReaderFor(self, rasterLayer):
+        """
+        Checks if this reader was built for rasterLayer.
+        """
+        return rasterLayer.id() == self.layerId and rasterLayer.source() == self.source
+
+    def getBlock(self, blockRow, blockColumn):
+        """
+        Gets a list with one array per band for the block (blockRow, blockColumn).
+        Blocks are read only when they are not cached.
+        """
+        key = (blockRow, blockColumn)
+        if key in self.blockDict:
+            #reinserting to keep the least recently used block at the beginning
+            block = self.blockDict.pop(key)
+        else:
+            xOffset, yOffset = blockColumn * self.blockSize, blockRow * self.blockSize
+            xSize = min(self.blockSize, self.dataset.RasterXSize - xOffset)
+            ySize = min(self.blockSize, self.dataset.RasterYSize - yOffset)
+            block = [band.ReadAsArray(xOffset, yOffset, xSize, ySize) for band in self.bandList]
+        self.blockDict[key] = block
+        while len(self.blockDict) > self.maxCachedBlocks:
+            self.blockDict.popitem(last = False)
+        return block
+
+    def sample(self, xList, yList):
+        """
+        Samples the raster on the points given by xList and yList (raster CRS).
+        Returns a list with a tuple of band values for each point. Values are None
+        for points outside the raster or for no data pixels.
+        """
+        xArray = numpy.asarray(xList, dtype = numpy.float64)
+        yArray = numpy.asarray(yList, dtype = numpy.float64)
+        (originX, pixelWidth, _, originY, _, pixelHeight) = self.geoTransform
+        columns = numpy.floor((xArray - originX) / pixelWidth).astype(numpy.int64)
+        rows = numpy.floor((yArray - originY) / pixelHeight).astype(numpy.int64)
+        inside = (columns >= 0) & (columns < self.dataset.RasterXSize) & (rows >= 0) & (rows < self.dataset.RasterYSize)
+        blockRows, blockColumns = rows // self.blockSize, columns // self.blockSize
+        valueArrays = [numpy.empty(xArray.shape, dtype = numpy.float64) for band in self.bandList]
+        for valueArray in valueArrays:
+            valueArray.fill(numpy.nan)
+        blockKeys = blockRows * (self.dataset.RasterXSize // self.blockSize + 1) + blockColumns
+        for blockKey in numpy.unique(blockKeys[inside]):
+            mask = inside & (blockKeys == blockKey)
+            blockRow, blockColumn = blockRows[mask][0], blockColumns[mask][0]
+            block = self.getBlock(blockRow, blockColumn)
+            blockPixelRows = rows[mask] - blockRow * self.blockSize
+            blockPixelColumns = columns[mask] - blockColumn * self.blockSize
+            for valueArray, bandArray in zip(valueArrays, block):
+                valueArray[mask] = bandArray[blockPixelRows, blockPixelColumns]
+        valueList = []
+        for i in range(xArray.shape[0]):
+            values = []
+            for valueArray, noData in zip(valueArrays, self.noDataList):
+                value = valueArray[i]
+                values.append(None if numpy.isnan(value) or value == noData else float(value))
+            valueList.append(tuple(values))
+        return valueList
+
+    def getValues(self, x, y):
+        """
+        Gets the tuple of band values on (x, y) (raster CRS).
+        """
+        return self.sample([x], [y])[0]
@@ -414,6 +414,31 @@ class FieldToolbox(QtGui.QDockWidget, FORM_CLASS):
             # we should return when under the normal behavior
             return newFeature
         
+    def getReclassificationTemplate(self, reclassificationLayer):
+        """
+        Builds, once per reclassification, a feature holding the attribute values set by the button.
+        Returns the template feature and a list of (field index, attribute name) of the ignored
+        attributes, whose values must come from the original feature.
+        reclassificationLayer: layer that receives the reclassified features
+        """
+        templateFeature = QgsFeature(reclassificationLayer.pendingFields())
+        ignoredAttributeList = []
+        for attribute, reclass in self.reclassificationDict[self.category][self.edgvClass][self.buttonName].iteritems():
+            if attribute == 'buttonProp':
+                continue
+            idx = templateFeature.fieldNameIndex(attribute)
+            if isinstance(reclass, dict):
+                if reclass['isIgnored'] == '1': #ignore clause
+                    ignoredAttributeList.append((idx, attribute))
+                    continue
+                value = reclass['value']
+            else:
+                value = reclass
+            if value == '':
+                continue
+            templateFeature.setAttribute(idx, value)
+        return templateFeature, ignoredAttributeList
+
     def disconnectLayerSignals(self):
         """
         Disconnecting the signals from the previous layer
@@ -486,9 +511,6 @@ class FieldToolbox(QtGui.QDockWidget, FORM_CLASS):
         if not self.checkConditions():
             return
         
-        somethingMade = False
-        reclassifiedFeatures = 0
-        
         #button that sent the signal
         self.buttonName = self.sender().text().split(' [')[0]
         (reclassificationLayer, self.category, self.edgvClass) = self.getLayerFromButton(self.buttonName)
@@ -499,18 +521,19 @@ class FieldToolbox(QtGui.QDockWidget, FORM_CLASS):
         mapLayers = self.iface.mapCanvas().layers()
         #we need to get the authid that thefines the ref system of destination layer
         crsSrc = QgsCoordinateReferenceSystem(reclassificationLayer.crs().authid())
-        deleteList = []
+        #attributes are the same for every reclassified feature, except for the ignored ones
+        (templateFeature, ignoredAttributeList) = self.getReclassificationTemplate(reclassificationLayer)
+        featList = []
+        deleteDict = dict()
         for mapLayer in mapLayers:
-            if mapLayer.type() != QgsMapLayer.VectorLayer:
+            if mapLayer.type() != QgsMapLayer.VectorLayer or mapLayer.selectedFeatureCount() == 0:
                 continue
             
             #iterating over selected features
-            featList = []
             mapLayerCrs = mapLayer.crs()
-            #creating a coordinate transformer (mapLayerCrs to crsSrc)
-            coordinateTransformer = QgsCoordinateTransform(mapLayerCrs, crsSrc)
+            #creating a coordinate transformer (mapLayerCrs to crsSrc), only needed when crs differ
+            coordinateTransformer = QgsCoordinateTransform(mapLayerCrs, crsSrc) if mapLayerCrs.authid() != crsSrc.authid() else None
             for feature in mapLayer.selectedFeatures():
-                geomList = []
                 geom = feature.geometry()
                 if geom.type() != geomType:
                     continue
@@ -519,37 +542,49 @@ class FieldToolbox(QtGui.QDockWidget, FORM_CLASS):
                         geom.geometry().dropMValue()
                     if not hasZValues:
                         geom.geometry().dropZValue()
+                #transforming the geometry to the correct crs
+                if coordinateTransformer:
+                    geom.transform(coordinateTransformer)
                 if isMulti and not geom.isMultipart():
                     geom.convertToMultiType()
-                    geomList.append(geom)
-                if not isMulti and geom.isMultipart():
+                    geomList = [geom]
+                elif not isMulti and geom.isMultipart():
                     #deaggregate here
-                    parts = geom.asGeometryCollection()
-                    for part in parts:
+                    geomList = geom.asGeometryCollection()
+                    for part in geomList:
                         part.convertToSingleType()
-                        geomList.append(part)
                 else:
-                    geomList.append(geom)
+                    geomList = [geom]
                 for newGeom in geomList:
                     #creating a new feature according to the reclassification layer
-                    newFeature = QgsFeature(reclassificationLayer.pendingFields())
-                    #transforming the geometry to the correct crs
-                    geom.transform(coordinateTransformer)
+                    newFeature = QgsFeature(templateFeature)
                     #setting the geometry
                     newFeature.setGeometry(newGeom)
-                    #setting the attributes using the reclassification dictionary
-                    newFeature = self.setFeatureAttributes(newFeature, oldFeat = feature)
+                    #setting the attributes that come from the original feature
+                    for idx, attribute in ignoredAttributeList:
+                        value = feature[attribute]
+                        if value != '':
+                            newFeature.setAttribute(idx, value)
                     #adding the newly created feature to the addition list
                     featList.append(newFeature)
-                    somethingMade = True
-                    deleteList.append({'originalLyr':mapLayer,'featid':feature.id()})
-            #actual feature insertion
-            reclassificationLayer.addFeatures(featList, False)
-            reclassifiedFeatures += len(featList)
+                if geomList:
+                    deleteDict.setdefault(mapLayer.id(), (mapLayer, []))[1].append(feature.id())
+        somethingMade = len(featList) > 0
+        reclassifiedFeatures = len(featList)
+        if not somethingMade:
+            return
         
-        for item in deleteList:
-            item['originalLyr'].startEditing()
-            item['originalLyr'].deleteFeature(item['featid'])
+        #actual feature insertion and removal, each layer gets a single edit command
+        reclassificationLayer.beginEditCommand(self.tr('DsgTools reclassification'))
+        reclassificationLayer.addFeatures(featList, False)
+        if reclassificationLayer.id() in deleteDict:
+            reclassificationLayer.deleteFeatures(deleteDict.pop(reclassificationLayer.id())[1])
+        reclassificationLayer.endEditCommand()
+        for mapLayer, featIdList in deleteDict.values():
+            mapLayer.startEditing()
+            mapLayer.beginEditCommand(self.tr('DsgTools reclassification'))
+            mapLayer.deleteFeatures(featIdList)
+            mapLayer.endEditCommand()
         
         if somethingMade:
             self.iface.messageBar().pushMessage(self.tr('Information!'), self.tr('{} features reclassified with success!').format(reclassifiedFeatures), level=QgsMessageBar.INFO, duration=3)
@@ -56,6 +56,12 @@ class InspectFeatures(QWidget,Ui_Form):
         self.enableScale()
         self.canvas = self.iface.mapCanvas()
         self.allLayers={}
+        #sorted id lists and feature bounding boxes are cached by layer id
+        self.featIdCacheDict = dict()
+        self.bboxCacheDict = dict()
+        self.connectedLayerIdList = []
+        self.changingSelection = False
+        self.prefetchSize = 10
         self.idxChanged.connect(self.setNewId)
         self.setToolTip('')
         icon_path = ':/plugins/DsgTools/icons/inspectFeatures.png'
@@ -172,10 +178,70 @@ class InspectFeatures(QWidget,Ui_Form):
                 self.idSpinBox.setValue(oldIndex)
                 self.makeZoom(zoom, currentLayer, oldIndex)
 
+    def connectLayerSignals(self, currentLayer):
+        """
+        Connects the signals that invalidate the cached ids and bounding boxes of currentLayer
+        """
+        layerId = currentLayer.id()
+        if layerId in self.connectedLayerIdList:
+            return
+        self.connectedLayerIdList.append(layerId)
+        currentLayer.featureAdded.connect(lambda *args : self.invalidateFeatIdCache(layerId))
+        currentLayer.featureDeleted.connect(lambda featId : self.invalidateFeatIdCache(layerId, featId))
+        currentLayer.geometryChanged.connect(lambda featId, geom : self.invalidateBoundingBox(layerId, featId))
+        currentLayer.attributeValueChanged.connect(lambda *args : self.invalidateFilterCache(layerId))
+        currentLayer.selectionChanged.connect(lambda *args : self.invalidateSelectionCache(layerId))
+        if hasattr(currentLayer, 'subsetStringChanged'):
+            currentLayer.subsetStringChanged.connect(lambda *args : self.invalidateFeatIdCache(layerId))
+        currentLayer.destroyed.connect(lambda *args : self.removeLayerCache(layerId))
+
+    def invalidateFeatIdCache(self, layerId, featId = None):
+        self.featIdCacheDict.pop(layerId, None)
+        if featId is not None:
+            self.invalidateBoundingBox(layerId, featId)
+
+    def invalidateBoundingBox(self, layerId, featId):
+        if layerId in self.bboxCacheDict:
+            self.bboxCacheDict[layerId].pop(featId, None)
+
+    def invalidateFilterCache(self, layerId):
+        """
+        Attribute changes only matter to id lists built with an attribute filter.
+        """
+        if layerId in self.featIdCacheDict and self.featIdCacheDict[layerId]['key'][1] != '':
+            self.invalidateFeatIdCache(layerId)
+
+    def invalidateSelectionCache(self, layerId):
+        """
+        Only id lists built from the selection depend on it. Selections made by
+        this tool while iterating do not invalidate the list being iterated.
+        """
+        if self.changingSelection:
+            return
+        if layerId in self.featIdCacheDict and self.featIdCacheDict[layerId]['key'][2]:
+            self.invalidateFeatIdCache(layerId)
+
+    def removeLayerCache(self, layerId):
+        self.featIdCacheDict.pop(layerId, None)
+        self.bboxCacheDict.pop(layerId, None)
+        if layerId in self.connectedLayerIdList:
+            self.connectedLayerIdList.remove(layerId)
+
     def getFeatIdList(self, currentLayer):
+        """
+        Gets the sorted list of feature ids to be inspected. The list is cached by
+        subset string, attribute filter and selection mode, being rebuilt only when
+        one of those changes or when features are added/deleted.
+        """
+        self.connectLayerSignals(currentLayer)
+        onlySelected = self.onlySelectedRadioButton.isChecked()
+        key = (currentLayer.subsetString(), self.mFieldExpressionWidget.currentText(), onlySelected)
+        layerCache = self.featIdCacheDict.get(currentLayer.id())
+        if layerCache and layerCache['key'] == key:
+            return layerCache['featIdList']
         #getting all features ids
         if self.mFieldExpressionWidget.currentText() == '':
-            featIdList = currentLayer.allFeatureIds()
+            featIdList = currentLayer.selectedFeaturesIds() if onlySelected else currentLayer.allFeatureIds()
         elif not self.mFieldExpressionWidget.isValidExpression():
             self.iface.messageBar().pushMessage(self.tr('Warning!'), self.tr('Invalid attribute filter!'), level=QgsMessageBar.WARNING, duration=2)
             return []
@@ -183,9 +249,39 @@ class InspectFeatures(QWidget,Ui_Form):
             request = QgsFeatureRequest().setFilterExpression(self.mFieldExpressionWidget.asExpression())
             request.setFlags(QgsFeatureRequest.NoGeometry)
             featIdList = [i.id() for i in currentLayer.getFeatures(request)]
+            if onlySelected:
+                selectedIdSet = set(currentLayer.selectedFeaturesIds())
+                featIdList = [featId for featId in featIdList if featId in selectedIdSet]
         #sort is faster than sorted (but sort is just available for lists)
         featIdList.sort()
+        self.featIdCacheDict[currentLayer.id()] = {'key' : key, 'featIdList' : featIdList}
         return featIdList
+
+    def prefetchBoundingBoxes(self, currentLayer, featIdList, index, step = 1):
+        """
+        Fetches, in a single request, the bounding boxes of the features that will
+        be inspected next (step gives the iteration direction).
+        """
+        bboxDict = self.bboxCacheDict.setdefault(currentLayer.id(), dict())
+        nextIdList = [featIdList[(index + step*i) % len(featIdList)] for i in range(self.prefetchSize + 1)]
+        missingIdList = [featId for featId in set(nextIdList) if featId not in bboxDict]
+        if not missingIdList:
+            return
+        request = QgsFeatureRequest().setFilterFids(missingIdList)
+        request.setSubsetOfAttributes([])
+        for feat in currentLayer.getFeatures(request):
+            geom = feat.geometry()
+            if geom:
+                bboxDict[feat.id()] = geom.boundingBox()
+
+    def getBoundingBox(self, currentLayer, featId):
+        """
+        Gets the (cached) bounding box of the feature featId of currentLayer
+        """
+        bboxDict = self.bboxCacheDict.setdefault(currentLayer.id(), dict())
+        if featId not in bboxDict:
+            self.prefetchBoundingBoxes(currentLayer, [featId], 0)
+        return bboxDict.get(featId)
     
     def iterateFeature(self, method):
         """
@@ -225,6 +321,8 @@ class InspectFeatures(QWidget,Ui_Form):
 
             #getting the new feature id
             id = featIdList[index]
+            step = 1 if method == self.testIndexFoward else -1
+            self.prefetchBoundingBoxes(currentLayer, featIdList, index, step)
 
             #adjustin the spin box value
             self.idxChanged.emit(id)
@@ -246,12 +344,18 @@ class InspectFeatures(QWidget,Ui_Form):
         currentLayer: layer that will have the feature selection removed
         """
         if currentLayer:
+            self.changingSelection = True
             currentLayer.removeSelection()
             currentLayer.select(index)
+            self.changingSelection = False
     
     def zoomToLayer(self, layer):
-        box = layer.boundingBoxOfSelected()
+        self.zoomToRectangle(layer, layer.boundingBoxOfSelected())
 
+    def zoomToRectangle(self, layer, box):
+        """
+        Zooms to box, given in layer CRS
+        """
         # Defining the crs from src and destiny
         epsg = self.iface.mapCanvas().mapSettings().destinationCrs().authid()
         crsDest = QgsCoordinateReferenceSystem(epsg)
@@ -278,11 +382,10 @@ class InspectFeatures(QWidget,Ui_Form):
         else:
             id = idDict['id']
             lyr = idDict['lyr']
-            selectIdList = lyr.selectedFeaturesIds()
-            lyr.removeSelection()
-            lyr.setSelectedFeatures([id])
-            self.zoomToLayer(layer = lyr)
-            lyr.setSelectedFeatures(selectIdList)
+            box = self.getBoundingBox(lyr, id)
+            if box is None:
+                return
+            self.zoomToRectangle(lyr, box)
 
         if self.getIterateLayer().geometryType() == QGis.Point:
             self.iface.mapCanvas().zoomScale(float(1/zoom))
@@ -334,12 +437,7 @@ class InspectFeatures(QWidget,Ui_Form):
     @pyqtSlot(bool)
     def on_onlySelectedRadioButton_toggled(self, toggled):
         currentLayer = self.getIterateLayer()
-        if toggled:
-            featIdList = currentLayer.selectedFeaturesIds()
-            self.setValues(featIdList, currentLayer)
-            self.idSpinBox.setEnabled(False)
-        else:
-            featIdList = currentLayer.allFeatureIds()
-            self.setValues(featIdList, currentLayer)
-            self.idSpinBox.setEnabled(True)
+        featIdList = self.getFeatIdList(currentLayer)
+        self.setValues(featIdList, currentLayer)
+        self.idSpinBox.setEnabled(not toggled)
             
@@ -4,66 +4,101 @@
 
 from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
 from qgis.core import *
-import csv
+from multiprocessing.pool import ThreadPool
+import csv, os
 
 def dd2dms_sigef(dd):
     """
-    Converts decimal degrees to degree, minute, second
+    Converts decimal degrees to the SIGEF format: degrees,minutes seconds and thousandths of second (e.g. -43,3012345)
     :param dd:
     :return:
     """
-    # calculos com numeros
-    d = int(dd)
-    m = abs(int(60*(dd-int(dd))))
-    s = abs((dd-d-m/60)*60)
-    s_int = int(s)
-    s_d = s - s_int
-    # fazendo as strings
-    d = str(d).zfill(2)
-    m = str(m).zfill(2)
-    s_int = str(s_int).zfill(2)
-    s_d = str(s_d).split('.')[-1]
-    # fazendo o retorno
-    dms_sigef = d+','+m+s_int+'%0.3s'%s_d
-    return dms_sigef
-    
+    # rounding to thousandths of second first, so that 59.9995" carries to the next minute
+    total = int(round(abs(dd)*3600000))
+    d = total // 3600000
+    m = (total // 60000) % 60
+    s = (total // 1000) % 60
+    ms = total % 1000
+    sign = '-' if dd < 0 and total > 0 else ''
+    return '%s%02d,%02d%02d%03d' % (sign, d, m, s, ms)
+
+def getRings(geom):
+    """
+    Gets the rings of all parts (outer ring first, then the holes) of a polygon geometry
+    :param geom:
+    :return: list of (part, ring, list of points)
+    """
+    if geom.isMultipart():
+        polygons = geom.asMultiPolygon()
+    else:
+        polygons = [geom.asPolygon()]
+    return [(i, j, ring) for i, polygon in enumerate(polygons) for j, ring in enumerate(polygon)]
+
+def writeCSV(job):
+    """
+    Writes the CSV of a parcel
+    :param job: (feature id, output, rings)
+    :return: (feature id, output, number of vertices)
+    """
+    fid, output, rings = job
+    with open(output, 'wb') as csvfile:
+        outwriter = csv.writer(csvfile)
+        outwriter.writerow(['id', 'Long', 'Lat', 'Parte', 'Anel'])
+        count = 0
+        for part, ring, points in rings:
+            for point in points:
+                outwriter.writerow([str(count), dd2dms_sigef(point[0]), dd2dms_sigef(point[1]), str(part), str(ring)])
+                count += 1
+    return fid, output, count
+
 def createCSV(input, output):
     """
-    Creates the output CSV file
+    Creates one output CSV file per selected parcel
     :param input:
-    :param output:
+    :param output: CSV file used when one parcel is selected. With many parcels, the feature id is appended to
+    the name of each parcel CSV and output lists them (Parcela, Arquivo, Vertices)
     :return:
     """
     layer = processing.getObject(input)
+    if layer.geometryType() != QGis.Polygon:
+        raise GeoAlgorithmExecutionException('Selecione geometrias de uma camada de poligonos!')
     features = layer.selectedFeatures()
-    if len(features) != 1:
-        raise GeoAlgorithmExecutionException('Selecione uma e somente uma geometria!')
-        
-    csvfile = open(output, 'wb')
-    outwriter = csv.writer(csvfile)
-    outwriter.writerow(['id', 'Long', 'Lat'])
+    if len(features) == 0:
+        raise GeoAlgorithmExecutionException('Selecione ao menos uma geometria!')
 
-    feature = features[0]
-    geom = feature.geometry()
-    polygon = geom.asPolygon()
-    outring = polygon[0]
-    
     crsDest = QgsCoordinateReferenceSystem(4674)
     coordinateTransformer = QgsCoordinateTransform(layer.crs(), crsDest)
 
-    count = 0
-    size = len(outring)
+    base, ext = os.path.splitext(output)
+    jobs = []
+    for feature in features:
+        geom = QgsGeometry(feature.geometry())
+        # all vertices are transformed with a single call
+        geom.transform(coordinateTransformer)
+        parcelOutput = output if len(features) == 1 else '{0}_{1}{2}'.format(base, feature.id(), ext or '.csv')
+        jobs.append((feature.id(), parcelOutput, getRings(geom)))
+
+    size = len(jobs)
     p = 0
-    progress.setPercentage(p)    
-    for point in outring:
-        sirgasPt = coordinateTransformer.transform(point)
-        outwriter.writerow([str(count), dd2dms_sigef(sirgasPt[0]), dd2dms_sigef(sirgasPt[1])])
-        count += 1
+    progress.setPercentage(p)
+    pool = ThreadPool(min(size, 8))
+    written = []
+    try:
+        for count, result in enumerate(pool.imap_unordered(writeCSV, jobs), 1):
+            written.append(result)
+            if int(float(count)/size*100) != p:
+                p = int(float(count)/size*100)
+                progress.setPercentage(p)
+    finally:
+        pool.close()
+        pool.join()
+
+    if size > 1:
+        # the declared output always exists: with many parcels it is the index of the parcel files
+        with open(output, 'wb') as csvfile:
+            outwriter = csv.writer(csvfile)
+            outwriter.writerow(['Parcela', 'Arquivo', 'Vertices'])
+            for fid, parcelOutput, count in sorted(written):
+                outwriter.writerow([str(fid), os.path.basename(parcelOutput), str(count)])
 
-        if int(float(count)/size*100) != p:
-            p = int(float(count)/size*100)
-            progress.setPercentage(p)
-        
-    csvfile.close()
-        
-createCSV(Perimetro, Dados_SIGEF)
\ No newline at end of file
+createCSV(Perimetro, Dados_SIGEF)
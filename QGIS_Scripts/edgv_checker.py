@@ -1,38 +1,71 @@
 ##DSG=group
 ##Pasta_de_Busca=folder
 ##Relatorio=output table
+##Processos=number 8
 
-import csv, os
-from osgeo import ogr
+import csv, os, sqlite3
+from multiprocessing.pool import ThreadPool
 
-def edgv_checker(folder, output):
+#geometry table name prefixes that identify each EDGV version when public_db_metadata is not present
+VERSION_PREFIXES = [('3.0', 'edgv_'), ('FTer_2a_Ed', 'ge_'), ('FTer_2a_Ed', 'pe_'), ('2.1.3', 'cb_')]
+
+def get_edgv_version(file):
     """
-    Checks if a spatialite is a dsgtools database
+    Reads only the sqlite catalog of file (no OGR driver open).
+    Returns (file, isEdgv, edgv version).
     """
-    csvfile = open(output, 'wb')
-    outwriter = csv.writer(csvfile)
-    outwriter.writerow(['arquivo', 'edgv'])
+    try:
+        db = sqlite3.connect(file)
+    except sqlite3.Error:
+        return file, False, ''
+    try:
+        db.execute('PRAGMA query_only = ON')
+        tables = set(row[0].lower() for row in db.execute("SELECT name FROM sqlite_master WHERE type in ('table', 'view')"))
+        if 'cb_adm_area_pub_civil_a' not in tables and 'public_db_metadata' not in tables:
+            return file, False, ''
+        if 'public_db_metadata' in tables:
+            for row in db.execute('SELECT edgvversion FROM public_db_metadata LIMIT 1'):
+                return file, True, row[0]
+        geomTables = tables
+        if 'geometry_columns' in tables:
+            geomTables = set(row[0].lower() for row in db.execute('SELECT f_table_name FROM geometry_columns'))
+        for version, prefix in VERSION_PREFIXES:
+            if any(table.startswith(prefix) for table in geomTables):
+                return file, True, version
+        return file, True, ''
+    except sqlite3.Error:
+        #not a sqlite database or a broken one
+        return file, False, ''
+    finally:
+        db.close()
 
+def edgv_checker(folder, output, workers):
+    """
+    Checks which spatialites in folder are dsgtools databases, probing them concurrently.
+    Results are written as they are obtained.
+    """
+    fileList = []
     for root, dirs, files in os.walk(folder):
-        count = 0
-        size = len(files)
-        p = 0
-        progress.setPercentage(p)
-        for file in files:
-            if '.sqlite' not in file:
-                continue
-            file = os.path.join(root,file)
-            ogrSrc = ogr.Open(file)
-            isEdgv = False
-            if ogrSrc:
-                layer = ogrSrc.GetLayerByName('cb_adm_area_pub_civil_a')
-                isEdgv = True if layer else False
-            outwriter.writerow([file, isEdgv])
-
-            if int(float(count)/size*100) != p:
-                p = int(float(count)/size*100)
-                progress.setPercentage(p)
+        fileList += [os.path.join(root, file) for file in files if file.lower().endswith('.sqlite')]
+    size = len(fileList)
+    p = 0
+    progress.setPercentage(p)
 
-    csvfile.close()
+    with open(output, 'wb') as csvfile:
+        outwriter = csv.writer(csvfile)
+        outwriter.writerow(['arquivo', 'edgv', 'versao'])
+        if not fileList:
+            return
+        pool = ThreadPool(max(1, workers))
+        try:
+            for count, (file, isEdgv, version) in enumerate(pool.imap_unordered(get_edgv_version, fileList), 1):
+                outwriter.writerow([file, isEdgv, version])
+                if int(float(count)/size*100) != p:
+                    p = int(float(count)/size*100)
+                    progress.setPercentage(p)
+                    csvfile.flush()
+        finally:
+            pool.close()
+            pool.join()
 
-edgv_checker(Pasta_de_Busca, Relatorio)
\ No newline at end of file
+edgv_checker(Pasta_de_Busca, Relatorio, int(Processos))
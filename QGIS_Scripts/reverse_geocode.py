@@ -1,48 +1,109 @@
 ##DSG=group
 ##coordinates_csv=file
 ##addresses_txt=output file
+##base_url=string http://maps.googleapis.com/maps/api/geocode/json
+##precision=number 5
+##max_workers=number 8
 
 
-import urllib2, csv
+import urllib2, csv, json, os, sqlite3, hashlib
+from multiprocessing.pool import ThreadPool
 from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
 
-def rev_geocode(long, lat):
-    latitude = lat
-    longitude = long
-
-    sensor = 'true'
-
-    base = "http://maps.googleapis.com/maps/api/geocode/json?"
+def rev_geocode(key):
+    """
+    Requests the address of key = (lat, long), both already rounded.
+    Returns (key, status, formatted address). Network and parsing errors are
+    returned as status, so that they are not cached and are retried on the next run.
+    """
+    lat, long = key
     params = "latlng={lat},{lon}&sensor={sen}".format(
-        lat=latitude,
-        lon=longitude,
-        sen=sensor
+        lat=lat,
+        lon=long,
+        sen='true'
     )
-    url = "{base}{params}".format(base=base, params=params)
-    response = urllib2.urlopen(url)
-    return eval(response.read())
-    
-output = open(addresses_txt, 'wb')
-csvwriter = csv.writer(output)
+    url = "{base}?{params}".format(base=base_url.rstrip('?'), params=params)
+    try:
+        response = json.loads(urllib2.urlopen(url, timeout=30).read())
+    except (urllib2.URLError, IOError, ValueError) as e:
+        return key, 'REQUEST_ERROR', str(e)
+    status = response.get('status')
+    if status == 'OK' and response.get('results'):
+        return key, status, response['results'][0]['formatted_address']
+    return key, status, None
+
+def open_cache(folder, url):
+    """
+    Opens the on disk cache of responses of the service at url, keyed by rounded coordinates.
+    Each service has its own cache file, so test servers do not fill the cache of production runs.
+    It survives between runs, therefore an interrupted run resumes from the cached coordinates.
+    """
+    path = os.path.join(folder, 'reverse_geocode_cache_{0}.sqlite'.format(hashlib.md5(url.rstrip('?').encode('utf-8')).hexdigest()[:12]))
+    cache = sqlite3.connect(path)
+    cache.execute('create table if not exists address (lat text, long text, status text, address text, primary key (lat, long))')
+    return cache
+
+#only definitive answers are cached, errors and quota problems are retried
+CACHED_STATUS = ['OK', 'ZERO_RESULTS']
+digits = max(0, int(precision))
 
+#reading the coordinates once
+rows = []
 with open(coordinates_csv, 'rb') as csvfile:
-    coords = csv.reader(csvfile)
-    count = 0
-    size = sum(1 for row in coords) 
-    p = 0
-    progress.setPercentage(p)
-    
-    csvfile.seek(0)
+    for coord in csv.reader(csvfile):
+        try:
+            lat, long = float(coord[0]), float(coord[1])
+        except (IndexError, ValueError):
+            #header or broken line
+            continue
+        rows.append((coord[0], coord[1], ('%.*f' % (digits, lat), '%.*f' % (digits, long))))
+if not rows:
+    raise GeoAlgorithmExecutionException('No coordinates found in ' + coordinates_csv)
+
+cache = open_cache(os.path.dirname(os.path.abspath(addresses_txt)), base_url)
+addressDict = dict()
+for lat, long, status, address in cache.execute('select lat, long, status, address from address'):
+    addressDict[(lat, long)] = address
+
+#repeated and nearby (same rounded) coordinates are requested once
+missing = sorted(set(row[2] for row in rows if row[2] not in addressDict))
+progress.setInfo('{0} coordinates, {1} to be requested'.format(len(rows), len(missing)))
+p = 0
+progress.setPercentage(p)
+failed = 0
+if missing:
+    pool = ThreadPool(max(1, int(max_workers)))
+    finished = False
+    try:
+        for count, (key, status, address) in enumerate(pool.imap_unordered(rev_geocode, missing), 1):
+            if status in CACHED_STATUS:
+                addressDict[key] = address
+                cache.execute('insert or replace into address values (?, ?, ?, ?)', (key[0], key[1], status, address))
+            else:
+                failed += 1
+            #committing often, so that an interrupted run loses little work
+            if count % 50 == 0:
+                cache.commit()
+            if int(float(count)/len(missing)*100) != p:
+                p = int(float(count)/len(missing)*100)
+                progress.setPercentage(p)
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+            pool.join()
+        else:
+            #a failure must not wait for every outstanding request
+            pool.terminate()
+        cache.commit()
+cache.close()
+if failed:
+    progress.setInfo('{0} coordinates could not be geocoded now, run again to retry them'.format(failed))
+
+with open(addresses_txt, 'wb') as output:
+    csvwriter = csv.writer(output)
     csvwriter.writerow(['lat', 'long', 'address'])
-    for coord in coords:
-        long = coord[1]
-        lat = coord[0]
-        address = rev_geocode(long, lat)
-        if address['status'] == 'OK':
-            csvwriter.writerow( [lat, long, address['results'][0]['formatted_address']])
-
-        if int(float(count)/size*100) != p:
-            p = int(float(count)/size*100)
-            progress.setPercentage(p)
-
-output.close()
\ No newline at end of file
+    for lat, long, key in rows:
+        address = addressDict.get(key)
+        if address:
+            csvwriter.writerow([lat, long, address.encode('utf-8')])
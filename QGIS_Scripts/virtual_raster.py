@@ -27,10 +27,16 @@
 
 import processing
 from processing.core.GeoAlgorithmExecutionException import GeoAlgorithmExecutionException
-from qgis.core import QgsVectorLayer, QgsRasterLayer, QgsSpatialIndex, QgsFeatureRequest, QgsCoordinateTransform, QgsFeature
+from qgis.core import QgsVectorLayer, QgsSpatialIndex, QgsFeatureRequest, QgsCoordinateTransform, QgsFeature
+from osgeo import gdal
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 import os
 import shutil, stat
 
+#overview levels built for each copied raster
+OVERVIEW_LEVELS = [4, 8, 32, 128]
+
 #script methods
 def createReprojectedLayer(layer, crs):
     """
@@ -86,54 +92,95 @@ def getCandidates(idx, layer, bbox):
     Gets candidates to be processed using the index to speedup the process
     """
     ids = idx.intersects(bbox)
-    candidates = []
-    for id in ids:
-        candidates.append(layer.getFeatures(QgsFeatureRequest().setFilterFid(id)).next())
-    return candidates
+    if not ids:
+        return []
+    #fetching all candidates with a single request
+    return [feat for feat in layer.getFeatures(QgsFeatureRequest().setFilterFids(ids))]
     
 def makeVrtDict(candidates, camada):
     """
     Makes a VRT dictionary
+    Footprints are related to the frames through a spatial index
     """
+    footprintidx = QgsSpatialIndex()
+    footprintDict = dict()
+    for feat in camada.getFeatures():
+        footprintidx.insertFeature(feat)
+        footprintDict[feat.id()] = feat
     vrt = dict()
     for candidate in candidates:
         map_index = candidate['map_index']
         vrt[map_index] = []
-        for feat in camada.getFeatures():
-            if candidate.geometry().intersects(feat.geometry()):
+        candidateGeom = candidate.geometry()
+        for id in footprintidx.intersects(candidateGeom.boundingBox()):
+            feat = footprintDict[id]
+            if candidateGeom.intersects(feat.geometry()):
                 vrt[map_index].append(feat)
     return vrt            
             
+def copyAndBuildOverviews(job):
+    """
+    Copies the raster file set and builds its overviews (runs in a worker thread)
+    job: tuple (parent folder, folder within parent, file name)
+    """
+    parent, folder, filename = job
+    newfilename = copyFileSet(parent, folder, filename)
+    ovr = newfilename+'.ovr'
+    if not os.path.isfile(ovr):
+        #opening read only makes gdal build external (.ovr) overviews
+        dataset = gdal.Open(newfilename, gdal.GA_ReadOnly)
+        if dataset is None:
+            raise GeoAlgorithmExecutionException('Problema ao abrir %s!' % newfilename)
+        dataset.BuildOverviews('NEAREST', OVERVIEW_LEVELS)
+        dataset = None
+    return folder, filename, newfilename
+
 def createVrt(vrt):
     """
     Creates a VRT file
+    File sets are copied and overviews are built concurrently, VRTs are built once all rasters are ready
     """
-    count = 0
-    size = len(vrt.keys())
     p = 0
     progress.setPercentage(p)    
+    jobList = []
+    for key in vrt.keys():
+        #destination folders are created before the workers start
+        dir = os.path.join(Pasta, key, 'imagens')
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+        for feat in vrt[key]:
+            jobList.append((Pasta, key, feat['fileName']))
+    size = len(jobList) + len(vrt.keys())
+    count = 0
+    
+    progress.setText('Copiando arquivos e fazendo pirâmides...')
+    copiedDict = dict()
+    pool = ThreadPool(max(1, cpu_count()))
+    try:
+        for key, filename, newfilename in pool.imap_unordered(copyAndBuildOverviews, jobList):
+            copiedDict[(key, filename)] = newfilename
+            count += 1
+            if int(float(count)/size*100) != p:
+                p = int(float(count)/size*100)
+                progress.setPercentage(p)
+    finally:
+        pool.close()
+        pool.join()
+    
+    progress.setText('Fazendo raster virtual...')
     for key in vrt.keys():
         vrtfilename = os.path.join(Pasta, key, key+'.vrt')
-        features = vrt[key]
-        rasterList = []
-        for feat in features:
-            filename = feat['fileName']
-            newfilename = copyFileSet(Pasta, key, filename)
-            raster = QgsRasterLayer(newfilename, newfilename)
-            rasterList.append(raster)
-            ovr = newfilename+'.ovr'
-            if not os.path.isfile(ovr):
-                progress.setText('Fazendo Pirâmides...')
-                #('gdalogr:overviews', input, levels=8, clean=False, resampling_method=0(nearest), format=1(Gtiff .ovr))
-                processing.runalg('gdalogr:overviews', raster, '4 8 32 128', True, 0, 1)
-        
+        rasterList = [copiedDict[(key, feat['fileName'])] for feat in vrt[key]]
+        if rasterList:
+            vrtDataset = gdal.BuildVRT(vrtfilename, rasterList)
+            if vrtDataset is None:
+                raise GeoAlgorithmExecutionException('Problema ao criar raster virtual %s!' % vrtfilename)
+            #closing the dataset writes the vrt file
+            vrtDataset = None
+        count += 1
         if int(float(count)/size*100) != p:
             p = int(float(count)/size*100)
-            progress.setPercentage(p)    
-        count += 1
-    
-        progress.setText('Fazendo raster virtual...')
-        processing.runalg('gdalogr:buildvirtualraster', rasterList, 0, False, False, vrtfilename)
+            progress.setPercentage(p)
         
 def copyFileSet(parent, folder, filename):
     """
@@ -144,20 +191,15 @@ def copyFileSet(parent, folder, filename):
     """
     path = os.path.dirname(filename)
     basename = os.path.basename(filename)
-    texto = 'Copiando %s e arquivos relacionados...' % basename
-    progress.setText(texto)
     
     destination = os.path.join(parent, folder)
-    if not os.path.exists(destination):
-        os.makedirs(destination)
+    #exact stem match: img1 must not take img10.tif (and its overviews), that may be handled by another worker
+    stem = basename.split('.')[0]
         
     for root, dirs, files in os.walk(path):
         for file in files:
-            if basename.split('.')[0] in file:
+            if file == stem or file.startswith(stem + '.'):
                 try:
-                    dir = os.path.join(destination, 'imagens')
-                    if not os.path.exists(dir):
-                        os.makedirs(dir)
                     f = os.path.join(root, file)
                     newf = os.path.join(parent, folder, 'imagens', file)
                     shutil.copy2(f, newf)
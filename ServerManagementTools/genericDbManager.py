@@ -27,6 +27,7 @@ import codecs, os, json, binascii
 
 #DSG Tools imports
 from DsgTools.Factories.DbFactory.dbFactory import DbFactory 
+from DsgTools.Factories.DbFactory.dbConnectionPool import DbConnectionPool, BatchDbRunner
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
 from DsgTools.Utils.utils import Utils
 from DsgTools.dsgEnums import DsgEnums
@@ -44,6 +45,8 @@ class GenericDbManager(QObject):
         self.dbDict = dbDict
         self.serverAbstractDb = serverAbstractDb
         self.adminDb = self.instantiateAdminDb(serverAbstractDb)
+        (host, port, user, password) = serverAbstractDb.getParamsFromConectedDb()
+        self.connectionPool = DbConnectionPool(host, port, user, password)
         self.utils = Utils()
         self.extensionDict = {'EarthCoverage':'.dsgearthcov', 
                     'Customization':'.dsgcustom', 
@@ -254,44 +257,47 @@ class GenericDbManager(QObject):
         self.createSetting(configName, edgvVersion, newJsonDict)
         return self.installSetting(configName,dbNameList = dbList)
 
-    def installSetting(self, configName, dbNameList = []):
+    def installSetting(self, configName, dbNameList = [], maxWorkers = None):
         """
         Generic install. Can be reimplenented in child methods.
+        Databases are handled concurrently by up to maxWorkers workers (default from DsgTools options).
         """
-        errorDict = dict()
         settingType = self.getManagerType()
         if dbNameList == []:
             dbNameList = self.dbDict.keys()
-        successList = []
         configEdgvVersion = self.getSettingVersion(configName)
-        for dbName in dbNameList:
-            abstractDb = self.instantiateAbstractDb(dbName)
-            edgvVersion = abstractDb.getDatabaseVersion()
-            if edgvVersion != configEdgvVersion:
-                errorDict[dbName] = self.tr('Database version missmatch.')
-                continue
-            recDict = self.adminDb.getRecordFromAdminDb(settingType, configName, edgvVersion)
-            try:
-                if not abstractDb.checkIfExistsConfigTable(settingType):
-                    abstractDb.createPropertyTable(settingType, useTransaction = True)
-            except Exception as e:
-                errorDict[dbName] = ':'.join(e.args)
-                continue
-            try:
-                abstractDb.db.transaction()
-                self.adminDb.db.transaction()
-                self.materializeIntoDatabase(abstractDb, recDict)  #step done when property management involves changing database structure
-                abstractDb.insertRecordInsidePropertyTable(settingType, recDict, edgvVersion)
-                dbOid = abstractDb.getDbOID()
-                self.adminDb.insertInstalledRecordIntoAdminDb(settingType, recDict, dbOid)
-                abstractDb.db.commit()
-                self.adminDb.db.commit()
-            except Exception as e:
-                abstractDb.db.rollback()
-                self.adminDb.db.rollback()
-                errorDict[dbName] = ':'.join(e.args)
-            successList.append(dbName)
+        recDict = self.adminDb.getRecordFromAdminDb(settingType, configName, configEdgvVersion)
+        runner = BatchDbRunner(self.connectionPool, maxWorkers = maxWorkers)
+        try:
+            successList, errorDict = runner.run(dbNameList, lambda abstractDb: self.installSettingOnDb(abstractDb, settingType, recDict, configEdgvVersion))
+        finally:
+            runner.shutdown()
         return (successList, errorDict)
+
+    def installSettingOnDb(self, abstractDb, settingType, recDict, configEdgvVersion):
+        """
+        Installs recDict on abstractDb. Runs on a worker thread, therefore dsgtools_admindb
+        is accessed through the connection pool instead of self.adminDb.
+        """
+        edgvVersion = abstractDb.getDatabaseVersion()
+        if edgvVersion != configEdgvVersion:
+            raise Exception(self.tr('Database version missmatch.'))
+        if not abstractDb.checkIfExistsConfigTable(settingType):
+            abstractDb.createPropertyTable(settingType, useTransaction = True)
+        adminDb = self.connectionPool.getDb('dsgtools_admindb')
+        try:
+            abstractDb.db.transaction()
+            adminDb.db.transaction()
+            self.materializeIntoDatabase(abstractDb, recDict)  #step done when property management involves changing database structure
+            abstractDb.insertRecordInsidePropertyTable(settingType, recDict, edgvVersion)
+            dbOid = abstractDb.getDbOID()
+            adminDb.insertInstalledRecordIntoAdminDb(settingType, recDict, dbOid)
+            abstractDb.db.commit()
+            adminDb.db.commit()
+        except Exception as e:
+            abstractDb.db.rollback()
+            adminDb.db.rollback()
+            raise e
     
     def deleteSetting(self, configName, dbNameList = []):
         """
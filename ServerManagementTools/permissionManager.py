@@ -27,6 +27,7 @@ import codecs, os, json, binascii
 
 #DSG Tools imports
 from DsgTools.Factories.DbFactory.dbFactory import DbFactory 
+from DsgTools.Factories.DbFactory.dbConnectionPool import BatchDbRunner
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
 from DsgTools.ServerManagementTools.genericDbManager import GenericDbManager
 from DsgTools.Utils.utils import Utils
@@ -40,6 +41,8 @@ class PermissionManager(GenericDbManager):
     '''
     def __init__(self, serverAbstractDb, dbDict, edgvVersion, parentWidget = None):
         super(self.__class__,self).__init__(serverAbstractDb, dbDict, edgvVersion, parentWidget = None)
+        #database versions do not change while the manager is open, they are read only once
+        self.versionDict = dict()
     
     def getRolesInformation(self):
         '''
@@ -47,42 +50,57 @@ class PermissionManager(GenericDbManager):
         dbRolesDict = { 'dbname':[-list of roles-] }
         rolesDict = { 'profileName': { 'dbname' : [-list of roles with uuid on it-] } }
         '''
-        dbRolesDict = self.adminDb.getRolesDict()
+        dbRolesDict, rolesDict, grantedRoleDict = self.getCatalogSnapshot()
+        return dbRolesDict, rolesDict
+
+    def getCatalogSnapshot(self):
+        '''
+        Reads roles and role memberships of the whole server with a single query.
+        Returns (dbRolesDict, rolesDict, grantedRoleDict), the first two as in getRolesInformation and
+        grantedRoleDict = { roleName : set(-granted users-) }
+        '''
+        dbRolesDict, grantedRoleDict = self.adminDb.getRoleCatalogSnapshot()
         rolesDict = dict()
         for db in dbRolesDict.keys():
             for role in dbRolesDict[db]:
                 profileName = '_'.join(role.split('_')[0:-5])
-                if profileName not in rolesDict.keys():
-                    rolesDict[profileName] = dict()
-                if db not in rolesDict[profileName].keys():
-                    rolesDict[profileName][db] = []
-                rolesDict[profileName][db].append(role)
-        return dbRolesDict, rolesDict
-    
-    def getDatabasePerspectiveDict(self):
+                rolesDict.setdefault(profileName, dict()).setdefault(db, []).append(role)
+        return dbRolesDict, rolesDict, grantedRoleDict
+
+    def getDatabaseVersionDict(self):
+        '''
+        Gets a dict in the format {dbName: edgvVersion} for the dbs in dbDict.
+        Versions not read yet are read concurrently through pooled connections.
+        '''
+        missingList = [dbName for dbName in self.dbDict if dbName not in self.versionDict]
+        if missingList:
+            runner = BatchDbRunner(self.connectionPool)
+            try:
+                versionDict, exceptionDict = runner.map(missingList, lambda abstractDb: abstractDb.getDatabaseVersion())
+            finally:
+                runner.shutdown()
+            if exceptionDict:
+                raise Exception(self.tr('Problem getting database versions: ')+'\n'.join(exceptionDict.values()))
+            self.versionDict.update(versionDict)
+        return dict((dbName, self.versionDict[dbName]) for dbName in self.dbDict)
+
+    def getDatabasePerspectiveDict(self, snapshot = None):
         '''
         Gets a dict in the format: {dbName: {roleName :[-list of users-]}}
         The dbs are from dbDict 
+        snapshot: optional result of getCatalogSnapshot
         '''
-        (dbRolesDict, rolesDict) = self.getRolesInformation()
+        dbRolesDict, rolesDict, grantedRoleDict = snapshot if snapshot else self.getCatalogSnapshot()
         profiles = self.getSettings()
-        grantedRoleDict = self.adminDb.getGrantedRolesDict()
+        versionDict = self.getDatabaseVersionDict()
         dbPerspectiveDict = dict()
         for dbName in self.dbDict:
-            if dbName not in dbPerspectiveDict.keys():
-                dbPerspectiveDict[dbName] = dict()
-            edgvVersion = self.dbDict[dbName].getDatabaseVersion()
-            if edgvVersion in profiles.keys():
-                for profile in profiles[edgvVersion]:
-                    if profile not in dbPerspectiveDict[dbName].keys():
-                        dbPerspectiveDict[dbName][profile] = []
-                    if profile in rolesDict.keys():
-                        if dbName in rolesDict[profile].keys():
-                            for role in rolesDict[profile][dbName]:
-                                if role in grantedRoleDict.keys():
-                                    for user in grantedRoleDict[role]:
-                                        if user not in dbPerspectiveDict[dbName][profile]:
-                                            dbPerspectiveDict[dbName][profile].append(user)
+            dbPerspectiveDict[dbName] = dict()
+            for profile in profiles.get(versionDict[dbName], []):
+                userSet = set()
+                for role in rolesDict.get(profile, dict()).get(dbName, []):
+                    userSet |= grantedRoleDict.get(role, set())
+                dbPerspectiveDict[dbName][profile] = sorted(userSet)
         return dbPerspectiveDict
     
     def getUserPerspectiveDict(self):
@@ -91,17 +109,13 @@ class PermissionManager(GenericDbManager):
         '''
         dbPerspectiveDict = self.getDatabasePerspectiveDict()
         userPerspectiveDict = dict()
-        userList = [i[0] for i in self.adminDb.getUsersFromServer()]
-        for user in userList:
-            userPerspectiveDict[user] = dict()
+        for user in self.adminDb.getUsersFromServer():
+            userPerspectiveDict[user[0]] = dict()
         
         for dbName in dbPerspectiveDict.keys():
             for profile in dbPerspectiveDict[dbName]:
                 for user in dbPerspectiveDict[dbName][profile]:
-                    if dbName not in userPerspectiveDict[user].keys():
-                        userPerspectiveDict[user][dbName] = []
-                    if profile not in userPerspectiveDict[user][dbName]:
-                        userPerspectiveDict[user][dbName].append(profile)
+                    userPerspectiveDict.setdefault(user, dict()).setdefault(dbName, []).append(profile)
         return userPerspectiveDict
     
     def grantPermission(self, dbName, permissionName, edgvVersion, userName):
@@ -111,8 +125,20 @@ class PermissionManager(GenericDbManager):
         2. Checks if profile exists on db, if it does not, installs it;
         3. Grants profile to user on db.
         '''
-        profileDict = self.getSetting(permissionName, edgvVersion)
-        self.grantPermissionWithProfileDict(dbName, permissionName, userName, profileDict)
+        self.grantPermissions(dbName, permissionName, edgvVersion, [userName])
+
+    def grantPermissions(self, dbName, permissionName, edgvVersion, userList):
+        '''
+        Same as grantPermission, granting the profile to all users in userList with a single statement.
+        '''
+        if not userList:
+            return
+        dbRolesDict, rolesDict = self.getRolesInformation()
+        if dbName not in rolesDict.get(permissionName, dict()):
+            profileDict = self.getSetting(permissionName, edgvVersion)
+            self.instantiateAbstractDb(dbName).createRole(permissionName, profileDict) #creates profile in db
+            dbRolesDict, rolesDict = self.getRolesInformation() #done to refresh dicts due to new permission 
+        self.instantiateAbstractDb(dbName).grantRoles(userList, rolesDict[permissionName][dbName])
     
     def grantPermissionWithProfileDict(self, dbName, permissionName, userName, profileDict, updatePermission = False):
         '''
@@ -125,19 +151,25 @@ class PermissionManager(GenericDbManager):
             if not self.isPermissionInstalled(self.dbDict[dbName], dbName, permissionName):
                 self.dbDict[dbName].createRole(permissionName, profileDict) #creates profile in db
             (dbRolesDict, rolesDict) = self.getRolesInformation() #done to refresh dicts due to new permission 
-            for role in rolesDict[permissionName][dbName]:
-                self.dbDict[dbName].grantRole(userName, role)
+            self.dbDict[dbName].grantRoles([userName], rolesDict[permissionName][dbName])
     
     def revokePermission(self, dbName, permissionName, userName):
         '''
         Revokes permission on a db from permissionName.
         '''
+        self.revokePermissions(dbName, permissionName, [userName])
+
+    def revokePermissions(self, dbName, permissionName, userList):
+        '''
+        Revokes permission on a db from all users in userList with a single statement.
+        '''
+        if not userList:
+            return
         (dbRolesDict, rolesDict) = self.getRolesInformation()
-        for realRoleName in rolesDict[permissionName][dbName]:
-            try:
-                self.dbDict[dbName].revokeRole(userName, realRoleName)
-            except Exception as e:
-                raise Exception(self.tr('Problem revoking role ') + permissionName + self.tr(' on database ') + dbName +':\n' + ':'.join(e.args))
+        try:
+            self.instantiateAbstractDb(dbName).revokeRoles(userList, rolesDict[permissionName][dbName])
+        except Exception as e:
+            raise Exception(self.tr('Problem revoking role ') + permissionName + self.tr(' on database ') + dbName +':\n' + ':'.join(e.args))
     
     def isPermissionInstalled(self, abstractDb, dbName, permissionName):
         '''
@@ -145,41 +177,32 @@ class PermissionManager(GenericDbManager):
         Returns True if it is installed and False otherwise.
         '''
         (dbRolesDict, rolesDict) = self.getRolesInformation()
-        if permissionName not in rolesDict.keys():
-            return False
-        if dbName not in rolesDict[permissionName].keys():
-            return False
-        return True
+        return dbName in rolesDict.get(permissionName, dict())
     
     def updateSetting(self, settingName, edgvVersion, newProfileDict):
         '''
         1. Gets all roles from all databases that have the same settingName;
-        2. For each role, get users that are granted to them;
-        3. Drop role, create a new one and grant it to previous users;
+        2. For each database, get users that are granted to its roles;
+        3. Drop the roles, create a new one and grant it to previous users (one statement each);
         4. Updates public.permission_profile on dsgtools_admindb with the newJsonDict.
         '''
         abstractDbsToRollBack = []
         try:
             abstractDbsToRollBack.append(self.adminDb)
             self.adminDb.db.transaction() #done to rollback in case of trouble
-            (dbRolesDict, rolesDict) = self.getRolesInformation()
-            grantedRoleDict = self.adminDb.getGrantedRolesDict()
-            if settingName in rolesDict.keys():
-                for dbName in rolesDict[settingName].keys():
-                    for roleName in rolesDict[settingName][dbName]:
-                        if dbName not in self.dbDict.keys():
-                            abstractDb = self.instantiateAbstractDb(dbName)
-                        else:
-                            abstractDb = self.dbDict[dbName]
-                        #prepairs to rollback in case of exception
-                        abstractDbsToRollBack.append(abstractDb)
-                        abstractDb.db.transaction()
-                        usersToBeGranted = []
-                        if roleName in grantedRoleDict.keys():
-                            usersToBeGranted = grantedRoleDict[roleName]
-                        abstractDb.dropRoleOnDatabase(roleName)
-                        for userName in usersToBeGranted:
-                            self.grantPermissionWithProfileDict(dbName, settingName, userName, newProfileDict, updatePermission = True)
+            (dbRolesDict, rolesDict, grantedRoleDict) = self.getCatalogSnapshot()
+            for dbName, roleList in rolesDict.get(settingName, dict()).iteritems():
+                abstractDb = self.instantiateAbstractDb(dbName)
+                #prepairs to rollback in case of exception
+                abstractDbsToRollBack.append(abstractDb)
+                abstractDb.db.transaction()
+                usersToBeGranted = set()
+                for roleName in roleList:
+                    usersToBeGranted |= grantedRoleDict.get(roleName, set())
+                abstractDb.dropRolesOnDatabase(roleList)
+                if usersToBeGranted:
+                    role = abstractDb.createRole(settingName, newProfileDict, permissionManager = True)
+                    abstractDb.grantRoles(sorted(usersToBeGranted), [role])
             newjsonprofile = json.dumps(newProfileDict, sort_keys=True, indent=4)
             self.adminDb.updatePermissionProfile(settingName, edgvVersion, newjsonprofile)
             for abstractDb in abstractDbsToRollBack:
@@ -191,7 +214,7 @@ class PermissionManager(GenericDbManager):
     
     def deleteSetting(self, settingName, edgvVersion):
         '''
-        1. Get roles with the same definition of permissionName and delete them.
+        1. Get roles with the same definition of permissionName and delete them (one statement per database).
         2. Delete permission profile from public.permission_profile on dsgtools_admindb;
         '''
         #first step, delete roles with the same definition of selected profile
@@ -200,17 +223,12 @@ class PermissionManager(GenericDbManager):
             abstractDbsToRollBack.append(self.adminDb)
             self.adminDb.db.transaction() #done to rollback in case of trouble
             (dbRolesDict, rolesDict) = self.getRolesInformation()
-            if settingName in rolesDict.keys():
-                for dbName in rolesDict[settingName].keys():
-                    for roleName in rolesDict[settingName][dbName]:
-                        if dbName not in self.dbDict.keys():
-                            abstractDb = self.instantiateAbstractDb(dbName)
-                        else:
-                            abstractDb = self.dbDict[dbName]
-                        #prepairs to rollback in case of exception
-                        abstractDbsToRollBack.append(abstractDb)
-                        abstractDb.db.transaction()
-                        abstractDb.dropRoleOnDatabase(roleName)
+            for dbName, roleList in rolesDict.get(settingName, dict()).iteritems():
+                abstractDb = self.instantiateAbstractDb(dbName)
+                #prepairs to rollback in case of exception
+                abstractDbsToRollBack.append(abstractDb)
+                abstractDb.db.transaction()
+                abstractDb.dropRolesOnDatabase(roleList)
             #after deletion, delete permission profile from public.permission_profile
             self.adminDb.removeRecordFromPropertyTable('Permission',settingName, edgvVersion)
             for abstractDb in abstractDbsToRollBack:
@@ -36,6 +36,7 @@ from DsgTools.Utils.utils import Utils
 from DsgTools.Factories.SqlFactory.sqlGeneratorFactory import SqlGeneratorFactory
 from DsgTools.ServerTools.viewServers import ViewServers
 from DsgTools.Factories.DbFactory.dbFactory import DbFactory
+from DsgTools.Factories.DbFactory.dbConnectionPool import BatchDbRunner
 
 from DsgTools.UserTools.profile_editor import ProfileEditor
 from DsgTools.ServerTools.createView import CreateView
@@ -55,8 +56,10 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
         self.dbFactory = DbFactory()
         self.factory = SqlGeneratorFactory()
         self.showTabs(show = False)
+        self.batchRunner = None
         #setting the sql generator
         self.serverWidget.populateServersCombo()
+        self.serverWidget.abstractDbLoaded.connect(self.shutdownBatchRunner)
         self.serverWidget.abstractDbLoaded.connect(self.checkSuperUser)
         self.serverWidget.abstractDbLoaded.connect(self.populateOtherInterfaces)
         self.dbsCustomSelector.setTitle(self.tr('Server Databases'))
@@ -66,6 +69,7 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
         self.previousTab = 0
         self.dbDict = {'2.1.3':[], 'FTer_2a_Ed':[],'Non_EDGV':[], '3.0':[]}
         self.correspondenceDict = {self.tr('Load Database Model EDGV Version 2.1.3'):'2.1.3', self.tr('Load Database Model EDGV Version 3.0'):'3.0', self.tr('Load Database Model EDGV Version FTer_2a_Ed'):'FTer_2a_Ed',self.tr('Load Other Database Models'):'Non_EDGV'}
+        self.finished.connect(self.shutdownBatchRunner)
 
     @pyqtSlot(bool)
     def on_closePushButton_clicked(self):
@@ -109,15 +113,33 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
 
     def getSelectedDbList(self):
         return self.dbsCustomSelector.toLs
-    
-    def instantiateAbstractDbs(self, instantiateTemplates = False):
-        dbsDict = dict()
-        selectedDbNameList = self.getSelectedDbList()
+
+    def getBatchRunner(self):
+        """
+        Gets the runner used to apply batch operations concurrently on the selected databases.
+        Its pooled connections are kept until the dialog is closed or another server is loaded.
+        """
+        if not self.batchRunner:
+            self.batchRunner = BatchDbRunner.fromAbstractDb(self.serverWidget.abstractDb)
+        return self.batchRunner
+
+    def shutdownBatchRunner(self):
+        if self.batchRunner:
+            self.batchRunner.shutdown()
+            self.batchRunner = None
+
+    def getSelectedDbNameList(self, instantiateTemplates = False):
+        selectedDbNameList = list(self.getSelectedDbList())
         if instantiateTemplates:
             for templateName in ['template_edgv_213', 'template_edgv_fter_2a_ed', 'template_edgv_3']:
                 if templateName not in selectedDbNameList:
                     if templateName != 'dsgtools_admindb':
                         selectedDbNameList.append(templateName)
+        return selectedDbNameList
+    
+    def instantiateAbstractDbs(self, instantiateTemplates = False):
+        dbsDict = dict()
+        selectedDbNameList = self.getSelectedDbNameList(instantiateTemplates = instantiateTemplates)
         for dbName in selectedDbNameList:
             localDb = self.dbFactory.createDbFactory('QPSQL')
             localDb.connectDatabaseWithParameters(self.serverWidget.abstractDb.db.hostName(), self.serverWidget.abstractDb.db.port(), dbName, self.serverWidget.abstractDb.db.userName(), self.serverWidget.abstractDb.db.password())
@@ -178,29 +200,25 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
         self.outputMessage(header, successList, exceptionDict)
 
     def batchUpgradePostgis(self, dbList):
-        exceptionDict = dict()
-        successList = []
-        dbsDict = self.instantiateAbstractDbs(instantiateTemplates = True)
-        self.closeAbstractDbs(dbsDict)
-        for dbName in dbsDict.keys():
-            try:
-                if self.serverWidget.abstractDb.checkIfTemplate(dbName):
-                    self.serverWidget.abstractDb.setDbAsTemplate(dbName = dbName, setTemplate = False)
-                    dbsDict[dbName].upgradePostgis()
-                    self.serverWidget.abstractDb.setDbAsTemplate(dbName = dbName, setTemplate = True)
-                    successList.append(dbName)
-                else:
-                    dbsDict[dbName].upgradePostgis()
-                    successList.append(dbName)
-            except Exception as e:
-                exceptionDict[dbName] =  ':'.join(e.args)
-        return successList, exceptionDict
+        runner = self.getBatchRunner()
+        serverDbName = self.serverWidget.abstractDb.getDatabaseName()
+        def upgradePostgis(abstractDb):
+            #server operations must use the connection of the worker thread
+            serverDb = runner.pool.getDb(serverDbName)
+            dbName = abstractDb.getDatabaseName()
+            if serverDb.checkIfTemplate(dbName):
+                serverDb.setDbAsTemplate(dbName = dbName, setTemplate = False)
+                abstractDb.upgradePostgis()
+                serverDb.setDbAsTemplate(dbName = dbName, setTemplate = True)
+            else:
+                abstractDb.upgradePostgis()
+        return runner.run(self.getSelectedDbNameList(instantiateTemplates = True), upgradePostgis)
 
     def batchDropDbs(self, dbList):
         exceptionDict = dict()
         successList = []
-        dbsDict = self.instantiateAbstractDbs()
-        self.closeAbstractDbs(dbsDict)
+        #pooled connections would prevent the databases from being dropped
+        self.shutdownBatchRunner()
         for dbName in dbList:
             try:
                 self.serverWidget.abstractDb.dropDatabase(dbName)
@@ -211,17 +229,9 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
     
     @pyqtSlot(bool)
     def on_importStylesPushButton_clicked(self):
-        dbsDict = self.instantiateAbstractDbs()
-        exceptionDict = dict()
-        versionList = []
-        
-        for dbName in dbsDict.keys():
-            try:
-                version = dbsDict[dbName].getDatabaseVersion()
-                if version not in versionList:
-                    versionList.append(version)
-            except Exception as e:
-                exceptionDict[dbName] = ':'.join(e.args)
+        dbNameList = self.getSelectedDbNameList()
+        versionDict, exceptionDict = self.getBatchRunner().map(dbNameList, lambda abstractDb: abstractDb.getDatabaseVersion())
+        versionList = list(set(versionDict.values()))
         if len(exceptionDict.keys())>0:
             self.logInternalError(exceptionDict)
         if len(versionList) > 1:
@@ -235,13 +245,11 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
         if not selectedStyles:
             return
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-        successList, exceptionDict = self.batchImportStyles(dbsDict, styleDir, selectedStyles, versionList[0])
+        successList, exceptionDict = self.batchImportStyles(dbNameList, styleDir, selectedStyles, versionList[0])
         QApplication.restoreOverrideCursor()
         header = self.tr('Import operation complete. \n')
         self.outputMessage(header, successList, exceptionDict)
         self.populateStylesInterface()
-        closeExceptionDict = self.closeAbstractDbs(dbsDict)
-        self.logInternalError(closeExceptionDict)            
             
     
     def getStyleList(self, styleDir):
@@ -259,30 +267,19 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
             styleList = [version+'/'+os.path.basename(styleDir)]
         return styleList
     
-    def batchImportStyles(self, dbsDict, styleDir, styleList, version):
-        exceptionDict = dict()
-        successList = []
-        for dbName in dbsDict.keys():
+    def batchImportStyles(self, dbNameList, styleDir, styleList, version):
+        for style in styleList:
+            currentStyleFilesDir = "{0}/{1}".format(styleDir, style.split("/")[1])
+            fileList = os.listdir(currentStyleFilesDir)
+            # iterate over the list of files and check if there are non-QML files
+            onlyQml = bool(sum([int(".qml" in file.lower()) for file in fileList]))
+            if not onlyQml:
+                exceptionDict = {dbName : self.tr("There are non-QML files in directory {0}.").format(currentStyleFilesDir).encode('utf-8') for dbName in dbNameList}
+                return [], exceptionDict
+        def importStyles(abstractDb):
             for style in styleList:
-                currentStyleFilesDir = "{0}/{1}".format(styleDir, style.split("/")[1])
-                fileList = os.listdir(currentStyleFilesDir)
-                # iterate over the list of files and check if there are non-QML files
-                onlyQml = bool(sum([int(".qml" in file.lower()) for file in fileList]))
-                try:
-                    if not onlyQml:
-                        raise Exception(self.tr("There are non-QML files in directory {0}.").format(currentStyleFilesDir))
-                    dbsDict[dbName].importStylesIntoDb(style)
-                    successList.append(dbName)
-                except Exception as e:
-                    errors = []
-                    for arg in e.args:
-                        if isinstance(arg, basestring):
-                            s = '{}'.format(arg.encode('utf-8'))
-                        else:
-                            s = str(arg)
-                        errors.append(s)
-                    exceptionDict[dbName] =  ':'.join(errors)
-        return successList, exceptionDict
+                abstractDb.importStylesIntoDb(style)
+        return self.getBatchRunner().run(dbNameList, importStyles)
     
     def getStyleDir(self, versionList):
         currentPath = os.path.join(os.path.dirname(__file__),'..','Styles', self.serverWidget.abstractDb.versionFolderDict[versionList[0]])
@@ -294,15 +291,10 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
             if perspective = 'style'    : [styleName][dbName][tableName] = timestamp
             if perspective = 'database' : [dbName][styleName][tableName] = timestamp 
         '''
-        dbsDict = self.instantiateAbstractDbs()
         allStylesDict = dict()
-        exceptionDict = dict()
-        for dbName in dbsDict.keys():
-            try:
-                newDict =dbsDict[dbName].getAllStylesDict(perspective)
-                allStylesDict = self.utils.mergeDict(newDict, allStylesDict)
-            except Exception as e:
-                exceptionDict[dbName] = ':'.join(e.args)
+        styleDictByDb, exceptionDict = self.getBatchRunner().map(self.getSelectedDbNameList(), lambda abstractDb: abstractDb.getAllStylesDict(perspective))
+        for newDict in styleDictByDb.values():
+            allStylesDict = self.utils.mergeDict(newDict, allStylesDict)
         if len(exceptionDict.keys())>0:
             self.logInternalError(exceptionDict)
         return allStylesDict
@@ -335,7 +327,6 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
     
     @pyqtSlot(bool)
     def on_deleteStyles_clicked(self):
-        dbsDict = self.instantiateAbstractDbs()
         styleDict = self.getStylesFromDbs()
         styleList = styleDict.keys()
         dlg = SelectStyles(styleList)
@@ -346,25 +337,23 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
         else:
             removeStyleDict = { style : styleDict[style] for style in selectedStyles }
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-        successList, exceptionDict = self.batchDeleteStyles(dbsDict, removeStyleDict)
+        successList, exceptionDict = self.batchDeleteStyles(removeStyleDict)
         QApplication.restoreOverrideCursor()
         header = self.tr('Delete operation complete. \n')
         self.outputMessage(header, successList, exceptionDict)
         self.populateStylesInterface()
-        closeExceptionDict = self.closeAbstractDbs(dbsDict)
-        self.logInternalError(closeExceptionDict)       
     
-    def batchDeleteStyles(self, dbsDict, styleDict):
-        exceptionDict = dict()
-        successList = []
+    def batchDeleteStyles(self, styleDict):
+        dbStyleDict = dict()
         for style in styleDict.keys():
             for dbName in styleDict[style].keys():
-                try:
-                    dbsDict[dbName].deleteStyle(style)
-                    successList.append(dbName)
-                except Exception as e:
-                    exceptionDict[dbName] =  ':'.join(e.args)
-        return successList, exceptionDict
+                if dbName not in dbStyleDict.keys():
+                    dbStyleDict[dbName] = []
+                dbStyleDict[dbName].append(style)
+        def deleteStyles(abstractDb):
+            for style in dbStyleDict[abstractDb.getDatabaseName()]:
+                abstractDb.deleteStyle(style)
+        return self.getBatchRunner().run(dbStyleDict.keys(), deleteStyles)
     
     def getSQLFile(self):
         fd = QFileDialog()
@@ -373,28 +362,17 @@ class BatchDbManager(QtGui.QDialog, FORM_CLASS):
     
     @pyqtSlot(bool)
     def on_customizeFromSQLFilePushButton_clicked(self):
-        dbsDict = self.instantiateAbstractDbs()
         sqlFilePath = self.getSQLFile()
         if sqlFilePath == '':
             return
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-        successList, exceptionDict = self.batchCustomizeFromSQLFile(dbsDict, sqlFilePath)
+        successList, exceptionDict = self.batchCustomizeFromSQLFile(self.getSelectedDbNameList(), sqlFilePath)
         QApplication.restoreOverrideCursor()
         header = self.tr('Customize from SQL file operation complete. \n')
         self.outputMessage(header, successList, exceptionDict)
-        closeExceptionDict = self.closeAbstractDbs(dbsDict)
-        self.logInternalError(closeExceptionDict)
     
-    def batchCustomizeFromSQLFile(self, dbsDict, sqlFilePath):
-        exceptionDict = dict()
-        successList = []
-        for dbName in dbsDict.keys():
-            try:
-                dbsDict[dbName].runSqlFromFile(sqlFilePath)
-                successList.append(dbName)
-            except Exception as e:
-                exceptionDict[dbName] =  ':'.join(e.args)
-        return successList, exceptionDict
+    def batchCustomizeFromSQLFile(self, dbNameList, sqlFilePath):
+        return self.getBatchRunner().run(dbNameList, lambda abstractDb: abstractDb.runSqlFromFile(sqlFilePath))
 
     def populateOtherInterfaces(self):
         dbsDict = self.instantiateAbstractDbs()
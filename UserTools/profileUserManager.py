@@ -58,17 +58,18 @@ class ProfileUserManager(QtGui.QDialog, FORM_CLASS):
         successList = []
         errorDict = dict()
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-        for userName in usersToGrant:
-            try:
-                self.permissionManager.grantPermission(self.dbName, self.profileName, self.edgvVersion, userName)
-                successList.append(userName)
-            except Exception as e:
+        #users are granted and revoked with one statement each
+        try:
+            self.permissionManager.grantPermissions(self.dbName, self.profileName, self.edgvVersion, usersToGrant)
+            successList += usersToGrant
+        except Exception as e:
+            for userName in usersToGrant:
                 errorDict[userName] = ':'.join(e.args)
-        for userName in usersToRevoke:
-            try:
-                self.permissionManager.revokePermission(self.dbName, self.profileName, userName)
-                successList.append(userName)
-            except Exception as e:
+        try:
+            self.permissionManager.revokePermissions(self.dbName, self.profileName, usersToRevoke)
+            successList += usersToRevoke
+        except Exception as e:
+            for userName in usersToRevoke:
                 errorDict[userName] = ':'.join(e.args)
         QApplication.restoreOverrideCursor()
         self.outputMessage(header, successList, errorDict)
@@ -20,11 +20,14 @@
  *                                                                         *
  ***************************************************************************/
 """
-from qgis.core import QgsMessageLog, QgsVectorLayer, QgsMapLayerRegistry, QgsGeometry, QgsVectorDataProvider, QgsFeatureRequest, QgsExpression, QgsFeature
+from qgis.core import QgsMessageLog
 from DsgTools.ValidationTools.ValidationProcesses.validationProcess import ValidationProcess
-import processing, binascii
+from DsgTools.CustomWidgets.progressWidget import ProgressWidget
 
 class CleanGeometriesProcess(ValidationProcess):
+    #angle (radians) under which two edges leaving the same node are flagged
+    smallAngle = 0.0001
+
     def __init__(self, postgisDb, iface, instantiating=False):
         """
         Constructor
@@ -42,35 +45,26 @@ class CleanGeometriesProcess(ValidationProcess):
                 interfaceDictList.append({self.tr('Category'):cat, self.tr('Layer Name'):lyrName, self.tr('Geometry\nColumn'):geom, self.tr('Geometry\nType'):geomType, self.tr('Layer\nType'):tableType})
             self.parameters = {'Snap': 1.0, 'MinArea': 0.001, 'Classes': interfaceDictList, 'Only Selected':False}
         
-    def runProcessinAlg(self, layer):
+    def getErrorReasonDict(self):
+        return {'break' : self.tr('Cleaning error: features crossing (broken at the intersection).'),
+                'rmdupl' : self.tr('Cleaning error: duplicated geometry removed.'),
+                'rmsa' : self.tr('Cleaning error: small angle between lines at node.'),
+                'rmarea' : self.tr('Cleaning error: area smaller than the minimum area.')}
+
+    def runCleaning(self, classAndGeom):
         """
-        Runs the actual grass process
+        Cleans the class on the server (temp table), updating the layer afterwards.
+        Returns the list of (feature id, error code, geometry) of the cleaning errors.
         """
-        alg = 'grass7:v.clean.advanced'
-
-        #setting tools
-        tools = 'rmsa,break,rmdupl,rmdangle'
-        threshold = -1
-
-        #getting table extent (bounding box)
-        extent = layer.extent()
-        (xmin, xmax, ymin, ymax) = extent.xMinimum(), extent.xMaximum(), extent.yMinimum(), extent.yMaximum()
-        extent = '{0},{1},{2},{3}'.format(xmin, xmax, ymin, ymax)
-        
-        snap = self.parameters['Snap']
-        minArea = self.parameters['MinArea']
-        
-        ret = processing.runalg(alg, layer, tools, threshold, extent, snap, minArea, None, None)
-        if not ret:
-            raise Exception(self.tr('Problem executing grass7:v.clean.advanced. Check your installed libs.\n'))
-        
-        #updating original layer
-        outputLayer = processing.getObject(ret['output'])
-        #self.updateOriginalLayerV2(layer, outputLayer)
-
-        #getting error flags
-        errorLayer = processing.getObject(ret['error'])
-        return self.getProcessingErrors(errorLayer), outputLayer
+        processTableName, lyr, keyColumn = self.prepareExecution(classAndGeom)
+        isPolygon = 'POLYGON' in classAndGeom['geomType'].upper()
+        try:
+            result = self.abstractDb.cleanGeometries(processTableName, self.parameters['Snap'], self.parameters['MinArea'], classAndGeom['geom'], keyColumn, isPolygon, self.smallAngle)
+        except:
+            self.abstractDb.dropTempTable(processTableName)
+            raise
+        self.postProcessSteps(processTableName, lyr)
+        return result
 
     def execute(self):
         """
@@ -87,29 +81,22 @@ class CleanGeometriesProcess(ValidationProcess):
                 QgsMessageLog.logMessage(self.tr('No classes selected! Nothing to be done.'), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
                 return 1
             error = False
+            reasonDict = self.getErrorReasonDict()
             for key in classesWithElem:
                 # preparation
                 classAndGeom = self.classesWithElemDict[key]
-                lyr = self.loadLayerBeforeValidationProcess(classAndGeom)
-                # specific EPSG search
-                parameters = {'tableSchema': classAndGeom['tableSchema'], 'tableName': classAndGeom['tableName'], 'geometryColumn': classAndGeom['geom']}
-                srid = self.abstractDb.findEPSG(parameters=parameters)                        
-
+                localProgress = ProgressWidget(0, 1, self.tr('Running process on ') + classAndGeom['lyrName'], parent=self.iface.mapCanvas())
+                localProgress.step()
                 # running the process in the temp table
-                coverage = self.createUnifiedLayer([lyr])
-                result, output = self.runProcessinAlg(coverage)
-                self.splitUnifiedLayer(output, [lyr])
-                try:
-                    QgsMapLayerRegistry.instance().removeMapLayer(coverage.id())
-                except:
-                    QgsMessageLog.logMessage(self.tr('Error while trying to remove coverage layer.'), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
+                result = self.runCleaning(classAndGeom)
+                localProgress.step()
                 
                 # storing flags
                 if len(result) > 0:
                     error = True
                     recordList = []
-                    for tupple in result:
-                        recordList.append(('{0}.{1}'.format(classAndGeom['tableSchema'], classAndGeom['tableName']), tupple[0], self.tr('Cleaning error.'), tupple[1], classAndGeom['geom']))
+                    for featId, code, geom in result:
+                        recordList.append(('{0}.{1}'.format(classAndGeom['tableSchema'], classAndGeom['tableName']), featId, reasonDict[code], geom, classAndGeom['geom']))
                     numberOfProblems = self.addFlag(recordList)
                     QgsMessageLog.logMessage(str(numberOfProblems) + self.tr(' feature(s) from ') + classAndGeom['lyrName'] + self.tr(' with cleaning errors. Check flags.'), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
                 else:
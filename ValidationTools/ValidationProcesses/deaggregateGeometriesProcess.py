@@ -42,6 +42,65 @@ class DeaggregateGeometriesProcess(ValidationProcess):
                 interfaceDictList.append({self.tr('Category'):cat, self.tr('Layer Name'):lyrName, self.tr('Geometry\nColumn'):geom, self.tr('Geometry\nType'):geomType, self.tr('Layer\nType'):tableType})
             self.parameters = {'Classes': interfaceDictList, 'Only Selected':False}
 
+    def deaggregateOnServer(self, lyr, classAndGeom, keyColumn):
+        """
+        Deaggregates the layer table with set based queries (INSERT ... SELECT from ST_Dump plus UPDATE).
+        Only the features shown by the layer (its subset string) are deaggregated.
+        Returns the number of new parts.
+        """
+        idList = lyr.selectedFeaturesIds() if self.parameters['Only Selected'] else None
+        if idList is not None and len(idList) == 0:
+            return 0
+        tableSchema, tableName, geomColumn = classAndGeom['tableSchema'], classAndGeom['tableName'], classAndGeom['geom']
+        newParts = self.abstractDb.deaggregateGeometries(tableSchema, tableName, keyColumn = keyColumn, geomColumn = geomColumn, idList = idList, subsetString = lyr.subsetString())
+        # the layer must show the new records
+        lyr.dataProvider().forceReload()
+        lyr.triggerRepaint()
+        return newParts
+
+    def deaggregateOnEditBuffer(self, lyr, classAndGeom, keyColumn):
+        """
+        Deaggregates the layer features through the QGIS edit buffer.
+        Used for layers that are not PostGIS tables or that have pending edits.
+        Returns the number of new parts.
+        """
+        lyr.startEditing()
+        provider = lyr.dataProvider()
+        if self.parameters['Only Selected']:
+            featureList = lyr.selectedFeatures()
+            size = len(featureList)
+        else:
+            featureList = lyr.getFeatures()
+            size = len(lyr.allFeatureIds())
+
+        newParts = 0
+        localProgress = ProgressWidget(1, size, self.tr('Running process on ') + classAndGeom['lyrName'], parent=self.iface.mapCanvas())
+        for feat in featureList:
+            geom = feat.geometry()
+            if not geom:
+                #insert deletion
+                lyr.deleteFeature(feat.id())
+                localProgress.step()
+                continue
+            if geom.geometry().partCount() > 1:
+                parts = geom.asGeometryCollection()
+                for part in parts:
+                    part.convertToMultiType()
+                addList = []
+                for i in range(1,len(parts)):
+                    if parts[i]:
+                        newFeat = QgsFeature(feat)
+                        newFeat.setGeometry(parts[i])
+                        idx = newFeat.fieldNameIndex(keyColumn)
+                        newFeat.setAttribute(idx,provider.defaultValue(idx))
+                        addList.append(newFeat)
+                feat.setGeometry(parts[0])
+                lyr.updateFeature(feat)
+                lyr.addFeatures(addList,True)
+                newParts += len(addList)
+            localProgress.step()
+        return newParts
+
     def execute(self):
         """
         Reimplementation of the execute method from the parent class
@@ -54,6 +113,7 @@ class DeaggregateGeometriesProcess(ValidationProcess):
             if len(classesWithElem) == 0:
                 self.setStatus(self.tr('No classes selected!. Nothing to be done.'), 1) #Finished
                 return 1
+            newParts = 0
             for key in classesWithElem:
                 self.startTimeCount()
                 # preparation
@@ -63,45 +123,19 @@ class DeaggregateGeometriesProcess(ValidationProcess):
                 localProgress.step()
                 localProgress.step()
 
-                lyr.startEditing()
-                provider = lyr.dataProvider()
-                uri = QgsDataSourceURI(provider.dataSourceUri())
+                uri = QgsDataSourceURI(lyr.dataProvider().dataSourceUri())
                 keyColumn = uri.keyColumn()
 
-                if self.parameters['Only Selected']:
-                    featureList = lyr.selectedFeatures()
-                    size = len(featureList)
-                else:
-                    featureList = lyr.getFeatures()
-                    size = len(lyr.allFeatureIds())
-
-                localProgress = ProgressWidget(1, size, self.tr('Running process on ') + classAndGeom['lyrName'], parent=self.iface.mapCanvas())
-                for feat in featureList:
-                    geom = feat.geometry()
-                    if not geom:
-                        #insert deletion
-                        lyr.deleteFeature(feat.id())
-                        localProgress.step()
-                        continue
-                    if geom.geometry().partCount() > 1:
-                        parts = geom.asGeometryCollection()
-                        for part in parts:
-                            part.convertToMultiType()
-                        addList = []
-                        for i in range(1,len(parts)):
-                            if parts[i]:
-                                newFeat = QgsFeature(feat)
-                                newFeat.setGeometry(parts[i])
-                                idx = newFeat.fieldNameIndex(keyColumn)
-                                newFeat.setAttribute(idx,provider.defaultValue(idx))
-                                addList.append(newFeat)
-                        feat.setGeometry(parts[0])
-                        lyr.updateFeature(feat)
-                        lyr.addFeatures(addList,True)
+                # pending edits would be lost or conflict with the server side changes
+                if lyr.providerType() == 'postgres' and keyColumn and not lyr.isModified():
+                    localProgress = ProgressWidget(0, 1, self.tr('Running process on ') + classAndGeom['lyrName'], parent=self.iface.mapCanvas())
+                    newParts += self.deaggregateOnServer(lyr, classAndGeom, keyColumn)
                     localProgress.step()
+                else:
+                    newParts += self.deaggregateOnEditBuffer(lyr, classAndGeom, keyColumn)
                 self.logLayerTime(classAndGeom['lyrName'])
 
-            msg = self.tr('All geometries are now single parted.')
+            msg = self.tr('All geometries are now single parted. {0} new features were created.').format(newParts)
             self.setStatus(msg, 1) #Finished
             return 1
         except Exception as e:
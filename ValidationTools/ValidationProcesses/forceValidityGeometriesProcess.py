@@ -56,7 +56,8 @@ class ForceValidityGeometriesProcess(ValidationProcess):
         try:
             self.setStatus(self.tr('Running'), 3) #now I'm running!
             # getting parameters after the execution of our pre process
-            self.flagsDict = self.abstractDb.getFlagsDictByProcess('IdentifyInvalidGeometriesProcess')
+            # only the flagged classes are fetched, flags are joined on the server
+            self.flagsDict = self.abstractDb.getFlaggedClassesByProcess('IdentifyInvalidGeometriesProcess')
             classesWithFlags = self.flagsDict.keys()
             self.startTimeCount()
             if len(classesWithFlags) == 0:
@@ -74,7 +75,7 @@ class ForceValidityGeometriesProcess(ValidationProcess):
                 #running the process in the temp table
                 localProgress = ProgressWidget(0, 1, self.tr('Running process on ') + cl, parent=self.iface.mapCanvas())
                 localProgress.step()
-                problems = self.abstractDb.forceValidity(processTableName, self.flagsDict[cl], keyColumn)
+                problems = self.abstractDb.forceValidityFromFlags(processTableName, cl, 'IdentifyInvalidGeometriesProcess', self.flagsDict[cl]['geometry_column'], keyColumn)
                 localProgress.step()
                 numberOfProblems += problems
                 self.logLayerTime(cl) #check this time later (I guess time will be counted twice due to postProcess)
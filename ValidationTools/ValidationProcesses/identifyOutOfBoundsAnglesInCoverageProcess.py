@@ -20,9 +20,8 @@
  *                                                                         *
  ***************************************************************************/
 """
-from qgis.core import QgsMessageLog, QgsFeature, QgsGeometry, QgsVertexId, QGis, QgsMapLayerRegistry
-import math, processing
-from math import pi
+from qgis.core import QgsMessageLog, QgsFeature, QgsGeometry, QGis, QgsMapLayerRegistry, QgsPoint
+import math
 from itertools import combinations
 from DsgTools.ValidationTools.ValidationProcesses.validationProcess import ValidationProcess
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
@@ -54,57 +53,68 @@ class IdentifyOutOfBoundsAnglesInCoverageProcess(ValidationProcess):
         return self.tr('Identify Out Of Bounds Angles')
     
     def getLineEdges(self, coverageLyr):
-        extent = coverageLyr.extent()
-        (xmin, xmax, ymin, ymax) = extent.xMinimum(), extent.xMaximum(), extent.yMinimum(), extent.yMaximum()
-        extent = '{0},{1},{2},{3}'.format(xmin, xmax, ymin, ymax)
-        grass_output =processing.runalg('grass7:v.clean.advanced', coverageLyr,'break,rmdupl',-1, extent, -1, 0.0001, None, None)
-        if not grass_output:
-            raise Exception(self.tr('Problem executing grass7:v.clean.advanced. Check your installed libs.\n'))
-        return processing.getObject(grass_output['output'])
-    
-    def getSegmentDict(self, lineLyr):
+        """
+        Nodes the coverage lines: lines are broken at every intersection and
+        duplicated lines are removed (same result of v.clean break,rmdupl).
+        Returns a list of polylines.
+        """
+        geomList = [QgsGeometry(feat.geometry()) for feat in coverageLyr.getFeatures() if feat.geometry()]
+        if not geomList:
+            return []
+        nodedGeom = QgsGeometry.unaryUnion(geomList)
+        if not nodedGeom:
+            raise Exception(self.tr('Problem noding coverage lines.\n'))
+        if nodedGeom.isMultipart():
+            return nodedGeom.asMultiPolyline()
+        return [nodedGeom.asPolyline()]
+
+    def getSegmentDict(self, edgeList):
+        """
+        Builds a dict keyed by the coordinates of each edge end point. Each value
+        is the list of vertexes adjacent to that end point on its edges.
+        """
         segmentDict = dict()
-        geomList = []
-        for feat in lineLyr.getFeatures():
-            geom = feat.geometry()
-            if geom not in geomList:
-                geomList.append(geom)
-                lineList = geom.asPolyline()
-                if lineList[0] not in segmentDict:
-                    segmentDict[lineList[0]] = []
-                segmentDict[lineList[0]].append(QgsGeometry.fromPolyline([lineList[0], lineList[1]]))
-                if lineList[-1] not in segmentDict:
-                    segmentDict[lineList[-1]] = []
-                segmentDict[lineList[-1]].append(QgsGeometry.fromPolyline([lineList[-1], lineList[-2]]))
+        for line in edgeList:
+            if len(line) < 2:
+                continue
+            for node, neighbour in [(line[0], line[1]), (line[-1], line[-2])]:
+                key = (node.x(), node.y())
+                if key not in segmentDict:
+                    segmentDict[key] = []
+                segmentDict[key].append((neighbour.x(), neighbour.y()))
         return segmentDict
-    
-    def getAngleBetweenSegments(self, part):
-        line = part.asPolyline()
-        vertexAngle = (line[1].azimuth(line[0]) - line[1].azimuth(line[2]) + 360)
-        vertexAngle = math.fmod(vertexAngle, 360)
+
+    def getAngleBetweenSegments(self, node, neighbour1, neighbour2):
+        """
+        Gets the angle (in degrees, from 0 to 180) formed at node by the segments
+        that go to neighbour1 and neighbour2.
+        """
+        azimuth1 = math.degrees(math.atan2(neighbour1[0] - node[0], neighbour1[1] - node[1]))
+        azimuth2 = math.degrees(math.atan2(neighbour2[0] - node[0], neighbour2[1] - node[1]))
+        vertexAngle = math.fmod(azimuth1 - azimuth2 + 360, 360)
         if vertexAngle > 180:
             vertexAngle = 360 - vertexAngle
         return vertexAngle
 
-    def getOutOfBountsAngleInSegmentList(self, segmentList, angle):
-        for line1, line2 in combinations(segmentList, 2):
-            geom = line1.combine(line2)
-            part = geom.mergeLines()
-            if len(part.asPolyline()) > 2:
-                vertexAngle = self.getAngleBetweenSegments(part)
-                if vertexAngle < angle:
-                    return vertexAngle
+    def getOutOfBountsAngleInSegmentList(self, node, neighbourList, angle):
+        for neighbour1, neighbour2 in combinations(neighbourList, 2):
+            if neighbour1 == neighbour2 or node in (neighbour1, neighbour2):
+                # degenerated pair, no angle is formed
+                continue
+            vertexAngle = self.getAngleBetweenSegments(node, neighbour1, neighbour2)
+            if vertexAngle < angle:
+                return vertexAngle
         return None
-    
+
     def getOutOfBoundsAngleList(self, coverageLines, angle):
-        lineLyr = self.getLineEdges(coverageLines)
-        segmentDict = self.getSegmentDict(lineLyr)
+        edgeList = self.getLineEdges(coverageLines)
+        segmentDict = self.getSegmentDict(edgeList)
         errorList = []
-        for point, segmentList in segmentDict.iteritems():
-            if len(segmentList) > 1:
-                vertexAngle = self.getOutOfBountsAngleInSegmentList(segmentList, angle)
+        for node, neighbourList in segmentDict.iteritems():
+            if len(neighbourList) > 1:
+                vertexAngle = self.getOutOfBountsAngleInSegmentList(node, neighbourList, angle)
                 if vertexAngle:
-                    errorList.append((vertexAngle, point))
+                    errorList.append((vertexAngle, QgsPoint(node[0], node[1])))
         return errorList
 
     def buildAndRaiseOutOfBoundsFlag(self, flagLyr, geomTupleList):
@@ -20,7 +20,7 @@
  *                                                                         *
  ***************************************************************************/
 """
-from qgis.core import QgsMessageLog
+from qgis.core import QgsMessageLog, QgsDataSourceURI
 from DsgTools.ValidationTools.ValidationProcesses.validationProcess import ValidationProcess
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
 
@@ -47,6 +47,31 @@ class RemoveSmallAreasProcess(ValidationProcess):
         """
         return self.tr('Identify Small Areas')
 
+    def removeOnServer(self, lyr, cl, keyColumn):
+        """
+        Deletes the flagged features joining the flags table on the server.
+        Returns the number of removed features.
+        """
+        problems = self.abstractDb.removeFlaggedFeatures(cl, 'IdentifySmallAreasProcess', keyColumn)
+        # the layer must not show the removed records
+        lyr.dataProvider().forceReload()
+        lyr.triggerRepaint()
+        return problems
+
+    def removeOnEditBuffer(self, lyr, cl):
+        """
+        Deletes the flagged features through the QGIS edit buffer.
+        Used for layers that have pending edits, whose flagged ids may not match the table anymore.
+        Returns the number of removed features.
+        """
+        if self.flagIdsDict is None:
+            # fetched once, only when some layer has pending edits
+            self.flagIdsDict = self.abstractDb.getFlagsDictByProcess('IdentifySmallAreasProcess')
+        smallIds = [int(flag['id']) for flag in self.flagIdsDict.get(cl, [])]
+        lyr.startEditing()
+        lyr.deleteFeatures(smallIds)
+        return len(smallIds)
+
     def execute(self):
         """
         Reimplementation of the execute method from the parent class
@@ -57,7 +82,9 @@ class RemoveSmallAreasProcess(ValidationProcess):
             self.setStatus(self.tr('Running'), 3) #now I'm running!
 
             # getting parameters after the execution of our pre process
-            self.flagsDict = self.abstractDb.getFlagsDictByProcess('IdentifySmallAreasProcess')
+            # only the flagged classes are fetched, flags are joined on the server
+            self.flagsDict = self.abstractDb.getFlaggedClassesByProcess('IdentifySmallAreasProcess')
+            self.flagIdsDict = None
 
             flagsClasses = self.flagsDict.keys()
             if len(flagsClasses) == 0:
@@ -74,10 +101,11 @@ class RemoveSmallAreasProcess(ValidationProcess):
                 #running the process on cl
                 localProgress = ProgressWidget(0, 1, self.tr('Running process on ') + cl, parent=self.iface.mapCanvas())
                 localProgress.step()
-                problems = len(self.flagsDict[cl])
-                smallIds = [int(flag['id']) for flag in self.flagsDict[cl]]
-                lyr.startEditing()
-                lyr.deleteFeatures(smallIds)
+                keyColumn = QgsDataSourceURI(lyr.dataProvider().dataSourceUri()).keyColumn()
+                if lyr.providerType() == 'postgres' and keyColumn and not lyr.isModified():
+                    problems = self.removeOnServer(lyr, cl, keyColumn)
+                else:
+                    problems = self.removeOnEditBuffer(lyr, cl)
                 localProgress.step()
                 numberOfProblems += problems
                 
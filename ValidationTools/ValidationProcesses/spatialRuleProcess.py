@@ -28,6 +28,7 @@ from qgis.core import QgsMessageLog, QgsDataSourceURI
 
 from DsgTools.ValidationTools.ValidationProcesses.validationProcess import ValidationProcess
 from DsgTools.CustomWidgets.progressWidget import ProgressWidget
+from DsgTools.Factories.DbFactory.dbConnectionPool import BatchDbRunner
 
 class SpatialRuleProcess(ValidationProcess):
     #this relates the predicate with the PostGIS ST functions
@@ -84,6 +85,53 @@ class SpatialRuleProcess(ValidationProcess):
             
         return ret
 
+    def stageRuleClasses(self, rules):
+        """
+        Creates the temp table of each class used by rules.
+        Returns a dict {class name: (temp table, layer, key column, geometry column)}
+        """
+        classList = []
+        for rule in rules:
+            for cl in (rule[0], rule[3]):
+                if cl not in classList:
+                    classList.append(cl)
+        stagedDict = dict()
+        localProgress = ProgressWidget(0, len(classList), self.tr('Preparing execution'), parent=self.iface.mapCanvas())
+        try:
+            for cl in classList:
+                processTableName, lyr, keyColumn = self.prepareExecution(cl)
+                # getting geometry column because we want to be generic
+                stagedDict[cl] = (processTableName, lyr, keyColumn, self.getGeometryColumnFromLayer(lyr))
+                localProgress.step()
+        except:
+            for processTableName, lyr, keyColumn, geomColumn in stagedDict.values():
+                self.abstractDb.dropTempTable(processTableName)
+            raise
+        return stagedDict
+
+    def runRules(self, rules, stagedDict, progress = None):
+        """
+        Tests the rules concurrently, each worker using its own connection.
+        Rules only read the staged temp tables, therefore they are independent.
+        Returns a dict {rule index: invalid geometry record list}
+        """
+        dbName = self.abstractDb.getDatabaseName()
+        def testRule(i):
+            rule = rules[i]
+            class_a, lyrA, aKeyColumn, aGeomColumn = stagedDict[rule[0]]
+            class_b, lyrB, bKeyColumn, bGeomColumn = stagedDict[rule[3]]
+            abstractDb = runner.pool.getDb(dbName)
+            return abstractDb.testSpatialRule(class_a, rule[1], rule[2], class_b, rule[4], rule[5], rule[6], aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn)
+        runner = BatchDbRunner.fromAbstractDb(self.abstractDb)
+        runner.pool.resolveCredentials(dbName)
+        try:
+            resultDict, exceptionDict = runner.runJobs(range(len(rules)), testRule, progress = progress)
+        finally:
+            runner.shutdown()
+        if exceptionDict:
+            raise Exception(self.tr('Problem testing spatial rule: ') + '\n'.join(exceptionDict.values()))
+        return resultDict
+
     def execute(self):
         """
         Reimplementation of the execute method from the parent class
@@ -95,36 +143,28 @@ class SpatialRuleProcess(ValidationProcess):
             self.abstractDb.deleteProcessFlags(self.getName())
             
             rules = self.getRules()
-            for rule in rules:
-                # preparation
-                localProgress = ProgressWidget(0, 1, self.tr('Preparing execution for ') + rule[0], parent=self.iface.mapCanvas())
-                localProgress.step()
-                class_a, lyrA, aKeyColumn = self.prepareExecution(rule[0])
-                class_b, lyrB, bKeyColumn = self.prepareExecution(rule[3])
-                # getting keyColumn because we want to be generic
-                aGeomColumn = self.getGeometryColumnFromLayer(lyrA)
-                bGeomColumn = self.getGeometryColumnFromLayer(lyrB)
-                localProgress.step()
+            # staging each class only once, temp tables are shared by all rules
+            stagedDict = self.stageRuleClasses(rules)
+            try:
+                localProgress = ProgressWidget(0, len(rules), self.tr('Running spatial rules'), parent=self.iface.mapCanvas())
+                resultDict = self.runRules(rules, stagedDict, localProgress)
+            finally:
+                # dropping temp tables
+                for class_a, lyrA, aKeyColumn, aGeomColumn in stagedDict.values():
+                    self.abstractDb.dropTempTable(class_a)
 
-                #running the process in the temp table
-                localProgress = ProgressWidget(0, 1, self.tr('Running process on ') + class_a, parent=self.iface.mapCanvas())
-                localProgress.step()
-                invalidGeomRecordList = self.abstractDb.testSpatialRule(class_a, rule[1], rule[2], class_b, rule[4], rule[5], rule[6], aKeyColumn, bKeyColumn, aGeomColumn, bGeomColumn)
-                localProgress.step()
-                                
-                # dropping temp table
-                self.abstractDb.dropTempTable(class_a)
-                self.abstractDb.dropTempTable(class_b)
-
-                if len(invalidGeomRecordList) > 0:
-                    numberOfInvGeom = self.addFlag(invalidGeomRecordList)
-                    for tuple in invalidGeomRecordList:
-                        self.addClassesToBeDisplayedList(tuple[0])
-                    msg = str(numberOfInvGeom) + self.tr(' features are invalid. Check flags.')
-                    self.setStatus(msg, 4) #Finished with flags
-                else:
-                    msg = self.tr('All features are valid.')
-                    self.setStatus(msg, 1) #Finished
+            invalidGeomRecordList = []
+            for i in range(len(rules)):
+                invalidGeomRecordList += resultDict[i]
+            if len(invalidGeomRecordList) > 0:
+                numberOfInvGeom = self.addFlag(invalidGeomRecordList)
+                for tuple in invalidGeomRecordList:
+                    self.addClassesToBeDisplayedList(tuple[0])
+                msg = str(numberOfInvGeom) + self.tr(' features are invalid. Check flags.')
+                self.setStatus(msg, 4) #Finished with flags
+            else:
+                msg = self.tr('All features are valid.')
+                self.setStatus(msg, 1) #Finished
             return 1             
         except Exception as e:
             QgsMessageLog.logMessage(':'.join(e.args), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
@@ -20,10 +20,9 @@
  *                                                                         *
  ***************************************************************************/
 """
-import qgis.utils
-from qgis.core import QgsMessageLog, QgsVectorLayer, QgsMapLayerRegistry, QgsGeometry, QgsVectorDataProvider, QgsFeatureRequest, QgsExpression, QgsFeature
+from qgis.core import QgsMessageLog
 from DsgTools.ValidationTools.ValidationProcesses.validationProcess import ValidationProcess
-import processing, binascii
+from DsgTools.CustomWidgets.progressWidget import ProgressWidget
 
 class TopologicalDouglasSimplificationProcess(ValidationProcess):
     def __init__(self, postgisDb, iface, instantiating=False):
@@ -41,42 +40,8 @@ class TopologicalDouglasSimplificationProcess(ValidationProcess):
             for key in self.classesWithElemDict:
                 cat, lyrName, geom, geomType, tableType = key.split(',')
                 interfaceDictList.append({self.tr('Category'):cat, self.tr('Layer Name'):lyrName, self.tr('Geometry\nColumn'):geom, self.tr('Geometry\nType'):geomType, self.tr('Layer\nType'):tableType})
-            self.parameters = {'Tolerance':1.0, 'Snap':1.0, 'MinArea':0.001, 'Classes': interfaceDictList, 'Only Selected':False}
+            self.parameters = {'Tolerance':1.0, 'Snap':1.0, 'Classes': interfaceDictList, 'Only Selected':False}
         
-    def runProcessinAlg(self, layer):
-        """
-        Runs the actual grass process
-        """
-        qgis_version = qgis.utils.QGis.QGIS_VERSION_INT
-        if qgis_version < 21800:
-            alg = 'grass7:v.generalize'
-        else:
-            alg = 'grass7:v.generalize.simplify'
-
-        #setting tools
-        tools = 'break,rmsa,rmdangle'
-        threshold = -1
-
-        #getting table extent (bounding box)
-        extent = layer.extent()
-        (xmin, xmax, ymin, ymax) = extent.xMinimum(), extent.xMaximum(), extent.yMinimum(), extent.yMaximum()
-        extent = '{0},{1},{2},{3}'.format(xmin, xmax, ymin, ymax)
-        
-        tol = self.parameters['Tolerance']
-        snap = self.parameters['Snap']
-        minArea = self.parameters['MinArea']
-        
-        if qgis_version < 21800:
-            ret = processing.runalg(alg, layer, 0, tol, 7, 50, 0.5, 3, 0, 0, 0, 1, 1, 1,False, True, extent, snap, minArea, 0, None)
-        else:
-            ret = processing.runalg(alg, layer, 0, tol, 7, 50, False, True, extent, snap, minArea, 0, None)
-        if not ret:
-            raise Exception(self.tr('Problem executing grass7:v.generalize.simplify. Check your installed libs.\n'))
-        
-        #updating original layer
-        outputLayer = processing.getObject(ret['output'])
-        return outputLayer
-
     def execute(self):
         """
         Reimplementation of the execute method from the parent class
@@ -90,23 +55,29 @@ class TopologicalDouglasSimplificationProcess(ValidationProcess):
             if len(classesWithElem) == 0:
                 self.setStatus(self.tr('No classes selected!. Nothing to be done.'), 1) #Finished
                 return 1
-            error = False
-            classlist = []
-            for key in classesWithElem:
-                self.startTimeCount()
-                # preparation
-                classAndGeom = self.classesWithElemDict[key]
-                lyr = self.loadLayerBeforeValidationProcess(classAndGeom)
-                classlist.append(lyr)
-
-            coverage = self.createUnifiedLayer(classlist)
-            output = self.runProcessinAlg(coverage)
-            self.splitUnifiedLayer(output, classlist)
+            # staging every class, the edge network is shared by all of them
+            stagedList = []
             try:
-                QgsMapLayerRegistry.instance().removeMapLayer(coverage.id())
+                localProgress = ProgressWidget(0, len(classesWithElem), self.tr('Preparing execution'), parent=self.iface.mapCanvas())
+                for key in classesWithElem:
+                    classAndGeom = self.classesWithElemDict[key]
+                    processTableName, lyr, keyColumn = self.prepareExecution(classAndGeom)
+                    isPolygon = 'POLYGON' in classAndGeom['geomType'].upper()
+                    stagedList.append((processTableName, lyr, classAndGeom['geom'], keyColumn, isPolygon))
+                    localProgress.step()
+                localProgress = ProgressWidget(0, 1, self.tr('Running simplification'), parent=self.iface.mapCanvas())
+                localProgress.step()
+                tableList = [(processTableName, geomColumn, keyColumn, isPolygon) for processTableName, lyr, geomColumn, keyColumn, isPolygon in stagedList]
+                self.abstractDb.topologicalSimplification(tableList, self.parameters['Tolerance'], self.parameters['Snap'])
+                localProgress.step()
             except:
-                QgsMessageLog.logMessage(self.tr('Error while trying to remove coverage layer.'), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
-            QgsMessageLog.logMessage(self.tr('Simplification done on the following layers: ') + ','.join([i.name() for i in classlist]) +'.', "DSG Tools Plugin", QgsMessageLog.CRITICAL)
+                for processTableName, lyr, geomColumn, keyColumn, isPolygon in stagedList:
+                    self.abstractDb.dropTempTable(processTableName)
+                raise
+            # updating the layers
+            for processTableName, lyr, geomColumn, keyColumn, isPolygon in stagedList:
+                self.postProcessSteps(processTableName, lyr)
+            QgsMessageLog.logMessage(self.tr('Simplification done on the following layers: ') + ','.join([staged[1].name() for staged in stagedList]) +'.', "DSG Tools Plugin", QgsMessageLog.CRITICAL)
 
             self.setStatus(self.tr('Simplification process complete.'), 1) #Finished
             self.logLayerTime('unified layer')
@@ -22,6 +22,7 @@
 """
 import binascii
 from datetime import datetime
+from uuid import uuid4
 import json, processing
 # Qt imports
 from PyQt4.QtGui import QMessageBox
@@ -42,6 +43,7 @@ class ValidationProcess(QObject):
         """
         super(ValidationProcess, self).__init__()
         self.abstractDb = postgisDb
+        self.runId = None
         if self.getStatus() == None:
             self.setStatus(self.tr('Instantianting process'), 0)
         self.classesToBeDisplayedAfterProcess = []
@@ -189,13 +191,18 @@ class ValidationProcess(QObject):
         msg: Status text message
         """
         try:
+            # every record of a run carries the username, so that the history is filtered before it is merged
+            username = self.dbUserName or self.abstractDb.db.userName()
             if status not in [0,3]: # neither running nor instatiating status should be logged
                 self.logProcess()
                 if self.logMsg:
                     msg += "\n" + self.logMsg
                 elif not self.dbUserName:
-                    msg += self.tr("Database username: {}\n").format(self.abstractDb.db.userName())
-            self.abstractDb.setValidationProcessStatus(self.getName(), msg, status)
+                    msg += self.tr("Database username: {}\n").format(username)
+            if status == 3 or not self.runId:
+                # a new run starts each time the process is set to running
+                self.runId = str(uuid4())
+            self.abstractDb.setValidationProcessStatus(self.getName(), msg, status, username = username, runId = self.runId)
         except Exception as e:
             QMessageBox.critical(None, self.tr('Critical!'), self.tr('A problem occurred! Check log for details.'))
             QgsMessageLog.logMessage(':'.join(e.args), "DSG Tools Plugin", QgsMessageLog.CRITICAL)
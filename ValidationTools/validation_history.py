@@ -24,12 +24,77 @@ import os
 
 from PyQt4 import QtGui, uic
 from PyQt4.QtCore import *
-from PyQt4.QtSql import QSqlTableModel, QSqlDatabase, QSqlQuery
 from qgis.core import QgsMessageLog
 
 FORM_CLASS, _ = uic.loadUiType(os.path.join(
     os.path.dirname(__file__), 'validation_history.ui'))
 
+class ValidationHistoryModel(QAbstractTableModel):
+    """
+    Read only model of the consolidated validation history (one row per process run).
+    Rows are fetched from the database in pages as the view scrolls.
+    """
+    def __init__(self, postgisDb, pageSize = 200, parent = None):
+        super(ValidationHistoryModel, self).__init__(parent)
+        self.postgisDb = postgisDb
+        self.pageSize = pageSize
+        self.headerList = [self.tr('Process Name'), self.tr('Log'), self.tr('Status'), self.tr('Finished'), self.tr('Username')]
+        self.rowList = []
+        self.username = None
+        self.withoutUsername = False
+        self.hasMoreRows = True
+
+    def setUserFilter(self, username = None, withoutUsername = False):
+        """
+        Filters the history by username (no filter if username is None and withoutUsername is False).
+        Pages already fetched are discarded.
+        """
+        self.beginResetModel()
+        self.username = username
+        self.withoutUsername = withoutUsername
+        self.rowList = []
+        self.hasMoreRows = True
+        self.endResetModel()
+
+    def rowCount(self, parent = QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rowList)
+
+    def columnCount(self, parent = QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headerList)
+
+    def data(self, index, role = Qt.DisplayRole):
+        if not index.isValid() or role not in [Qt.DisplayRole, Qt.ToolTipRole]:
+            return None
+        value = self.rowList[index.row()][index.column()]
+        if isinstance(value, QDateTime):
+            return value.toString(Qt.ISODate).replace('T', ' ')
+        return value
+
+    def headerData(self, section, orientation, role = Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headerList[section]
+        return super(ValidationHistoryModel, self).headerData(section, orientation, role)
+
+    def canFetchMore(self, parent = QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.hasMoreRows
+
+    def fetchMore(self, parent = QModelIndex()):
+        if parent.isValid():
+            return
+        page = self.postgisDb.getValidationHistoryPage(username = self.username, withoutUsername = self.withoutUsername, limit = self.pageSize, offset = len(self.rowList))
+        self.hasMoreRows = len(page) == self.pageSize
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rowList), len(self.rowList) + len(page) - 1)
+        self.rowList += page
+        self.endInsertRows()
+
 class ValidationHistory(QtGui.QDialog, FORM_CLASS):
     def __init__(self, postgisDb, parent=None):
         """
@@ -43,14 +108,13 @@ class ValidationHistory(QtGui.QDialog, FORM_CLASS):
         # #widgets-and-dialogs-with-auto-connect
         self.setupUi(self)
         self.postgisDb = postgisDb
-        self.dbEncoding = 'utf-8'
         self.dictNoUser = {
                             'No User' : self.tr("Select a username..."), # no user name is selected
                             'Error' : self.tr("Processes with no user set"), # "username" for processes unable to retrieve db user
-                            'User Name Error' : self.tr("Unable to get database username.") # log message raised on username retrieving error
                           } # text used as indicator of userName box contents
         try:
-            self.projectModel = QSqlTableModel(None,self.postgisDb.db)
+            self.projectModel = ValidationHistoryModel(self.postgisDb, parent = self)
+            self.tableView.setModel(self.projectModel)
             self.refreshViewTable(createTable=True)
         except Exception as e:
             QtGui.QMessageBox.critical(self, self.tr('Critical!'), self.tr('A problem occurred! Check log for details. (Did you select a database?)'))
@@ -72,33 +136,30 @@ class ValidationHistory(QtGui.QDialog, FORM_CLASS):
             """
             F5 updates the table
             """
-            username = self.userFilterComboBox.currentText()
-            if username == self.dictNoUser['No User']:
-                username=None
             self.refreshViewTable(createTable=True)
-            self.consolidateLogs()
         elif e.key() == Qt.Key_Escape:
             """
             Esc closes the window.
             """
             self.hide()
 
-    def refreshViewTable(self, idListString=None, createTable=False):
+    def refreshViewTable(self, createTable=False):
         """
-        Refreshes the view table.
-        :param idListString: ID list string for filtering table.
-        :param createTable: boolean that indicates whether table is being created (True) or updated (False).
+        Refreshes the view table. History consolidation and user filtering are done by the database,
+        rows are fetched page by page by the model.
+        :param createTable: boolean that indicates whether the username list should be reloaded as well.
         """
         if createTable:
-            # recreate the consolidated table
-            self.consolidateLogs()
-            # if table is "fully refreshed", then it is as of re-creating the view
-            # instead of updating it.
-            self.fillUsernameComboBox(keepSelection=(not createTable))
-        self.postgisDb.createValidationHistoryViewTable(idListString=idListString) # refreshes the view
-        self.projectModel.setTable('validation.process_history_view')
-        self.projectModel.select()
-        self.tableView.setModel(self.projectModel)        
+            self.fillUsernameComboBox(keepSelection=False)
+        username = self.userFilterComboBox.currentText()
+        if username == self.dictNoUser['Error']:
+            self.projectModel.setUserFilter(withoutUsername=True)
+        elif username and username != self.dictNoUser['No User']:
+            self.projectModel.setUserFilter(username=username)
+        else:
+            self.projectModel.setUserFilter()
+        if self.projectModel.canFetchMore():
+            self.projectModel.fetchMore()
         header = self.tableView.horizontalHeader()
         header.setResizeMode(0, QtGui.QHeaderView.ResizeToContents)
         header.setResizeMode(1, QtGui.QHeaderView.ResizeToContents)
@@ -107,54 +168,12 @@ class ValidationHistory(QtGui.QDialog, FORM_CLASS):
 
     def getUsernameList(self):
         """
-        Get the usernames from the log and returns it as a list.
+        Get the usernames from the history and returns it as a list.
         "Select a username..." is always the first element of this list.
         """
-        log = self.postgisDb.getValidationLog()
-        log = list(set(log)) # to get only unique logs, in order to fasten the for loop
-        users = []
-        # there may be a better way, as the current code iterates over each line for every log
-        # present in the database. 
-        for l in log:
-            for line in l.split("\n"):
-                if self.tr("Database username:") in line.decode(self.dbEncoding):
-                    # treating the log string as a list of strings (lines) 
-                    users.append(line.split(": ")[1])                    
         # in order to "Select a username..." always be first and the list to only have unique names
         # and for the last item to be processes with username retrieving error 
-        return [self.dictNoUser['No User']] + sorted(list(set(users))) + [self.dictNoUser['Error']]
-
-    def getUserProcessbyId(self, username=None):
-        """
-        Returns a string containing a list of process ID by username (format: (int)(id_1, id_2, ...)).
-        :param username: user whose processes are supposed to be shown.
-        """
-        ids = "("
-        logs, idL = self.postgisDb.getValidationLog(idList=True)
-        if username == self.dictNoUser['No User']:
-            # case no user is specified, no filter should be applied
-            return
-        elif username == self.dictNoUser['Error']:
-            # if username wasn't retrieved, the string pattern in log is different
-            for idx, log in enumerate(logs):
-                for line in log.split("\n"):
-                    # treating the log string as a list of strings (lines) 
-                    if self.tr("{0}").format(self.dictNoUser['User Name Error']).decode(self.dbEncoding) in line.decode(self.dbEncoding):
-                        # buiding up the string
-                        ids += "{0}, ".format(idL[idx])
-        else:
-            for idx, log in enumerate(logs):
-                for line in log.split("\n"):
-                    # treating the log string as a list of strings (lines) 
-                    if self.tr("Database username: {0}").format(username).decode(self.dbEncoding) in line.decode(self.dbEncoding):
-                        # buiding up the string
-                        ids += "{0}, ".format(idL[idx])                
-        # fixing the string's ending
-        ids = (ids + ")").replace(", )", ")")
-        if ids == "()":
-            # in case there's no id to be filtered
-            return "(-9999)"
-        return ids
+        return [self.dictNoUser['No User']] + self.postgisDb.getValidationHistoryUsernames() + [self.dictNoUser['Error']]
     
     def fillUsernameComboBox(self, keepSelection=False):
         """
@@ -170,35 +189,12 @@ class ValidationHistory(QtGui.QDialog, FORM_CLASS):
             self.userFilterComboBox.setCurrentIndex(idx)
         else:
             userList = self.getUsernameList()
+            # in order to indexChanged signal not trigger the table refresh while repopulating
+            self.userFilterComboBox.blockSignals(True)
             self.userFilterComboBox.clear()
             self.userFilterComboBox.addItems(userList)
             self.userFilterComboBox.setCurrentIndex(0)
-        # in order to indexChanged signal not trigger the repopulating method 
-    
-    def consolidateLogs(self):
-        """
-        This method consolidates the log messages of each stage of process into one
-        big log message. It keeps the first ID and timestamp of process instance and
-        the status of the last instance is conserved. Table validation.compact_process_history
-        is created and populated.
-        """
-        fullHistory = self.postgisDb.getValidationHistory()
-        for idx, log in enumerate(fullHistory):
-            try:
-                sameProcessName = fullHistory[idx-1][1] == fullHistory[idx][1]
-            except:
-                sameProcessName = False
-            if idx == 0:
-                # starting loop initiates the compact log list
-                compactHistory = [log]
-            elif sameProcessName and fullHistory[idx][3] != 3:
-                # if it is a continuation of the same process, logs are concatenated
-                compactHistory[len(compactHistory) - 1][2] += r"\n" + fullHistory[idx][2]
-                compactHistory[len(compactHistory) - 1][3] = fullHistory[idx][3]
-            else:
-                # if status is "Running", it is a new instance of the same process previously
-                compactHistory.append(fullHistory[idx])
-        self.postgisDb.createCompactValidationHistory(compactHistory)
+            self.userFilterComboBox.blockSignals(False)
 
     @pyqtSlot(int)
     def on_userFilterComboBox_currentIndexChanged(self):
@@ -209,10 +205,4 @@ class ValidationHistory(QtGui.QDialog, FORM_CLASS):
         if username == '':
             # if the index was set on first execution, no action is required.
             return
-        username = self.userFilterComboBox.currentText()
-        # if no user is specified, list should not be filtered
-        if username != self.dictNoUser['No User']:
-            idListString = self.getUserProcessbyId(username=username)
-        else:
-            idListString = None
-        self.refreshViewTable(idListString=idListString, createTable=False)
+        self.refreshViewTable(createTable=False)
@@ -25,44 +25,49 @@ from PyQt4.QtGui import QIcon, QToolButton, QMenu, QAction
 
 import os.path
 import sys
+import time
+import importlib
 
 # Initialize Qt resources from file resources_rc.py
 import resources_rc
 
 currentPath = os.path.dirname(__file__)
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
-from DsgTools.LayerTools.LoadLayersFromServer.loadLayersFromServer import LoadLayersFromServer
-from DsgTools.LayerTools.loadAuxStruct import LoadAuxStruct
-from DsgTools.LayerTools.CreateFrameTool.ui_create_inom_dialog import CreateInomDialog
-from DsgTools.DbTools.SpatialiteTool.cria_spatialite_dialog import CriaSpatialiteDialog
-from DsgTools.DbTools.PostGISTool.postgisDBTool import PostgisDBTool
-from DsgTools.ComplexTools.complexWindow import ComplexWindow
-from DsgTools.ServerTools.viewServers import ViewServers
-from DsgTools.ServerTools.exploreDb import ExploreDb
-from DsgTools.ServerTools.batchDbManager import BatchDbManager
-from DsgTools.ImageTools.processingTools import ProcessingTools
-from DsgTools.ProcessingTools.processManager import ProcessManager
-from DsgTools.BDGExTools.BDGExTools import BDGExTools
-from DsgTools.InventoryTools.inventoryTools import InventoryTools
-from DsgTools.ToolboxTools.models_and_scripts_installer import ModelsAndScriptsInstaller
-from DsgTools.ConversionTools.convert_database import ConvertDatabase
-from DsgTools.aboutdialog import AboutDialog
-from DsgTools.options import Options
-from DsgTools.ProductionTools.ContourTool.calc_contour import CalcContour
-from DsgTools.ProductionTools.FieldToolBox.field_toolbox import FieldToolbox
-from DsgTools.AttributeTools.code_list import CodeList
-from DsgTools.AttributeTools.attributes_viewer import AttributesViewer
-from DsgTools.ValidationTools.validation_toolbox import ValidationToolbox
-from DsgTools.ProductionTools.MinimumAreaTool.minimumAreaTool import MinimumAreaTool
-from DsgTools.ProductionTools.InspectFeatures.inspectFeatures import InspectFeatures
-from DsgTools.ProductionTools.StyleManagerTool.styleManagerTool import StyleManagerTool
-from DsgTools.ProductionTools.DsgRasterInfoTool.dsgRasterInfoTool import DsgRasterInfoTool
-from DsgTools.DbTools.BatchDbCreator.batchDbCreator import BatchDbCreator
-from DsgTools.ProductionTools.CopyPasteTool.copyPasteTool import CopyPasteTool
-from DsgTools.ProductionTools.Acquisition.acquisition import Acquisition
-from DsgTools.ProductionTools.FreeHandTool.freeHandMain import FreeHandMain
-from DsgTools.ProductionTools.FlipLineTool.flipLineTool import FlipLine
-
+#tool classes are only imported when first used (see DsgTools.getToolClass)
+toolModuleDict = {
+    'LoadLayersFromServer' : 'DsgTools.LayerTools.LoadLayersFromServer.loadLayersFromServer',
+    'LoadAuxStruct' : 'DsgTools.LayerTools.loadAuxStruct',
+    'CreateInomDialog' : 'DsgTools.LayerTools.CreateFrameTool.ui_create_inom_dialog',
+    'CriaSpatialiteDialog' : 'DsgTools.DbTools.SpatialiteTool.cria_spatialite_dialog',
+    'PostgisDBTool' : 'DsgTools.DbTools.PostGISTool.postgisDBTool',
+    'ComplexWindow' : 'DsgTools.ComplexTools.complexWindow',
+    'ViewServers' : 'DsgTools.ServerTools.viewServers',
+    'ExploreDb' : 'DsgTools.ServerTools.exploreDb',
+    'BatchDbManager' : 'DsgTools.ServerTools.batchDbManager',
+    'ProcessingTools' : 'DsgTools.ImageTools.processingTools',
+    'ProcessManager' : 'DsgTools.ProcessingTools.processManager',
+    'BDGExTools' : 'DsgTools.BDGExTools.BDGExTools',
+    'InventoryTools' : 'DsgTools.InventoryTools.inventoryTools',
+    'ModelsAndScriptsInstaller' : 'DsgTools.ToolboxTools.models_and_scripts_installer',
+    'ConvertDatabase' : 'DsgTools.ConversionTools.convert_database',
+    'AboutDialog' : 'DsgTools.aboutdialog',
+    'Options' : 'DsgTools.options',
+    'CalcContour' : 'DsgTools.ProductionTools.ContourTool.calc_contour',
+    'FieldToolbox' : 'DsgTools.ProductionTools.FieldToolBox.field_toolbox',
+    'CodeList' : 'DsgTools.AttributeTools.code_list',
+    'ValidationToolbox' : 'DsgTools.ValidationTools.validation_toolbox',
+    'MinimumAreaTool' : 'DsgTools.ProductionTools.MinimumAreaTool.minimumAreaTool',
+    'InspectFeatures' : 'DsgTools.ProductionTools.InspectFeatures.inspectFeatures',
+    'StyleManagerTool' : 'DsgTools.ProductionTools.StyleManagerTool.styleManagerTool',
+    'DsgRasterInfoTool' : 'DsgTools.ProductionTools.DsgRasterInfoTool.dsgRasterInfoTool',
+    'BatchDbCreator' : 'DsgTools.DbTools.BatchDbCreator.batchDbCreator',
+    'CopyPasteTool' : 'DsgTools.ProductionTools.CopyPasteTool.copyPasteTool',
+    'Acquisition' : 'DsgTools.ProductionTools.Acquisition.acquisition',
+    'FreeHandMain' : 'DsgTools.ProductionTools.FreeHandTool.freeHandMain',
+    'FlipLine' : 'DsgTools.ProductionTools.FlipLineTool.flipLineTool'
+}
+
+from qgis.core import QgsMessageLog
 from qgis.utils import showPluginHelp
 try:
     import ptvsd
@@ -102,6 +107,8 @@ class DsgTools:
 
         # Declare instance attributes
         self.actions = []
+        self.toolClassDict = dict()
+        self.toolImportTimeDict = dict()
         self.menu = self.tr('&DSG Tools')
         # TODO: We are going to let the user set this up in a future iteration
         self.toolbar = self.iface.addToolBar(u'DsgTools')
@@ -112,7 +119,7 @@ class DsgTools:
 
         #QDockWidgets
         self.complexWindow = None
-        self.codeList = CodeList(iface)
+        self.codeList = None
         #self.attributesViewer = AttributesViewer(iface)
         self.validationToolbox = None
         self.contourDock = None
@@ -120,15 +127,44 @@ class DsgTools:
         self.militaryDock = None
         self.rasterInfoDock = None
 
-        self.processManager = ProcessManager(iface)
+        #created on first use
+        self.processManager = None
+        self.BDGExTools = None
 
-        self.BDGExTools = BDGExTools()
-        
-        self.styleManagerTool = StyleManagerTool(iface)
-        self.copyPasteTool = CopyPasteTool(iface)
-        self.acquisition = Acquisition(iface)
-        self.freeHandAcquisiton = FreeHandMain(iface)
-        self.flipLineTool = FlipLine(iface.mapCanvas(), iface)
+        self.styleManagerTool = self.getToolClass('StyleManagerTool')(iface)
+        self.copyPasteTool = self.getToolClass('CopyPasteTool')(iface)
+        self.acquisition = self.getToolClass('Acquisition')(iface)
+        self.freeHandAcquisiton = self.getToolClass('FreeHandMain')(iface)
+        self.flipLineTool = self.getToolClass('FlipLine')(iface.mapCanvas(), iface)
+
+    def getToolClass(self, className):
+        """
+        Gets a tool class, importing its module on the first call.
+        Import times are logged so that start-up regressions are visible.
+        """
+        if className not in self.toolClassDict:
+            start = time.time()
+            module = importlib.import_module(toolModuleDict[className])
+            self.toolClassDict[className] = getattr(module, className)
+            self.toolImportTimeDict[className] = time.time() - start
+            QgsMessageLog.logMessage(self.tr('{0} imported in {1:.3f} s').format(className, self.toolImportTimeDict[className]), 'DSG Tools Plugin', QgsMessageLog.INFO)
+        return self.toolClassDict[className]
+
+    def getProcessManager(self):
+        """
+        Gets the process manager, creating it on the first call
+        """
+        if not self.processManager:
+            self.processManager = self.getToolClass('ProcessManager')(self.iface)
+        return self.processManager
+
+    def getBDGExTools(self):
+        """
+        Gets the BDGEx tools, creating them on the first call
+        """
+        if not self.BDGExTools:
+            self.BDGExTools = self.getToolClass('BDGExTools')()
+        return self.BDGExTools
 
     # noinspection PyMethodMayBeStatic
     def tr(self, message):
@@ -461,7 +497,7 @@ class DsgTools:
             add_to_menu=False,
             add_to_toolbar=False)
         self.dsgTools.addAction(action)
-        Options().firstTimeConfig()
+        self.getToolClass('Options')().firstTimeConfig()
 
         icon_path = ':/plugins/DsgTools/icons/dsg.png'
         action = self.add_action(
@@ -712,15 +748,17 @@ class DsgTools:
         self.toolbar.addAction(action)
         #enable shortcut config
         self.iface.registerMainWindowAction(action, '')
-        self.inspectFeatures = InspectFeatures(self.iface, parent = productiontools)
-        self.minimumAreaTool = MinimumAreaTool(self.iface, parent = productiontools)
-        self.dsgRasterInfoTool = DsgRasterInfoTool(self.iface, parent = productiontools)
+        self.inspectFeatures = self.getToolClass('InspectFeatures')(self.iface, parent = productiontools)
+        self.minimumAreaTool = self.getToolClass('MinimumAreaTool')(self.iface, parent = productiontools)
+        self.dsgRasterInfoTool = self.getToolClass('DsgRasterInfoTool')(self.iface, parent = productiontools)
         self.toolbar.addWidget(self.minimumAreaTool)
         self.toolbar.addWidget(self.inspectFeatures)
         # self.inspectFeatures.enableShortcuts()
         # self.iface.registerMainWindowAction(self.inspectFeatures.action, '')
         self.toolbar.addWidget(self.styleManagerTool)
         self.toolbar.addWidget(self.dsgRasterInfoTool)
+        #tools above are needed by the toolbar, the others are imported on first use
+        QgsMessageLog.logMessage(self.tr('Start-up tools imported in {0:.3f} s').format(sum(self.toolImportTimeDict.values())), 'DSG Tools Plugin', QgsMessageLog.INFO)
 
     def unload(self):
         """
@@ -755,14 +793,14 @@ class DsgTools:
         """
         Shows the about dialog
         """
-        dlg = AboutDialog()
+        dlg = self.getToolClass('AboutDialog')()
         dlg.exec_()
 
     def showOptions(self):
         """
         Shows the options
         """
-        dlg = Options()
+        dlg = self.getToolClass('Options')()
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -784,7 +822,7 @@ class DsgTools:
         """
         Show sthe convert database dialog
         """
-        dlg = ConvertDatabase()
+        dlg = self.getToolClass('ConvertDatabase')()
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -794,23 +832,23 @@ class DsgTools:
         """
         Shows the processing tools dialog
         """
-        dlg = ProcessingTools(self.iface)
+        dlg = self.getToolClass('ProcessingTools')(self.iface)
         result = dlg.exec_()
         if result == 1:
             (filesList, rasterType, minOutValue, maxOutValue, outDir, percent, epsg) = dlg.getParameters()
             #creating the separate process
-            self.processManager.createDpiProcess(filesList, rasterType, minOutValue, maxOutValue, outDir, percent, epsg)
+            self.getProcessManager().createDpiProcess(filesList, rasterType, minOutValue, maxOutValue, outDir, percent, epsg)
 
     def showInventoryTool(self):
         """
         Shows the inventory tools dialog
         """
-        dlg = InventoryTools(self.iface)
+        dlg = self.getToolClass('InventoryTools')(self.iface)
         result = dlg.exec_()
         if result == 1:
             (parentFolder, outputFile, makeCopy, destinationFolder, formatsList, isWhitelist, isOnlyGeo) = dlg.getParameters()
             #creating the separate process
-            self.processManager.createInventoryProcess(parentFolder, outputFile, makeCopy, destinationFolder, formatsList, isWhitelist, isOnlyGeo)
+            self.getProcessManager().createInventoryProcess(parentFolder, outputFile, makeCopy, destinationFolder, formatsList, isWhitelist, isOnlyGeo)
             
     def useGenericSelector(self):
         """
@@ -819,7 +857,7 @@ class DsgTools:
         if self.contourDock:
             self.iface.removeDockWidget(self.contourDock)
         else:
-            self.contourDock = CalcContour(self.iface)
+            self.contourDock = self.getToolClass('CalcContour')(self.iface)
         self.contourDock.activateTool()
         self.iface.addDockWidget(Qt.BottomDockWidgetArea, self.contourDock)
     
@@ -830,7 +868,7 @@ class DsgTools:
         if self.contourDock:
             self.iface.removeDockWidget(self.contourDock)
         else:
-            self.contourDock = CalcContour(self.iface)
+            self.contourDock = self.getToolClass('CalcContour')(self.iface)
         self.contourDock.activateTool()
         self.iface.addDockWidget(Qt.BottomDockWidgetArea, self.contourDock)
     
@@ -840,6 +878,8 @@ class DsgTools:
         """
         if self.codeList:
             self.iface.removeDockWidget(self.codeList)
+        else:
+            self.codeList = self.getToolClass('CodeList')(self.iface)
         self.iface.addDockWidget(Qt.RightDockWidgetArea, self.codeList)
 
     def showFieldToolbox(self):
@@ -849,7 +889,7 @@ class DsgTools:
         if self.fieldDock:
             self.iface.removeDockWidget(self.fieldToolbox)
         else:
-            self.fieldToolbox = FieldToolbox(self.iface)
+            self.fieldToolbox = self.getToolClass('FieldToolbox')(self.iface)
         self.iface.addDockWidget(Qt.RightDockWidgetArea, self.fieldToolbox)
     
     def showValidationToolbox(self):
@@ -859,7 +899,7 @@ class DsgTools:
         if self.validationToolbox:
             self.iface.removeDockWidget(self.validationToolbox)
         else:
-            self.validationToolbox = ValidationToolbox(self.iface)
+            self.validationToolbox = self.getToolClass('ValidationToolbox')(self.iface)
         self.iface.addDockWidget(Qt.RightDockWidgetArea, self.validationToolbox)
     
     def showRasterInfoDock(self):
@@ -869,7 +909,7 @@ class DsgTools:
         if self.rasterInfoDock:
             self.iface.removeDockWidget(self.rasterInfoDock)
         else:
-            self.rasterInfoDock = DsgRasterInfoTool(self.iface)
+            self.rasterInfoDock = self.getToolClass('DsgRasterInfoTool')(self.iface)
         self.iface.addDockWidget(Qt.LeftDockWidgetArea, self.rasterInfoDock)
 
     def showComplexDock(self):
@@ -879,14 +919,14 @@ class DsgTools:
         if self.complexWindow:
             self.iface.removeDockWidget(self.complexWindow)
         else:
-            self.complexWindow = ComplexWindow(self.iface)
+            self.complexWindow = self.getToolClass('ComplexWindow')(self.iface)
         self.iface.addDockWidget(Qt.LeftDockWidgetArea, self.complexWindow)
             
     def installModelsAndScripts(self):
         """
         Shows the model and scripts installer dialog
         """
-        dlg = ModelsAndScriptsInstaller()
+        dlg = self.getToolClass('ModelsAndScriptsInstaller')()
         result = dlg.exec_()
         if result == 1:
             pass
@@ -899,7 +939,7 @@ class DsgTools:
             self.databaseButton.setDefaultAction(self.toolbar.sender())
         except:
             pass
-        dlg = CriaSpatialiteDialog()
+        dlg = self.getToolClass('CriaSpatialiteDialog')()
         result = dlg.exec_()
         if result:
             pass
@@ -912,7 +952,7 @@ class DsgTools:
             self.databaseButton.setDefaultAction(self.toolbar.sender())
         except:
             pass
-        dlg = BatchDbCreator()
+        dlg = self.getToolClass('BatchDbCreator')()
         result = dlg.exec_()
         if result:
             pass
@@ -925,12 +965,12 @@ class DsgTools:
             self.databaseButton.setDefaultAction(self.toolbar.sender())
         except:
             pass
-        dlg = PostgisDBTool(self.iface)
+        dlg = self.getToolClass('PostgisDBTool')(self.iface)
         result = dlg.exec_()
         if result == 1:
             (dbName, abstractDb , version, epsg) = dlg.getParameters()
             #creating the separate process
-            self.processManager.createPostgisDatabaseProcess(dbName,abstractDb, version, epsg)
+            self.getProcessManager().createPostgisDatabaseProcess(dbName,abstractDb, version, epsg)
 
 
     def loadAuxStruct(self):
@@ -941,7 +981,7 @@ class DsgTools:
             self.layerButton.setDefaultAction(self.toolbar.sender())
         except:
             pass
-        dlg = LoadAuxStruct(self.iface)
+        dlg = self.getToolClass('LoadAuxStruct')(self.iface)
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -951,7 +991,7 @@ class DsgTools:
         """
         Shows the dialog that loads layers from server
         """
-        dlg = LoadLayersFromServer(self.iface)
+        dlg = self.getToolClass('LoadLayersFromServer')(self.iface)
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -965,7 +1005,7 @@ class DsgTools:
             self.layerButton.setDefaultAction(self.toolbar.sender())
         except:
             pass
-        dlg = CreateInomDialog(self.iface)
+        dlg = self.getToolClass('CreateInomDialog')(self.iface)
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -975,7 +1015,7 @@ class DsgTools:
         """
         Shows the view servers dialog
         """
-        dlg = ViewServers(self.iface)
+        dlg = self.getToolClass('ViewServers')(self.iface)
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -985,7 +1025,7 @@ class DsgTools:
         """
         Shows the explore database dialog
         """
-        dlg = ExploreDb()
+        dlg = self.getToolClass('ExploreDb')()
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -995,7 +1035,7 @@ class DsgTools:
         """
         Shows the database manager dialog
         """
-        dlg = BatchDbManager()
+        dlg = self.getToolClass('BatchDbManager')()
         dlg.show()
         result = dlg.exec_()
         if result:
@@ -1005,7 +1045,7 @@ class DsgTools:
         """
         Loads rapideye layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('RapidEye')
+        urlWithParams = self.getBDGExTools().getTileCache('RapidEye')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, 'RapidEye','wms')
@@ -1014,7 +1054,7 @@ class DsgTools:
         """
         Loads landsat layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('Landsat7')
+        urlWithParams = self.getBDGExTools().getTileCache('Landsat7')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, 'Landsat7', 'wms')
@@ -1023,7 +1063,7 @@ class DsgTools:
         """
         Loads landsat layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('1:250k')
+        urlWithParams = self.getBDGExTools().getTileCache('1:250k')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, '1:250k', 'wms')
@@ -1032,7 +1072,7 @@ class DsgTools:
         """
         Loads 100k layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('1:100k')
+        urlWithParams = self.getBDGExTools().getTileCache('1:100k')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, '1:100k', 'wms')
@@ -1041,7 +1081,7 @@ class DsgTools:
         """
         Loads 50k layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('1:50k')
+        urlWithParams = self.getBDGExTools().getTileCache('1:50k')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, '1:50k', 'wms')
@@ -1050,7 +1090,7 @@ class DsgTools:
         """
         Loads 25k layer
         """
-        urlWithParams = self.BDGExTools.getTileCache('1:25k')
+        urlWithParams = self.getBDGExTools().getTileCache('1:25k')
         if not urlWithParams:
             return
         self.iface.addRasterLayer(urlWithParams, '1:25k', 'wms')